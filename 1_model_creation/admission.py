@@ -0,0 +1,139 @@
+# Admission control for the /invocations endpoint
+# At most max_in_flight requests are processed at once per worker, and at most max_queue more
+# wait (up to queue_timeout_ms) for a slot. Anything beyond that is rejected at once with
+# Retry-After, so under a burst a few clients get a fast rejection to retry instead of every
+# client waiting for the SageMaker timeout. Requests can carry a deadline; work whose client
+# has already given up is dropped before the model is called.
+#
+# Under gunicorn, only requests that a worker has accepted are seen here, so the worker needs
+# more threads (MODEL_SERVER_THREADS) than max_in_flight + max_queue for rejections to be fast.
+
+import os
+import threading
+import time
+
+from metrics import Gauge
+
+IN_FLIGHT = Gauge("inference_admission_in_flight", "Requests being processed by this worker")
+QUEUED = Gauge("inference_admission_queued", "Requests waiting for a processing slot in this worker")
+
+# Absolute deadline in seconds since the epoch, or a budget relative to the request's arrival
+DEADLINE_HEADER = "X-Request-Deadline"
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+
+class Rejected(Exception):
+    """The request was not admitted; status is 429 (queue full) or 503 (no slot in time)."""
+
+    def __init__(self, reason, status, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """The client deadline passed before the request could be scored."""
+
+
+def request_deadline(headers, now=None):
+    """Deadline of a request as seconds since the epoch, or None when it has none."""
+    now = time.time() if now is None else now
+    try:
+        if headers.get(DEADLINE_HEADER):
+            return float(headers[DEADLINE_HEADER])
+        if headers.get(TIMEOUT_HEADER):
+            return now + float(headers[TIMEOUT_HEADER]) / 1000.0
+    except ValueError:
+        return None
+    return None
+
+
+def check_deadline(deadline):
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a short, bounded wait queue.
+
+    Parameters:
+    max_in_flight: requests processed at the same time
+    max_queue: requests allowed to wait for a slot; more are rejected with 429
+    queue_timeout_ms: longest wait for a slot before rejecting with 503
+    retry_after: seconds suggested to rejected clients, also how long /ping reports overload
+        after the last rejection
+    """
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout_ms=100.0, retry_after=1):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.retry_after = retry_after
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._last_rejection = None
+
+    def acquire(self, deadline=None):
+        """Take a processing slot, waiting in the queue if needed; raise Rejected or DeadlineExceeded."""
+        with self._condition:
+            if self._in_flight < self.max_in_flight:
+                self._in_flight += 1
+                IN_FLIGHT.set(self._in_flight)
+                return
+            if self._queued >= self.max_queue:
+                self._reject()
+                raise Rejected("queue_full", 429, self.retry_after)
+
+            self._queued += 1
+            QUEUED.set(self._queued)
+            # Waiting past the client's deadline is pointless
+            wait_until = time.monotonic() + self.queue_timeout
+            if deadline is not None:
+                wait_until = min(wait_until, time.monotonic() + deadline - time.time())
+            try:
+                while self._in_flight >= self.max_in_flight:
+                    remaining = wait_until - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._in_flight >= self.max_in_flight:
+                    check_deadline(deadline)
+                    self._reject()
+                    raise Rejected("queue_timeout", 503, self.retry_after)
+                self._in_flight += 1
+                IN_FLIGHT.set(self._in_flight)
+            finally:
+                self._queued -= 1
+                QUEUED.set(self._queued)
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            IN_FLIGHT.set(self._in_flight)
+            self._condition.notify()
+
+    def _reject(self):
+        self._last_rejection = time.monotonic()
+
+    def overloaded(self):
+        """True while the queue is full or a request was rejected within the last retry_after seconds."""
+        with self._condition:
+            if self._queued >= self.max_queue and self._in_flight >= self.max_in_flight:
+                return True
+            return self._last_rejection is not None and time.monotonic() - self._last_rejection < self.retry_after
+
+
+def from_environment():
+    """Build an AdmissionController from ADMISSION_* environment variables, or None when it is off."""
+    max_in_flight = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 0))
+    if max_in_flight <= 0:
+        return None
+    return AdmissionController(
+        max_in_flight,
+        max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", max_in_flight)),
+        queue_timeout_ms=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS", 100)),
+        retry_after=int(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", 1)),
+    )
@@ -0,0 +1,143 @@
+# Dynamic micro-batching for the /invocations endpoint
+# Concurrent requests handled by the threads of one worker are coalesced into a single
+# predict call, which amortises the RandomForest per-call overhead across many rows.
+
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import SIZE_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingRequest:
+    """Rows submitted by one caller and the slot its predictions are written to."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent predict calls into batches.
+
+    Parameters:
+    predict_fn: callable taking a 2D numpy array and returning one prediction per row
+    max_batch_size: maximum number of rows scored in one call (a single request larger
+        than this is scored on its own)
+    max_wait_ms: how long the first request of a batch waits for others to join
+    report_every: log the batch-size histogram every this many batches (0 disables)
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, report_every=1000):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.report_every = report_every
+        self._queue = queue.Queue()
+        self._carry = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._batch_rows = Histogram(
+            "inference_micro_batch_rows", "Rows scored per micro-batched predict call", SIZE_BUCKETS
+        )
+        self._batches = 0
+
+    def submit(self, rows):
+        """Score rows as part of the next batch and block until their predictions are ready."""
+        self._ensure_worker()
+        request = _PendingRequest(rows)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def histogram(self):
+        """Return the batch-size histogram as {upper bound in rows: number of batches}."""
+        return {bound: count for bound, count in self._batch_rows.snapshot().items() if count}
+
+    def _ensure_worker(self):
+        # The batcher thread is started lazily so that it is created inside each gunicorn
+        # worker after the fork rather than in the preloading master
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._carry = None
+                threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+                self._pid = os.getpid()
+
+    def _next_request(self, timeout=None):
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+        batch = [self._next_request()]
+        size = len(batch[0].rows)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._next_request(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(request.rows) > self.max_batch_size:
+                # Keep the batch bounded; this request opens the next one
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request.rows)
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            try:
+                rows = batch[0].rows if len(batch) == 1 else np.concatenate([r.rows for r in batch])
+                predictions = self.predict_fn(rows)
+                # Scatter the predictions back to each caller in submission order
+                offset = 0
+                for request in batch:
+                    request.result = predictions[offset:offset + len(request.rows)]
+                    offset += len(request.rows)
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            for request in batch:
+                request.done.set()
+            self._record(size)
+
+    def _record(self, size):
+        self._batch_rows.observe(size)
+        with self._lock:
+            self._batches += 1
+            report = self.report_every and self._batches % self.report_every == 0
+        if report:
+            logger.info("Batch size histogram after %d batches: %s", self._batches, self.histogram())
+
+
+def from_environment(predict_fn):
+    """Build a MicroBatcher from INFERENCE_* environment variables, or None when batching is off."""
+    if os.environ.get("INFERENCE_BATCHING", "false").lower() != "true":
+        return None
+    return MicroBatcher(
+        predict_fn,
+        max_batch_size=int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 64)),
+        max_wait_ms=float(os.environ.get("INFERENCE_MAX_BATCH_WAIT_MS", 2.0)),
+        report_every=int(os.environ.get("INFERENCE_BATCH_REPORT_EVERY", 1000)),
+    )
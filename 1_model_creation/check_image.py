@@ -0,0 +1,93 @@
+# Check of the inference image: size, start-to-healthy time and absence of training dependencies
+#
+# Runs the image the way SageMaker does (port 8080), measures the time from `docker run` until
+# /ping answers 200, and checks that the training-only packages are not installed. The result
+# is printed as JSON; with --max-size-mb or --max-startup-seconds the exit code is 1 when a
+# limit is exceeded, so the check can gate a build.
+#
+# Examples:
+#   python check_image.py --image my-image:latest
+#   python check_image.py --image my-image:latest --max-size-mb 250 --max-startup-seconds 30
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Installed for main.py only; none of them may be in the serving image
+TRAINING_PACKAGES = ("pandas", "matplotlib", "seaborn", "sklearn", "joblib")
+
+
+def docker(*args, check=True):
+    return subprocess.run(["docker", *args], check=check, capture_output=True, text=True)
+
+
+def image_size(image):
+    """Uncompressed size of the image in bytes."""
+    return int(docker("image", "inspect", "--format", "{{.Size}}", image).stdout.strip())
+
+
+def training_packages(image):
+    """Training-only packages importable in the image."""
+    script = (
+        "import importlib.util; "
+        f"print(','.join(p for p in {TRAINING_PACKAGES!r} if importlib.util.find_spec(p)))"
+    )
+    output = docker("run", "--rm", "--entrypoint", "python", image, "-c", script).stdout.strip()
+    return output.split(",") if output else []
+
+
+def time_to_healthy(image, port, timeout):
+    """Seconds from `docker run` until /ping answers 200; the container is removed afterwards."""
+    started = time.perf_counter()
+    container = docker("run", "-d", "--rm", "-p", f"{port}:8080", image).stdout.strip()
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://localhost:{port}/ping", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.05)
+        logs = docker("logs", container, check=False)
+        raise RuntimeError(f"{image} did not become healthy within {timeout}s:\n{logs.stdout}{logs.stderr}")
+    finally:
+        docker("rm", "-f", container, check=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the size and start-to-healthy time of the inference image")
+    parser.add_argument("--image", required=True)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for /ping")
+    parser.add_argument("--max-size-mb", type=float, help="Fail when the image is larger")
+    parser.add_argument("--max-startup-seconds", type=float, help="Fail when /ping takes longer to answer")
+    args = parser.parse_args()
+
+    report = {
+        "image": args.image,
+        "size_mb": round(image_size(args.image) / 2**20, 1),
+        "training_packages": training_packages(args.image),
+        "startup_seconds": round(time_to_healthy(args.image, args.port, args.timeout), 2),
+    }
+    print(json.dumps(report))
+
+    failures = []
+    if report["training_packages"]:
+        failures.append(f"training packages installed: {', '.join(report['training_packages'])}")
+    if args.max_size_mb is not None and report["size_mb"] > args.max_size_mb:
+        failures.append(f"image is {report['size_mb']} MB, limit {args.max_size_mb} MB")
+    if args.max_startup_seconds is not None and report["startup_seconds"] > args.max_startup_seconds:
+        failures.append(f"healthy after {report['startup_seconds']}s, limit {args.max_startup_seconds}s")
+    for failure in failures:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# Request decoding and response encoding for the /invocations endpoint
+# Decoding is split into the stages timed by the server: decode (parse the body), convert
+# (JSON lists to an array) and validate (shape/dtype checks on the final array).
+# Binary payloads are wrapped with np.frombuffer, so the request body is never copied.
+#
+# Problems confined to single rows (wrong length, non-numeric values, NaN/inf, values outside
+# the feature bounds) do not fail the request: every row gets a status, only the valid rows
+# are scored, and the response carries the per-row status next to the predictions.
+
+import ast
+import io
+import json
+import os
+import struct
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library codec is used without it
+    orjson = None
+
+N_FEATURES = 10
+
+# Only little-endian floats can be viewed in place; the model scores float32 internally
+_FLOAT_DTYPES = (np.dtype("<f4"), np.dtype("<f8"))
+_RAW_DTYPES = {"float32": np.dtype("<f4"), "float64": np.dtype("<f8")}
+
+# Per-row status codes, in the order of STATUS_NAMES
+OK, WRONG_LENGTH, NOT_NUMERIC, NON_FINITE, OUT_OF_BOUNDS = range(5)
+STATUS_NAMES = np.array(["ok", "wrong_length", "not_numeric", "non_finite", "out_of_bounds"], dtype=object)
+
+
+class InputError(ValueError):
+    """Raised when a request body cannot be turned into a feature matrix."""
+
+
+class StdlibJsonCodec:
+    """JSON codec built on the json module; always available."""
+
+    name = "json"
+
+    def loads(self, body):
+        return json.loads(body)
+
+    def dumps_predictions(self, predictions, status=None):
+        if status is not None:
+            predictions, names = partial_results(predictions, status)
+            return json.dumps({"predictions": predictions, "status": names}, separators=(",", ":")).encode()
+        return json.dumps({"predictions": predictions.tolist()}, separators=(",", ":")).encode()
+
+
+class OrjsonCodec:
+    """JSON codec built on orjson; serializes numpy arrays natively, without .tolist()."""
+
+    name = "orjson"
+
+    def loads(self, body):
+        return orjson.loads(body)
+
+    def dumps_predictions(self, predictions, status=None):
+        if status is not None:
+            predictions, names = partial_results(predictions, status)
+            return orjson.dumps({"predictions": predictions, "status": names})
+        # orjson only serializes exact ndarrays; np.asarray turns a memmap result into a view
+        return orjson.dumps({"predictions": np.asarray(predictions)}, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def partial_results(predictions, status):
+    """Predictions of the valid rows spread over all rows (None for the others) and the status names."""
+    results = [None] * len(status)
+    for i, prediction in zip(np.flatnonzero(status == OK).tolist(), predictions.tolist()):
+        results[i] = prediction
+    return results, STATUS_NAMES[status].tolist()
+
+
+def get_json_codec(name=None):
+    """
+    Select the JSON codec used by the server.
+
+    Parameters:
+    name: "orjson", "json" or "auto" (orjson when installed); defaults to INFERENCE_JSON_CODEC
+    """
+    name = name or os.environ.get("INFERENCE_JSON_CODEC", "auto")
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    if name == "orjson":
+        if orjson is None:
+            raise ImportError("INFERENCE_JSON_CODEC=orjson but orjson is not installed")
+        return OrjsonCodec()
+    if name == "json":
+        return StdlibJsonCodec()
+    raise ValueError(f"Unknown JSON codec: {name}")
+
+
+def validate_features(array, bounds=None, status=None):
+    """
+    Check the rows of an array in one vectorized pass over each condition.
+
+    Parameters:
+    array: numpy array decoded from the request
+    bounds: optional (low, high) arrays of per-feature limits, see load_feature_bounds
+    status: per-row status already known from the conversion, updated in place
+
+    Returns:
+    (array, status): the array as C-contiguous floats, and a uint8 status per row (OK or the
+    first problem found). Problems with the whole array (dtype, number of columns) raise InputError.
+    """
+    if array.dtype not in _FLOAT_DTYPES:
+        # Integers and non-native floats are converted; anything else cannot be scored
+        if array.dtype.kind not in "iuf":
+            raise InputError(f"Unsupported dtype {array.dtype}; send numeric values")
+        with np.errstate(over="ignore"):
+            array = array.astype(np.float32)
+    if array.ndim != 2 or array.shape[1] != N_FEATURES:
+        raise InputError(f"Each sample must have {N_FEATURES} features")
+    array = np.ascontiguousarray(array)
+
+    if status is None:
+        status = np.zeros(len(array), dtype=np.uint8)
+    pending = status == OK
+    finite = np.isfinite(array).all(axis=1)
+    status[pending & ~finite] = NON_FINITE
+    if bounds is not None:
+        low, high = bounds
+        inside = ((array >= low) & (array <= high)).all(axis=1)
+        status[pending & finite & ~inside] = OUT_OF_BOUNDS
+    return array, status
+
+
+def load_feature_bounds(path, margin=0.0):
+    """
+    Per-feature (low, high) limits from the feature_bounds.json written by main.py, or None.
+
+    Parameters:
+    path: JSON file with "min" and "max" lists of the training data
+    margin: fraction of each feature's training range allowed beyond its min and max
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    low = np.asarray(data["min"], dtype=np.float64)
+    high = np.asarray(data["max"], dtype=np.float64)
+    if low.shape != (N_FEATURES,) or high.shape != (N_FEATURES,):
+        raise ValueError(f"{path} must hold {N_FEATURES} min and max values")
+    extra = (high - low) * margin
+    return (low - extra).astype(np.float32), (high + extra).astype(np.float32)
+
+
+def decode_json(body, codec):
+    """Parse a JSON body with the given codec into a list of samples."""
+    try:
+        data = codec.loads(body)
+    except ValueError as e:
+        raise InputError(f"Invalid JSON: {e}")
+    # Expect input as a list of samples, e.g., [[1, 2, ..., 10], [1, 2, ..., 10]]
+    if not isinstance(data, list):
+        raise InputError("Input must be a list of samples")
+    return data
+
+
+def samples_to_array(data):
+    """
+    Convert a list of samples into a float32 feature matrix.
+
+    Returns:
+    (array, status): rows that are not lists of N_FEATURES numbers are left as NaN and marked
+    WRONG_LENGTH or NOT_NUMERIC in status; status is None when every row converted
+    """
+    # Values beyond the float32 range become inf and are reported by validate_features
+    with np.errstate(over="ignore"):
+        try:
+            array = np.asarray(data, dtype=np.float32)
+            if array.ndim == 2 and array.shape[1] == N_FEATURES:
+                return array, None
+        except (TypeError, ValueError):
+            pass
+
+    # Ragged or non-numeric input: convert row by row so one bad row does not fail the batch
+    array = np.full((len(data), N_FEATURES), np.nan, dtype=np.float32)
+    status = np.zeros(len(data), dtype=np.uint8)
+    with np.errstate(over="ignore"):
+        for i, row in enumerate(data):
+            if not isinstance(row, list) or len(row) != N_FEATURES:
+                status[i] = WRONG_LENGTH
+                continue
+            try:
+                array[i] = row
+            except (TypeError, ValueError):
+                status[i] = NOT_NUMERIC
+    return array, status
+
+
+def _read_array_header_3_0(fp):
+    """
+    Read a version 3.0 .npy header, which numpy has no public reader for.
+
+    It is laid out like version 2.0 (a 4-byte length, then a dict literal) but encoded in utf-8;
+    np.save writes it when field names or dtype descriptions are not latin-1.
+    """
+    (length,) = struct.unpack("<I", fp.read(4))
+    header = ast.literal_eval(fp.read(length).decode("utf-8"))
+    if not isinstance(header, dict) or set(header) != {"descr", "fortran_order", "shape"}:
+        raise ValueError(f"Header does not contain the expected keys: {header!r}")
+    shape = header["shape"]
+    if not isinstance(shape, tuple) or not all(isinstance(d, int) for d in shape):
+        raise ValueError(f"shape is not a tuple of ints: {shape!r}")
+    if not isinstance(header["fortran_order"], bool):
+        raise ValueError(f"fortran_order is not a bool: {header['fortran_order']!r}")
+    return shape, header["fortran_order"], np.lib.format.descr_to_dtype(header["descr"])
+
+
+def decode_npy(body):
+    """View an application/x-npy body as an array without copying it."""
+    header = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(header)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+        elif version == (3, 0):
+            shape, fortran_order, dtype = _read_array_header_3_0(header)
+        else:
+            raise InputError(f"Unsupported .npy format version {version[0]}.{version[1]}")
+    except (ValueError, SyntaxError, KeyError, TypeError, struct.error) as e:
+        raise InputError(f"Invalid .npy payload: {e}")
+    if dtype.kind not in "iuf":
+        raise InputError(f"Unsupported dtype {dtype}; send numeric values")
+
+    count = int(np.prod(shape))
+    if len(body) - header.tell() != count * dtype.itemsize:
+        raise InputError("Invalid .npy payload: data size does not match the header")
+    array = np.frombuffer(body, dtype=dtype, count=count, offset=header.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def decode_raw(body, params):
+    """
+    View a raw little-endian float buffer as an array without copying it.
+
+    Parameters:
+    body: request bytes, rows stored one after another
+    params: Content-Type parameters; dtype is float32 (default) or float64 and the
+        optional shape ("rows,10") is checked against the body length
+    """
+    dtype = _RAW_DTYPES.get(params.get("dtype", "float32"))
+    if dtype is None:
+        raise InputError("dtype must be float32 or float64")
+
+    row_bytes = N_FEATURES * dtype.itemsize
+    if len(body) % row_bytes:
+        raise InputError(f"Body length is not a multiple of {N_FEATURES} {dtype.name} values")
+    shape = (len(body) // row_bytes, N_FEATURES)
+    if "shape" in params:
+        try:
+            declared = tuple(int(d) for d in params["shape"].split(","))
+        except ValueError:
+            raise InputError("shape must look like rows,features")
+        if declared != shape:
+            raise InputError(f"Declared shape {declared} does not match the body ({shape})")
+    return np.frombuffer(body, dtype=dtype).reshape(shape)
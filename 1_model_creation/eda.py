@@ -0,0 +1,227 @@
+# Exploratory data analysis report for the training dataset
+# Statistics are computed in one vectorized pass over the feature matrix, and the figures are
+# drawn from those precomputed arrays in worker processes with the non-interactive Agg backend.
+# Every figure is cached under a key derived from a hash of its input data, so re-running on an
+# unchanged dataset only prints the summary and skips the rendering.
+#
+# Run it on its own with `python main.py --stage eda`, or on a file with
+#   python eda.py data.csv --target target --output-dir eda
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Bump when the rendering code changes so cached figures are redrawn
+RENDER_VERSION = 1
+
+CACHE_FILE = "eda_cache.json"
+
+HISTOGRAM_BINS = 50
+
+
+def dataset_hash(df):
+    """Stable SHA-256 of the column names and the row contents of a DataFrame."""
+    digest = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _smoothed(counts, sigma_bins=1.5):
+    """Gaussian-smoothed histogram, a binned stand-in for a KDE drawn on the same axis."""
+    radius = int(3 * sigma_bins)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma_bins) ** 2)
+    kernel /= kernel.sum()
+    return np.apply_along_axis(np.convolve, -1, counts, kernel, mode="same")
+
+
+def compute_statistics(df, target="target"):
+    """
+    Summarise the dataset in a single pass over its feature matrix.
+
+    Returns:
+    dict of NumPy arrays and lists: per-feature moments, missing counts, histograms with a
+    smoothed density, the correlation matrix of all columns and the class counts
+    """
+    features = [c for c in df.columns if c != target]
+    values = df[features].to_numpy(dtype=np.float64)
+    missing = np.isnan(values).sum(axis=0)
+
+    minimum = np.nanmin(values, axis=0)
+    maximum = np.nanmax(values, axis=0)
+    # Histograms for all features at once: map every value to its bin index per column
+    span = np.where(maximum > minimum, maximum - minimum, 1.0)
+    bins = np.clip(((values - minimum) / span * HISTOGRAM_BINS).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    offsets = np.arange(len(features)) * HISTOGRAM_BINS
+    valid = ~np.isnan(values)
+    counts = np.bincount((bins + offsets)[valid], minlength=len(features) * HISTOGRAM_BINS)
+    counts = counts.reshape(len(features), HISTOGRAM_BINS).astype(np.float64)
+    edges = minimum[:, None] + span[:, None] * np.linspace(0, 1, HISTOGRAM_BINS + 1)
+
+    classes, class_counts = np.unique(df[target].to_numpy(), return_counts=True)
+    all_values = np.column_stack([values, df[target].to_numpy(dtype=np.float64)])
+    return {
+        "features": features,
+        "columns": features + [target],
+        "rows": len(df),
+        "mean": np.nanmean(values, axis=0),
+        "std": np.nanstd(values, axis=0, ddof=1),
+        "min": minimum,
+        "max": maximum,
+        "missing": missing,
+        "hist_counts": counts,
+        "hist_edges": edges,
+        "hist_density": _smoothed(counts),
+        "correlation": np.corrcoef(all_values, rowvar=False),
+        "classes": classes,
+        "class_counts": class_counts,
+    }
+
+
+# --- Renderers ---
+# Each renderer runs in a worker process and only receives the arrays it draws
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_class_distribution(path, classes, class_counts):
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.bar(np.arange(len(classes)), class_counts)
+    ax.set_xticks(np.arange(len(classes)), [str(c) for c in classes])
+    ax.set_title("Class Distribution")
+    ax.set_xlabel("Target Class")
+    ax.set_ylabel("Count")
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_feature_distributions(path, features, hist_counts, hist_edges, hist_density):
+    plt = _pyplot()
+    n_rows = -(-len(features) // 3)
+    fig = plt.figure(figsize=(15, 2.5 * n_rows))
+    for i, name in enumerate(features):
+        ax = fig.add_subplot(n_rows, 3, i + 1)
+        edges = hist_edges[i]
+        ax.stairs(hist_counts[i], edges, fill=True, alpha=0.5)
+        ax.plot((edges[:-1] + edges[1:]) / 2, hist_density[i])
+        ax.set_title(f"Distribution of {name}")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def plot_heatmap(path, matrix, labels, title, fmt, cmap, xlabel=None, ylabel=None):
+    plt = _pyplot()
+    import seaborn as sns
+    fig, ax = plt.subplots(figsize=(10, 8) if len(labels) > 5 else (8, 6))
+    sns.heatmap(matrix, annot=True, fmt=fmt, cmap=cmap, xticklabels=labels, yticklabels=labels, ax=ax)
+    ax.set_title(title)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+    fig.savefig(path)
+    plt.close(fig)
+
+
+# --- Cached parallel rendering ---
+
+def _figure_key(data_hash, name):
+    return hashlib.sha256(f"{data_hash}:{name}:{RENDER_VERSION}".encode()).hexdigest()
+
+
+def render(figures, data_hash, output_dir=".", workers=None, force=False):
+    """
+    Render the figures that are missing or stale and return the names of those drawn.
+
+    figures: {file name: (renderer function, keyword arguments)}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, CACHE_FILE)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    pending = {}
+    for name, job in figures.items():
+        key = _figure_key(data_hash, name)
+        path = os.path.join(output_dir, name)
+        if force or cache.get(name) != key or not os.path.exists(path):
+            pending[name] = (path, key, job)
+
+    if len(pending) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(pending))) as executor:
+            futures = [executor.submit(function, path, **kwargs) for path, _, (function, kwargs) in pending.values()]
+            for future in futures:
+                future.result()
+    else:
+        for path, _, (function, kwargs) in pending.values():
+            function(path, **kwargs)
+
+    cache.update({name: key for name, (_, key, _) in pending.items()})
+    with open(cache_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    return sorted(pending)
+
+
+def run_eda(df, target="target", output_dir=".", workers=None, force=False):
+    """Print the dataset summary and render the EDA figures, skipping cached ones."""
+    stats = compute_statistics(df, target)
+    print(f"\nDataset Shape: ({stats['rows']}, {len(stats['columns'])})")
+    summary = pd.DataFrame(
+        {"mean": stats["mean"], "std": stats["std"], "min": stats["min"], "max": stats["max"],
+         "missing": stats["missing"]},
+        index=stats["features"],
+    )
+    print("\nFeature Summary:")
+    print(summary)
+    print("\nClass Counts:", dict(zip(stats["classes"].tolist(), stats["class_counts"].tolist())))
+
+    figures = {
+        "class_distribution.png": (plot_class_distribution, {
+            "classes": stats["classes"], "class_counts": stats["class_counts"],
+        }),
+        "feature_distributions.png": (plot_feature_distributions, {
+            "features": stats["features"], "hist_counts": stats["hist_counts"],
+            "hist_edges": stats["hist_edges"], "hist_density": stats["hist_density"],
+        }),
+        "correlation_matrix.png": (plot_heatmap, {
+            "matrix": stats["correlation"], "labels": stats["columns"], "title": "Correlation Matrix",
+            "fmt": ".2f", "cmap": "coolwarm",
+        }),
+    }
+    rendered = render(figures, dataset_hash(df), output_dir, workers, force)
+    print(f"\nEDA figures rendered: {rendered or 'none (cached)'}")
+    return stats
+
+
+def plot_confusion_matrix(matrix, labels, output_dir=".", force=False):
+    """Render confusion_matrix.png unless the same matrix was already drawn."""
+    matrix = np.asarray(matrix)
+    data_hash = hashlib.sha256(matrix.tobytes() + json.dumps([str(l) for l in labels]).encode()).hexdigest()
+    figures = {"confusion_matrix.png": (plot_heatmap, {
+        "matrix": matrix, "labels": labels, "title": "Confusion Matrix", "fmt": "d", "cmap": "Blues",
+        "xlabel": "Predicted", "ylabel": "Actual",
+    })}
+    return render(figures, data_hash, output_dir, workers=1, force=force)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the EDA report of a CSV or Parquet dataset")
+    parser.add_argument("path")
+    parser.add_argument("--target", default="target")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Redraw figures even when cached")
+    args = parser.parse_args()
+    data = pd.read_parquet(args.path) if args.path.endswith(".parquet") else pd.read_csv(args.path)
+    run_eda(data, args.target, args.output_dir, args.workers, args.force)
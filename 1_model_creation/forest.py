@@ -0,0 +1,158 @@
+# Flattened RandomForest representation for serving
+# The trees of a fitted RandomForestClassifier are packed into contiguous NumPy arrays
+# and evaluated for all trees and rows at once, so the server needs neither sklearn
+# nor per-tree Python objects at prediction time.
+
+import os
+
+import numpy as np
+
+# Arrays written by FlatForest.save, one .npy file each so load can memory-map them
+_ARRAY_FILES = (
+    "feature", "threshold", "left", "right", "value", "roots", "classes", "children", "is_leaf", "n_features",
+)
+
+# Rows are scored in blocks so the (rows, trees, classes) probability tensor stays small
+_BLOCK_ROWS = 4096
+
+
+def flatten_forest(model):
+    """
+    Pack the trees of a fitted RandomForestClassifier into a FlatForest.
+
+    Parameters:
+    model: fitted sklearn RandomForestClassifier with a single output
+
+    Returns:
+    FlatForest holding one node table shared by all trees
+    """
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be flattened")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(tree.node_count) + offset
+
+        # Leaves point at themselves, which is how the evaluator recognises them
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+
+        # Normalise class weights per node the same way DecisionTreeClassifier.predict_proba does
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        offset += tree.node_count
+
+    return FlatForest(
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.int32),
+        classes=np.asarray(model.classes_),
+        n_features=model.n_features_in_,
+    )
+
+
+class FlatForest:
+    """Vectorised evaluator over the node arrays produced by flatten_forest."""
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, n_features, children=None, is_leaf=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        # Derived lookup tables: children[2 * node + go_left] is the next node. They are saved
+        # with the forest so that a memory-mapped load does not have to rebuild them.
+        self._children = children if children is not None else np.stack([right, left], axis=1).ravel()
+        self._is_leaf = is_leaf if is_leaf is not None else left == np.arange(len(left))
+
+    @property
+    def nbytes(self):
+        """Size of the node arrays, i.e. of the model as the server holds it."""
+        arrays = (self.feature, self.threshold, self.left, self.right, self.value, self.roots,
+                  self._children, self._is_leaf)
+        return sum(array.nbytes for array in arrays)
+
+    def predict_proba(self, X):
+        """Return the class probabilities averaged over all trees, like RandomForestClassifier."""
+        # sklearn evaluates trees on float32 inputs; matching that keeps the split decisions identical
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n_samples, {self.n_features_in_})")
+
+        proba = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], _BLOCK_ROWS):
+            block = X[start:start + _BLOCK_ROWS]
+            proba[start:start + block.shape[0]] = self._predict_block(np.ascontiguousarray(block))
+        return proba
+
+    def _predict_block(self, X):
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        values = X.ravel()
+
+        # One (tree, row) pair per slot, tree-major so each tree's nodes stay hot in cache
+        nodes = np.repeat(self.roots, n_rows)
+        row_offsets = np.tile(np.arange(n_rows, dtype=np.int32) * n_features, n_trees)
+
+        # Advance only the pairs that have not reached a leaf yet; the work per step shrinks
+        # as shallow branches finish instead of always walking max_depth levels
+        active = np.flatnonzero(~self._is_leaf[nodes])
+        current = nodes[active]
+        while active.size:
+            go_left = values[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            current = self._children[2 * current + go_left]
+            nodes[active] = current
+            still_split = ~self._is_leaf[current]
+            active = active[still_split]
+            current = current[still_split]
+
+        return self.value[nodes].reshape(n_trees, n_rows, -1).mean(axis=0)
+
+    def predict(self, X):
+        """Return the most probable class label for each row."""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def save(self, path):
+        """Write the node arrays as uncompressed .npy files in the directory path."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "classes": self.classes_,
+            "children": self._children,
+            "is_leaf": self._is_leaf,
+            "n_features": np.asarray(self.n_features_in_),
+        }
+        for name in _ARRAY_FILES:
+            np.save(os.path.join(path, f"{name}.npy"), arrays[name])
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Read a FlatForest written by save.
+
+        With the default mmap_mode the arrays are mapped read-only instead of read into the
+        heap, so loading takes milliseconds and forked workers share the page cache.
+        """
+        return cls(**{
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in _ARRAY_FILES
+        })
@@ -0,0 +1,61 @@
+# Gunicorn configuration for serving inference.py on SageMaker
+# Usage: gunicorn -c gunicorn.conf.py inference:app
+
+import gc
+import multiprocessing
+import os
+
+# --- Binding ---
+# SageMaker sends /ping and /invocations to port 8080 inside the container
+bind = os.environ.get("MODEL_SERVER_BIND", "0.0.0.0:8080")
+
+# --- Workers ---
+# RandomForest prediction is CPU bound and holds the GIL, so one process per vCPU
+# is what scales throughput. MODEL_SERVER_WORKERS follows the SageMaker convention.
+workers = int(os.environ.get("MODEL_SERVER_WORKERS", multiprocessing.cpu_count()))
+# More than one thread switches gunicorn to the gthread worker, which lets a worker
+# keep answering /ping while a long batch is being scored. With admission control
+# (ADMISSION_MAX_IN_FLIGHT), load is shed in the app: a request is only rejected with a fast
+# 429/503 and Retry-After once a worker thread has picked it up, so threads must exceed the
+# in-flight limit plus its queue, or excess requests wait for a thread instead.
+threads = int(os.environ.get("MODEL_SERVER_THREADS", 1))
+_admission_limit = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 0))
+if _admission_limit > 0:
+    _admission_limit += int(os.environ.get("ADMISSION_MAX_QUEUE", _admission_limit))
+    if threads <= _admission_limit:
+        raise RuntimeError(
+            f"MODEL_SERVER_THREADS={threads} must be larger than ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE "
+            f"({_admission_limit}) for admission control to reject excess requests"
+        )
+# Connections waiting to be accepted by a worker; gunicorn's default. A smaller backlog does not
+# fail fast: on Linux a full accept queue silently drops new SYNs, and clients wait through
+# connection retransmits (about 1s, then 3s) before getting anywhere.
+backlog = int(os.environ.get("MODEL_SERVER_BACKLOG", 2048))
+timeout = int(os.environ.get("MODEL_SERVER_TIMEOUT", 60))
+keepalive = int(os.environ.get("MODEL_SERVER_KEEPALIVE", 5))
+
+# --- Preloading ---
+# Import inference.py (and therefore load random_forest_model.pkl) once in the master
+# before forking, so every worker shares the model pages copy-on-write
+preload_app = True
+
+# --- Worker recycling ---
+# Restart each worker after a number of requests to bound slow leaks. The jitter spreads
+# restarts so workers are not recycled at the same time, and graceful_timeout lets
+# in-flight requests finish before the old worker exits.
+max_requests = int(os.environ.get("MODEL_SERVER_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("MODEL_SERVER_MAX_REQUESTS_JITTER", max_requests // 10))
+graceful_timeout = int(os.environ.get("MODEL_SERVER_GRACEFUL_TIMEOUT", 30))
+
+# --- Logging ---
+accesslog = None
+errorlog = "-"
+loglevel = os.environ.get("MODEL_SERVER_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Freeze the preloaded objects before the first fork."""
+    # Moving the model into the permanent generation keeps the garbage collector from
+    # touching (and therefore copying) its pages in every worker
+    gc.freeze()
+    server.log.info(f"Model preloaded; starting {workers} worker(s) x {threads} thread(s)")
@@ -1,8 +1,27 @@
-from flask import Flask, request, jsonify
-import pandas as pd
-import joblib
-import numpy as np
+from time import perf_counter
+# Taken before the remaining imports so the import cost of the server can be reported
+_import_started = perf_counter()
+
+from flask import Flask, Response, request, jsonify
 import logging
+import os
+import random
+import numpy as np
+from admission import (
+    DeadlineExceeded, Rejected, check_deadline, from_environment as admission_from_environment, request_deadline,
+)
+from batching import from_environment as batcher_from_environment
+from codec import (
+    N_FEATURES, OK, STATUS_NAMES, InputError, decode_json, decode_npy, decode_raw, get_json_codec, load_feature_bounds,
+    samples_to_array, validate_features,
+)
+from metrics import LATENCY_BUCKETS, SIZE_BUCKETS, Counter, Gauge, Histogram, render as render_metrics
+from model_cache import (
+    FLAT_MODEL_DIR, MODEL_FILE, ModelNotFoundError, from_environment as models_from_environment, load_model,
+    model_version,
+)
+from prediction_cache import from_environment as prediction_cache_from_environment
+from profiler import ProfilerBusy, from_environment as profiler_from_environment
 
 # Configure logging for debugging in CloudWatch
 logging.basicConfig(level=logging.INFO)
@@ -10,72 +29,285 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Per-stage latency of /invocations plus request, row and error counts, served on /metrics
+STAGE_SECONDS = Histogram(
+    "inference_stage_seconds", "Time spent in each stage of /invocations", LATENCY_BUCKETS, label="stage"
+)
+REQUEST_ROWS = Histogram("inference_request_rows", "Rows per /invocations request", SIZE_BUCKETS)
+REQUESTS = Counter("inference_requests_total", "/invocations responses by HTTP status", label="code")
+ERRORS = Counter("inference_errors_total", "/invocations failures by cause", label="type")
+INVALID_ROWS = Counter("inference_invalid_rows_total", "Rows left unscored by validation, by status", label="status")
+STARTUP_SECONDS = Gauge("inference_startup_seconds", "Cold-start timings of the server", label="phase")
+
+STARTUP_SECONDS.set(perf_counter() - _import_started, "imports")
+logger.info("Imports took %.1f ms", (perf_counter() - _import_started) * 1000)
+
+# orjson when installed, otherwise the standard library (INFERENCE_JSON_CODEC overrides)
+json_codec = get_json_codec()
+logger.info("Using the %s JSON codec", json_codec.name)
+
+# Request payloads are only logged for a sample of requests and truncated, so logging cost
+# stays bounded regardless of batch size. The default of 0 disables payload logging.
+log_payload_sample_rate = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", 0.0))
+log_payload_max_bytes = int(os.environ.get("LOG_PAYLOAD_MAX_BYTES", 1024))
+
+# Per-feature limits of the default model (feature_bounds.json from main.py, widened on each side
+# by FEATURE_BOUNDS_MARGIN times the training range); rows outside them are not scored.
+# Without the file only the row length, numeric values and NaN/inf are checked.
+feature_bounds = load_feature_bounds(
+    os.environ.get("FEATURE_BOUNDS_FILE", "feature_bounds.json"), float(os.environ.get("FEATURE_BOUNDS_MARGIN", 0.1))
+)
+logger.info("Feature bounds check %s", "enabled" if feature_bounds is not None else "disabled")
+
+def log_payload(label, payload):
+    """Log the first log_payload_max_bytes of a payload for a sampled fraction of requests."""
+    if log_payload_sample_rate <= 0 or random.random() >= log_payload_sample_rate:
+        return
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("%s (%d bytes): %r", label, len(payload), bytes(payload[:log_payload_max_bytes]))
+
 # Load the trained model from /opt/ml/model/
-model_path = "random_forest_model.pkl"
+# The flattened forest exported by main.py is preferred over the pickled sklearn model
+# (see model_cache.load_model).
+# Multi-model mode (MULTI_MODEL_DIR) keeps this model as the default for requests that do not
+# name a target model, so it may be absent there.
+models = models_from_environment(N_FEATURES)
+default_model_version = None
 
 try:
-    model = joblib.load(model_path)
-    logger.info("Model loaded successfully")
+    load_started = perf_counter()
+    if models is not None and not (os.path.isdir(FLAT_MODEL_DIR) or os.path.exists(MODEL_FILE)):
+        model = None
+        logger.info("Multi-model mode without a default model")
+    else:
+        model = load_model(".")
+        default_model_version = f"default:{model_version('.')}"
+        logger.info("Model loaded successfully (%s, version %s)", type(model).__name__, default_model_version)
+        STARTUP_SECONDS.set(perf_counter() - load_started, "model_load")
+        logger.info("Model load took %.1f ms", (perf_counter() - load_started) * 1000)
 except Exception as e:
     logger.error(f"Error loading model: {e}")
     model = None
 
+if models is not None:
+    logger.info("Multi-model mode: models under %s, cache of %.0f MB", models.model_dir, models.max_bytes / 2**20)
+
 def perform_inference(data):
     """
     Perform inference using the loaded model.
 
     Parameters:
-    data: pandas DataFrame or numpy array with 10 features in the same order as training data
+    data: contiguous float32/float64 numpy array with 10 features in the same order as training data
 
     Returns:
     predictions: array of predicted class labels
     """
-    # Ensure input is a DataFrame
-    if isinstance(data, np.ndarray):
-        data = pd.DataFrame(data, columns=[f'feature_{i}' for i in range(1, 11)])
-
     # Perform prediction
     predictions = model.predict(data)
     return predictions
 
+# Score one dummy row before serving: this reports the time to first prediction and keeps
+# the one-off cost of the first call (and of faulting in the mapped pages) off the first
+# real request. Under gunicorn this runs once in the master before the workers fork.
+if model is not None:
+    perform_inference(np.zeros((1, N_FEATURES), dtype=np.float32))
+    STARTUP_SECONDS.set(perf_counter() - _import_started, "first_prediction")
+    logger.info("Time to first prediction: %.1f ms", (perf_counter() - _import_started) * 1000)
+
+# Optional micro-batching in front of perform_inference (INFERENCE_BATCHING=true).
+# It only coalesces requests handled concurrently by one worker, so it needs
+# MODEL_SERVER_THREADS > 1 to have any effect under gunicorn.
+batcher = batcher_from_environment(perform_inference)
+
+# Optional per-row prediction cache in front of the model and the batcher
+# (PREDICTION_CACHE_SIZE rows, PREDICTION_CACHE_TTL_SECONDS). Entries are keyed on the model
+# version, so a new model artifact never serves the predictions of the one it replaced.
+prediction_cache = prediction_cache_from_environment()
+
+def predict(rows, predict_fn, version, deadline=None):
+    if prediction_cache is None:
+        return predict_fn(rows)
+    return prediction_cache.predict(rows, predict_fn, version, deadline)
+
+# Optional admission control (ADMISSION_MAX_IN_FLIGHT > 0): requests beyond the in-flight limit
+# wait in a short bounded queue, and the rest are rejected at once with 429/503 and Retry-After.
+# /ping answers 503 while the worker is shedding load (ADMISSION_PING_OVERLOAD=false keeps it
+# healthy, e.g. when a failing health check would get the instance replaced).
+admission = admission_from_environment()
+ping_reports_overload = os.environ.get("ADMISSION_PING_OVERLOAD", "true").lower() == "true"
+
+# Optional on-demand profiling (PROFILING_TOKEN): a capture profiles the next /invocations calls
+# of the worker that receives it and returns a zip (see profiler.py). Without the token, neither
+# the route nor any per-request check exists. SageMaker only forwards /ping and /invocations,
+# so on an endpoint the capture is requested through /invocations with the CustomAttributes
+# "debug-profile; token=...; mode=sample; calls=100; seconds=10". The capture request holds one
+# thread of the worker while it waits, so under gunicorn it needs MODEL_SERVER_THREADS > 1.
+profiler = profiler_from_environment()
+CUSTOM_ATTRIBUTES_HEADER = "X-Amzn-SageMaker-Custom-Attributes"
+
+def capture_profile(params, token):
+    """Run a capture with the given parameters (mode, calls, seconds, interval_ms, memory)."""
+    if not profiler.authorized(token):
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        archive = profiler.capture(
+            mode=params.get("mode", "sample"),
+            calls=int(params.get("calls", 100)),
+            seconds=float(params.get("seconds", 10)),
+            interval_ms=float(params.get("interval_ms", 5)),
+            memory=params.get("memory", "false").lower() == "true",
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    return Response(archive, mimetype="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.zip"'})
+
+if profiler is not None:
+    @app.route("/debug/profile", methods=["POST"])
+    def debug_profile():
+        """Capture a profile; the token is sent in X-Profile-Token and the parameters in the query string."""
+        return capture_profile(request.args, request.headers.get("X-Profile-Token"))
+
 @app.route("/ping", methods=["GET"])
 def ping():
     """Health check endpoint for SageMaker."""
-    if model is None:
+    if model is None and models is None:
         return jsonify({"status": "Unhealthy", "error": "Model not loaded"}), 500
+    if admission is not None and ping_reports_overload and admission.overloaded():
+        return jsonify({"status": "Overloaded"}), 503, {"Retry-After": str(admission.retry_after)}
     return jsonify({"status": "Healthy"}), 200
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics for the worker that serves this request."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.after_request
+def count_request(response):
+    if request.path == "/invocations":
+        REQUESTS.inc(str(response.status_code))
+    return response
+
+def target_model_id(header):
+    """Model id from X-Amzn-SageMaker-Target-Model, which names the artifact (e.g. a.tar.gz)."""
+    return header[:-len(".tar.gz")] if header.endswith(".tar.gz") else header
+
 @app.route("/invocations", methods=["POST"])
 def invocations():
     """Inference endpoint for SageMaker."""
-    if model is None:
+    if profiler is None:
+        return admit_and_score()
+    attributes = request.headers.get(CUSTOM_ATTRIBUTES_HEADER, "")
+    if attributes.startswith("debug-profile"):
+        params = dict(item.strip().partition("=")[::2] for item in attributes.split(";")[1:])
+        return capture_profile(params, params.pop("token", None))
+    return profiler.observe(admit_and_score)
+
+def admit_and_score():
+    """Admission control and deadline handling around score_request."""
+    # A client deadline (X-Request-Deadline, X-Request-Timeout-Ms) bounds the wait for a slot,
+    # and the request is dropped if it has passed by the time the model would be called
+    deadline = request_deadline(request.headers)
+    if admission is None:
+        return score_request(deadline)
+    try:
+        admission.acquire(deadline)
+    except Rejected as e:
+        ERRORS.inc(f"rejected_{e.reason}")
+        return jsonify({"error": "Server overloaded, retry later"}), e.status, {"Retry-After": str(e.retry_after)}
+    except DeadlineExceeded as e:
+        ERRORS.inc("deadline_exceeded")
+        return jsonify({"error": str(e)}), 504
+    try:
+        return score_request(deadline)
+    finally:
+        admission.release()
+
+def score_request(deadline):
+    """Decode, validate and score the /invocations request, unless its deadline passes first."""
+    target = request.headers.get("X-Amzn-SageMaker-Target-Model") if models is not None else None
+    if target is None and model is None:
+        ERRORS.inc("model_not_loaded")
         return jsonify({"error": "Model not loaded"}), 500
 
     try:
-        # Get JSON input
-        data = request.get_json()
-        logger.info(f"Received input: {data}")
+        # Binary payloads are viewed in place; JSON is parsed into lists and converted to a
+        # float32 array. Either way the model receives an ndarray, never a DataFrame.
+        started = perf_counter()
+        body = request.get_data()
+        log_payload("Received input", body)
+        if request.mimetype == "application/x-npy":
+            input_data = decode_npy(body)
+        elif request.mimetype == "application/octet-stream":
+            input_data = decode_raw(body, request.mimetype_params)
+        elif request.mimetype in ("application/json", ""):
+            input_data = decode_json(body, json_codec)
+        else:
+            ERRORS.inc("unsupported_media_type")
+            return jsonify({"error": f"Unsupported content type: {request.mimetype}"}), 415
+        decoded = perf_counter()
+        STAGE_SECONDS.observe(decoded - started, "decode")
 
-        # Expect input as a list of samples, e.g., [[1, 2, ..., 10], [1, 2, ..., 10]]
-        if not isinstance(data, list):
-            return jsonify({"error": "Input must be a list of samples"}), 400
+        status = None
+        if isinstance(input_data, list):
+            input_data, status = samples_to_array(input_data)
+            converted = perf_counter()
+            STAGE_SECONDS.observe(converted - decoded, "convert")
+            decoded = converted
 
-        # Convert to numpy array and then DataFrame
-        input_data = np.array(data)
-        if input_data.shape[1] != 10:
-            return jsonify({"error": "Each sample must have 10 features"}), 400
+        # Rows are checked independently; only the valid ones are scored and the response
+        # reports a status per row. The bounds belong to the default model only.
+        input_data, status = validate_features(input_data, feature_bounds if target is None else None, status)
+        valid = status == OK
+        n_valid = int(np.count_nonzero(valid))
+        partial = n_valid < len(input_data)
+        if partial:
+            for code, count in zip(*np.unique(status[~valid], return_counts=True)):
+                INVALID_ROWS.inc(str(STATUS_NAMES[code]), int(count))
+            if n_valid == 0:
+                ERRORS.inc("invalid_input")
+                return jsonify({"error": "No valid rows", "status": STATUS_NAMES[status].tolist()}), 400
+            input_data = input_data[valid]
+        validated = perf_counter()
+        STAGE_SECONDS.observe(validated - decoded, "validate")
+        REQUEST_ROWS.observe(len(status))
+        logger.debug("Decoded input with shape %s, %d valid rows", input_data.shape, n_valid)
 
-        input_df = pd.DataFrame(input_data, columns=[f'feature_{i}' for i in range(1, 11)])
+        check_deadline(deadline)
 
-        # Perform inference
-        predictions = perform_inference(input_df)
-        logger.info(f"Predictions: {predictions}")
+        # Perform inference, sharing a predict call with concurrent requests when batching is on.
+        # Requests for a target model are scored by that model from the multi-model cache.
+        if target is not None:
+            target_model, version = models.get(target_model_id(target))
+            predictions = predict(input_data, target_model.predict, version, deadline)
+        else:
+            predictions = predict(input_data, batcher.submit if batcher is not None else perform_inference,
+                                  default_model_version, deadline)
+        predicted = perf_counter()
+        STAGE_SECONDS.observe(predicted - validated, "predict")
 
         # Return predictions as JSON
-        return jsonify({"predictions": predictions.tolist()}), 200
+        output = json_codec.dumps_predictions(predictions, status if partial else None)
+        STAGE_SECONDS.observe(perf_counter() - predicted, "encode")
+        log_payload("Predictions", output)
+        return Response(output, status=200, mimetype="application/json")
+    except InputError as e:
+        ERRORS.inc("invalid_input")
+        return jsonify({"error": str(e)}), 400
+    except ModelNotFoundError as e:
+        ERRORS.inc("model_not_found")
+        return jsonify({"error": str(e)}), 404
+    except DeadlineExceeded as e:
+        ERRORS.inc("deadline_exceeded")
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
+        ERRORS.inc("internal")
         logger.error(f"Error during inference: {e}")
         return jsonify({"error": str(e)}), 400
 
+# Local development server only; the container serves the app with gunicorn
+# (see gunicorn.conf.py) so that every vCPU gets its own worker process.
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080)
\ No newline at end of file
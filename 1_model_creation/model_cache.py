@@ -0,0 +1,199 @@
+# Model loading and the multi-model cache of the inference server
+# In multi-model mode every model lives in its own subdirectory of a model directory, with the
+# same artifacts main.py writes (random_forest_model_flat/ and/or random_forest_model.pkl).
+# Models are loaded on first use and kept in an LRU cache bounded by the total size of their
+# artifacts on disk; when many requests race for the same cold model, one of them loads it and
+# the others wait for that load instead of starting their own.
+# The budget is a size budget, not a measure of resident memory: the .npy files of a flattened
+# forest are memory-mapped and only the pages that are read become resident (and can be
+# reclaimed), while a pickled sklearn model usually takes more heap than its file size.
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from forest import FlatForest
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "random_forest_model.pkl"
+FLAT_MODEL_DIR = "random_forest_model_flat"
+
+# Model ids are single path components so a request cannot reach outside the model directory
+_MODEL_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+CACHE_EVENTS = Counter("inference_model_cache_events_total", "Multi-model cache hits, misses, loads and evictions",
+                       label="event")
+CACHE_BYTES = Gauge("inference_model_cache_bytes", "Artifact size on disk of the models held by the multi-model cache")
+CACHE_MODELS = Gauge("inference_model_cache_models", "Number of models held by the multi-model cache")
+
+
+class ModelNotFoundError(LookupError):
+    """No model with the requested id exists in the model directory."""
+
+
+def load_model(directory):
+    """
+    Load the model stored in directory.
+
+    The flattened forest is preferred: it is scored with plain NumPy, never imports sklearn,
+    and its .npy files are memory-mapped rather than read into the heap. The pickled sklearn
+    model remains as a fallback.
+    """
+    flat_path = os.path.join(directory, FLAT_MODEL_DIR)
+    if os.path.isdir(flat_path):
+        return FlatForest.load(flat_path)
+    # joblib, and sklearn through the pickle, are only imported for the fallback model
+    import joblib
+    model = joblib.load(os.path.join(directory, MODEL_FILE), mmap_mode="r")
+    # Requests are scored as plain arrays; dropping the fitted column names stops sklearn
+    # from warning about missing feature names on every call
+    if hasattr(model, "feature_names_in_"):
+        del model.feature_names_in_
+    return model
+
+
+def model_size(directory):
+    """Bytes of the model artifacts in directory, used as the model's weight in the cache."""
+    flat_path = os.path.join(directory, FLAT_MODEL_DIR)
+    if os.path.isdir(flat_path):
+        return sum(entry.stat().st_size for entry in os.scandir(flat_path) if entry.is_file())
+    return os.path.getsize(os.path.join(directory, MODEL_FILE))
+
+
+def model_version(directory):
+    """
+    Short fingerprint of the model artifacts in directory (file names, sizes and mtimes).
+
+    It changes whenever a new model is written, which invalidates anything cached for the
+    previous one, such as its predictions.
+    """
+    flat_path = os.path.join(directory, FLAT_MODEL_DIR)
+    if os.path.isdir(flat_path):
+        paths = sorted(entry.path for entry in os.scandir(flat_path) if entry.is_file())
+    else:
+        paths = [os.path.join(directory, MODEL_FILE)]
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+class _Load:
+    """An in-progress load that concurrent requests for the same model wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.model = None
+        self.version = None
+        self.error = None
+
+
+class ModelCache:
+    """
+    LRU cache of the models stored as subdirectories of model_dir.
+
+    Parameters:
+    model_dir: directory holding one subdirectory per model id
+    max_bytes: total on-disk artifact size of the loaded models (see model_size); the least
+        recently used models are evicted beyond it (a single model larger than this is still
+        served, alone)
+    n_features: width of the dummy row each model scores right after loading
+    """
+
+    def __init__(self, model_dir, max_bytes, n_features):
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self.n_features = n_features
+        self._models = OrderedDict()  # model id -> (model, version, size)
+        self._loading = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, model_id):
+        """Return (model, model version) for model_id, loading the model if it is not cached."""
+        with self._lock:
+            entry = self._models.get(model_id)
+            if entry is not None:
+                self._models.move_to_end(model_id)
+                CACHE_EVENTS.inc("hit")
+                return entry[0], entry[1]
+            load = self._loading.get(model_id)
+            owner = load is None
+            if owner:
+                load = self._loading[model_id] = _Load()
+            CACHE_EVENTS.inc("miss" if owner else "wait")
+
+        if not owner:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.model, load.version
+
+        try:
+            model, version, size = self._load(model_id)
+            load.model, load.version = model, version
+            self._insert(model_id, model, version, size)
+            return model, version
+        except Exception as e:
+            load.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._loading[model_id]
+            load.done.set()
+
+    def _load(self, model_id):
+        directory = os.path.join(self.model_dir, model_id)
+        if not _MODEL_ID.match(model_id) or not os.path.isdir(directory):
+            CACHE_EVENTS.inc("not_found")
+            raise ModelNotFoundError(f"Model {model_id!r} not found")
+        try:
+            model = load_model(directory)
+            # The first call pays one-off costs (and faults in mapped pages); keep it off the request
+            model.predict(np.zeros((1, self.n_features), dtype=np.float32))
+        except Exception:
+            CACHE_EVENTS.inc("load_error")
+            raise
+        CACHE_EVENTS.inc("load")
+        size = model_size(directory)
+        logger.info("Loaded model %s (%.1f MB)", model_id, size / 2**20)
+        return model, f"{model_id}:{model_version(directory)}", size
+
+    def _insert(self, model_id, model, version, size):
+        with self._lock:
+            self._models[model_id] = (model, version, size)
+            self._bytes += size
+            # Evict least recently used models, never the one just loaded
+            while self._bytes > self.max_bytes and len(self._models) > 1:
+                evicted_id, (_, _, evicted_size) = self._models.popitem(last=False)
+                self._bytes -= evicted_size
+                CACHE_EVENTS.inc("eviction")
+                logger.info("Evicted model %s (%.1f MB)", evicted_id, evicted_size / 2**20)
+            CACHE_BYTES.set(self._bytes)
+            CACHE_MODELS.set(len(self._models))
+
+    def loaded(self):
+        """Ids of the cached models, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+
+def from_environment(n_features):
+    """
+    Build a ModelCache from MULTI_MODEL_* environment variables, or None when the mode is off.
+
+    MULTI_MODEL_CACHE_MB is the artifact size budget in MB (default 1024).
+    """
+    model_dir = os.environ.get("MULTI_MODEL_DIR")
+    if not model_dir:
+        return None
+    max_bytes = int(float(os.environ.get("MULTI_MODEL_CACHE_MB", 1024)) * 2**20)
+    return ModelCache(model_dir, max_bytes, n_features)
@@ -0,0 +1,183 @@
+# Model selection for the RandomForest served by inference.py
+# Configurations of forest size, depth and max_features are compared with successive halving:
+# each round fits every surviving configuration on a larger share of the training rows in a
+# process pool and keeps the best 1/eta by validation accuracy, so clearly worse configurations
+# are dropped after training on a small sample. The finalists are then flattened like the
+# served model and timed, and the winner is picked against a latency and size budget.
+
+import itertools
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from forest import flatten_forest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_SPACE = {
+    "n_estimators": [25, 50, 100, 200],
+    "max_depth": [8, 12, 16, None],
+    "max_features": ["sqrt", 0.5, 1.0],
+}
+
+
+def expand_grid(search_space):
+    """Return every combination of the search space as a list of parameter dicts."""
+    names = sorted(search_space)
+    return [dict(zip(names, values)) for values in itertools.product(*(search_space[name] for name in names))]
+
+
+def _fit_and_score(params, X_fit, y_fit, X_val, y_val, random_state, keep_model):
+    # One core per fit; the parallelism comes from running configurations side by side
+    model = RandomForestClassifier(**params, random_state=random_state, n_jobs=1)
+    model.fit(X_fit, y_fit)
+    accuracy = accuracy_score(y_val, model.predict(X_val))
+    return accuracy, model if keep_model else None
+
+
+def measure_latency(flat_forest, X, repeats=200, batch_size=256):
+    """
+    Time the flattened forest the way the server calls it.
+
+    Returns:
+    (median seconds for a single-row call, median seconds per row in batch_size-row calls)
+    """
+    flat_forest.predict(X[:1])  # warm up
+    single = []
+    for i in range(repeats):
+        row = X[i % len(X)][None, :]
+        started = time.perf_counter()
+        flat_forest.predict(row)
+        single.append(time.perf_counter() - started)
+    batch = X[:batch_size]
+    per_row = []
+    for _ in range(max(1, repeats // 20)):
+        started = time.perf_counter()
+        flat_forest.predict(batch)
+        per_row.append((time.perf_counter() - started) / len(batch))
+    return float(np.median(single)), float(np.median(per_row))
+
+
+def successive_halving(candidates, X, y, eta=3, min_rows=200, n_jobs=-1, random_state=42):
+    """
+    Race the candidate parameter dicts on growing subsets of the training rows.
+
+    Returns:
+    (finalists as [(params, accuracy, fitted model)], history of every fit as a list of dicts)
+    """
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.2, random_state=random_state, stratify=y)
+    n_fit = len(y_fit)
+    # Enough rounds to cut the field down to about eta finalists, as long as the first round
+    # still gets min_rows rows
+    n_rounds = 1 + int(math.log(max(len(candidates), 1), eta))
+    n_rounds = max(1, min(n_rounds, 1 + int(math.log(max(n_fit / min_rows, 1), eta))))
+
+    history = []
+    survivors = list(candidates)
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for round_index in range(n_rounds):
+            final = round_index == n_rounds - 1
+            rows = n_fit if final else int(n_fit / eta ** (n_rounds - 1 - round_index))
+            if rows < n_fit:
+                X_round, _, y_round, _ = train_test_split(
+                    X_fit, y_fit, train_size=rows, random_state=random_state + round_index, stratify=y_fit
+                )
+            else:
+                X_round, y_round = X_fit, y_fit
+
+            started = time.perf_counter()
+            scores = parallel(
+                delayed(_fit_and_score)(params, X_round, y_round, X_val, y_val, random_state, final)
+                for params in survivors
+            )
+            logger.info("Round %d: %d configurations on %d rows in %.1fs",
+                        round_index + 1, len(survivors), rows, time.perf_counter() - started)
+            for params, (accuracy, _) in zip(survivors, scores):
+                history.append({"round": round_index + 1, "rows": rows, "params": params, "accuracy": accuracy})
+
+            ranked = sorted(zip(survivors, scores), key=lambda item: item[1][0], reverse=True)
+            if final:
+                return [(params, accuracy, model) for params, (accuracy, model) in ranked], history
+            survivors = [params for params, _ in ranked[:math.ceil(len(ranked) / eta)]]
+
+
+def select_model(X, y, search_space=None, latency_budget_ms=1.0, size_budget_mb=50.0,
+                 accuracy_tolerance=0.005, eta=3, n_jobs=-1, random_state=42):
+    """
+    Search RandomForest hyperparameters and pick the configuration to ship.
+
+    Among the finalists that meet both budgets (median single-row latency of the flattened
+    forest and its size in memory), the fastest one whose accuracy is within
+    accuracy_tolerance of the best is selected. If no finalist meets the budget, the fastest
+    finalist is selected and a warning is logged.
+
+    Returns:
+    (parameters of the selected configuration, report dict suitable for JSON)
+    """
+    candidates = expand_grid(search_space or DEFAULT_SEARCH_SPACE)
+    X = np.asarray(X)
+    y = np.asarray(y)
+    logger.info("Model selection over %d configurations", len(candidates))
+    finalists, history = successive_halving(candidates, X, y, eta=eta, n_jobs=n_jobs, random_state=random_state)
+
+    # Finalists are timed one after another in this process so the fits do not skew the latency
+    results = []
+    for params, accuracy, model in finalists:
+        flat_forest = flatten_forest(model)
+        single, per_row = measure_latency(flat_forest, X.astype(np.float32))
+        results.append({
+            "params": params,
+            "accuracy": accuracy,
+            "latency_ms": single * 1000,
+            "batch_latency_us_per_row": per_row * 1e6,
+            "size_mb": flat_forest.nbytes / 2**20,
+        })
+        results[-1]["within_budget"] = (
+            results[-1]["latency_ms"] <= latency_budget_ms and results[-1]["size_mb"] <= size_budget_mb
+        )
+
+    eligible = [result for result in results if result["within_budget"]]
+    if eligible:
+        best_accuracy = max(result["accuracy"] for result in eligible)
+        close = [result for result in eligible if result["accuracy"] >= best_accuracy - accuracy_tolerance]
+        selected = min(close, key=lambda result: result["latency_ms"])
+    else:
+        selected = min(results, key=lambda result: result["latency_ms"])
+        logger.warning("No configuration meets the budget of %.3f ms and %.1f MB; using the fastest",
+                       latency_budget_ms, size_budget_mb)
+
+    report = {
+        "budget": {"latency_ms": latency_budget_ms, "size_mb": size_budget_mb, "accuracy_tolerance": accuracy_tolerance},
+        "selected": selected,
+        "finalists": results,
+        "history": history,
+    }
+    return selected["params"], report
+
+
+def from_environment(X, y):
+    """
+    Run select_model configured by MODEL_SELECTION_* environment variables.
+
+    Returns None unless MODEL_SELECTION is true (the search is opt-in), otherwise the result of select_model.
+    """
+    if os.environ.get("MODEL_SELECTION", "false").lower() != "true":
+        return None
+    search_space = os.environ.get("MODEL_SELECTION_SEARCH_SPACE")
+    return select_model(
+        X, y,
+        search_space=json.loads(search_space) if search_space else None,
+        latency_budget_ms=float(os.environ.get("MODEL_SELECTION_LATENCY_BUDGET_MS", 1.0)),
+        size_budget_mb=float(os.environ.get("MODEL_SELECTION_SIZE_BUDGET_MB", 50.0)),
+        accuracy_tolerance=float(os.environ.get("MODEL_SELECTION_ACCURACY_TOLERANCE", 0.005)),
+        eta=int(os.environ.get("MODEL_SELECTION_ETA", 3)),
+        n_jobs=int(os.environ.get("MODEL_SELECTION_JOBS", -1)),
+    )
@@ -0,0 +1,159 @@
+# Per-row prediction cache for the /invocations endpoint
+# Each row is keyed on its float32 feature bytes plus the version of the model that scores it.
+# The forest compares float32 features, so rows equal in float32 always get the same prediction.
+# A batch is looked up row by row and only the missing rows (deduplicated) reach the model.
+# A row that another request is already computing is not computed again: the request waits for
+# that computation instead, for at most its own deadline. A new model artifact has a new version, so predictions of a
+# replaced model are never served.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from admission import check_deadline
+from metrics import Counter, Gauge
+
+CACHE_ROWS = Counter("inference_prediction_cache_rows_total",
+                     "Rows looked up in the prediction cache (hit, miss, or shared with a concurrent miss)",
+                     label="result")
+CACHE_HIT_RATIO = Gauge("inference_prediction_cache_hit_ratio",
+                        "Share of rows served without reaching the model (hit or shared)")
+CACHE_ENTRIES = Gauge("inference_prediction_cache_entries", "Predictions held by the prediction cache")
+
+
+class _Pending:
+    """A row being computed by one request, that concurrent requests for the same row wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.prediction = None
+        self.error = None
+
+
+class PredictionCache:
+    """
+    LRU cache of single-row predictions with a time to live.
+
+    Parameters:
+    max_entries: rows kept; the least recently used are evicted beyond it
+    ttl_seconds: age after which a cached prediction is recomputed (0 disables expiry)
+    max_wait_seconds: longest wait for rows computed by another request, for requests without
+        a deadline
+    """
+
+    def __init__(self, max_entries, ttl_seconds=300.0, max_wait_seconds=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_wait = max_wait_seconds
+        self._entries = OrderedDict()  # (model version, row bytes) -> (prediction, expiry)
+        self._pending = {}  # key -> _Pending, for the rows being computed
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._lookups = 0
+
+    def predict(self, rows, predict_fn, version, deadline=None):
+        """
+        Return predict_fn(rows), computing only the rows that are not cached for version.
+
+        deadline (seconds since the epoch) bounds the wait for rows that another request is
+        computing; past it DeadlineExceeded is raised.
+        """
+        rows32 = np.ascontiguousarray(rows, dtype=np.float32)
+        # Dict lookups on the raw row bytes; Python's bytes hash is fast and collision-free keys
+        # avoid ever returning another row's prediction
+        keys = [(version, row.tobytes()) for row in rows32]
+        now = time.monotonic()
+        results = [None] * len(keys)
+        missing = {}  # key -> indices of the rows with that key, computed by this request
+        shared = {}  # key -> indices of the rows with that key, computed by another request
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._entries.move_to_end(key)
+                    results[i] = entry[0]
+                elif key in missing:
+                    missing[key].append(i)
+                elif key in self._pending:
+                    shared.setdefault(key, []).append(i)
+                else:
+                    missing[key] = [i]
+            owned = {key: _Pending() for key in missing}
+            self._pending.update(owned)
+            waited = {key: self._pending[key] for key in shared}
+
+        if missing:
+            # Whatever fails, the rows this request owns must be published, or their waiters hang
+            try:
+                first_rows = [indices[0] for indices in missing.values()]
+                predictions = predict_fn(rows[first_rows] if len(first_rows) < len(keys) else rows)
+                if len(predictions) != len(first_rows):
+                    raise ValueError(f"Model returned {len(predictions)} predictions for {len(first_rows)} rows")
+                for (key, indices), prediction in zip(missing.items(), predictions):
+                    for i in indices:
+                        results[i] = prediction
+                    owned[key].prediction = prediction
+                self._publish(owned, expiry=now + self.ttl if self.ttl > 0 else None)
+            except BaseException as e:
+                self._publish(owned, error=e)
+                raise
+
+        wait_until = time.monotonic() + self.max_wait
+        if deadline is not None:
+            wait_until = min(wait_until, time.monotonic() + deadline - time.time())
+        for key, indices in shared.items():
+            pending = waited[key]
+            if not pending.done.wait(max(wait_until - time.monotonic(), 0)):
+                check_deadline(deadline)
+                raise TimeoutError(f"Rows computed by another request not ready within {self.max_wait}s")
+            if pending.error is not None:
+                raise pending.error
+            for i in indices:
+                results[i] = pending.prediction
+
+        n_missing = sum(len(indices) for indices in missing.values())
+        n_shared = sum(len(indices) for indices in shared.values())
+        self._record(len(keys) - n_missing - n_shared, n_shared, len(keys))
+        return np.asarray(results)
+
+    def _publish(self, owned, expiry=None, error=None):
+        """Store the rows computed by this request (unless it failed) and wake the requests waiting on them."""
+        with self._lock:
+            for key, pending in owned.items():
+                if error is None:
+                    self._entries[key] = (pending.prediction, expiry)
+                    self._entries.move_to_end(key)
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        for pending in owned.values():
+            pending.error = error
+            pending.done.set()
+
+    def _record(self, hits, shared, lookups):
+        CACHE_ROWS.inc("hit", hits)
+        CACHE_ROWS.inc("shared", shared)
+        CACHE_ROWS.inc("miss", lookups - hits - shared)
+        with self._lock:
+            self._hits += hits + shared
+            self._lookups += lookups
+            ratio = self._hits / self._lookups if self._lookups else 0.0
+            entries = len(self._entries)
+        CACHE_HIT_RATIO.set(ratio)
+        CACHE_ENTRIES.set(entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def from_environment():
+    """Build a PredictionCache from PREDICTION_CACHE_* environment variables, or None when it is off."""
+    max_entries = int(os.environ.get("PREDICTION_CACHE_SIZE", 0))
+    if max_entries <= 0:
+        return None
+    return PredictionCache(max_entries, float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", 300)))
@@ -0,0 +1,212 @@
+# On-demand profiling of the inference server
+# A capture profiles the next N /invocations calls handled by this worker (or the calls made
+# within T seconds) and returns a zip with the results:
+#   sample   - the threads serving /invocations are sampled every few milliseconds; stacks are
+#              written in the collapsed format read by flamegraph.pl and speedscope
+#              (profile.folded). Requests keep running concurrently.
+#   cprofile - every profiled call runs under cProfile (profile.prof for pstats/snakeviz, plus a
+#              text summary). cProfile follows a single thread, so profiled calls are serialized.
+#   memory   - optionally, tracemalloc snapshots taken at the start and end of the capture
+#              (tracemalloc.txt, the top allocation sites by growth).
+# Only one capture runs at a time per container: a thread lock guards the worker and a file lock
+# the other gunicorn workers. Outside a capture, the only cost on /invocations is checking that
+# no session is set.
+
+import cProfile
+import fcntl
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+
+MODES = ("sample", "cprofile")
+LOCK_FILE = os.path.join("/tmp", "inference-profile.lock")
+TOP_ENTRIES = 50
+
+
+class ProfilerBusy(Exception):
+    """Another capture is already running in this container."""
+
+
+class _Session:
+    """One capture: counts the profiled calls and collects their profile."""
+
+    def __init__(self, mode, calls, interval_ms, memory):
+        self.mode = mode
+        self.calls = calls
+        self.interval = interval_ms / 1000.0
+        self.memory = memory
+        self.done = threading.Event()
+        self.started = self.finished = None
+        self.profiled = 0
+        self.samples = 0
+        self._admitted = 0
+        self._count_lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._profile = cProfile.Profile() if mode == "cprofile" else None
+        self._stacks = Counter()
+        self._threads = set()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True) if mode == "sample" else None
+        self._started_tracemalloc = False
+        self._memory_start = self._memory_end = None
+
+    def start(self):
+        self.started = time.time()
+        if self.memory:
+            self._started_tracemalloc = not tracemalloc.is_tracing()
+            if self._started_tracemalloc:
+                tracemalloc.start()
+            self._memory_start = tracemalloc.take_snapshot()
+        if self._sampler is not None:
+            self._sampler.start()
+
+    def stop(self):
+        self.finished = time.time()
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        # Waits for a cProfile'd call still running
+        with self._profile_lock:
+            pass
+        if self.memory:
+            self._memory_end = tracemalloc.take_snapshot()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+    def observe(self, handler):
+        with self._count_lock:
+            profiled = self._admitted < self.calls and not self._stop.is_set()
+            self._admitted += profiled
+        if not profiled:
+            return handler()
+        try:
+            if self._profile is not None:
+                with self._profile_lock:
+                    if self._stop.is_set():
+                        return handler()
+                    self._profile.enable()
+                    try:
+                        return handler()
+                    finally:
+                        self._profile.disable()
+            thread = threading.get_ident()
+            self._threads.add(thread)
+            try:
+                return handler()
+            finally:
+                self._threads.discard(thread)
+        finally:
+            with self._count_lock:
+                self.profiled += 1
+                if self.profiled >= self.calls:
+                    self.done.set()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread in list(self._threads):
+                frame = frames.get(thread)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self._stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def archive(self):
+        """The capture as zip bytes: summary.json plus the files of the chosen mode."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            summary = {
+                "mode": self.mode, "pid": os.getpid(), "started": self.started,
+                "seconds": round(self.finished - self.started, 3), "calls_profiled": self.profiled,
+                "calls_requested": self.calls, "memory": self.memory,
+            }
+            if self.mode == "sample":
+                summary.update(interval_ms=self.interval * 1000, samples=self.samples)
+                archive.writestr("profile.folded", "".join(
+                    f"{stack} {count}\n" for stack, count in self._stacks.most_common()))
+            else:
+                self._profile.create_stats()
+                # pstats cannot read an empty profile: with no profiled call, summary.json is all there is
+                if self._profile.stats:
+                    archive.writestr("profile.prof", marshal.dumps(self._profile.stats))
+                    text = io.StringIO()
+                    pstats.Stats(self._profile, stream=text).sort_stats("cumulative").print_stats(TOP_ENTRIES)
+                    archive.writestr("profile.txt", text.getvalue())
+            if self.memory:
+                lines = [str(stat) for stat in self._memory_end.compare_to(self._memory_start, "lineno")[:TOP_ENTRIES]]
+                archive.writestr("tracemalloc.txt", "\n".join(lines) + "\n")
+            archive.writestr("summary.json", json.dumps(summary, indent=2))
+        return buffer.getvalue()
+
+
+class Profiler:
+    """
+    Entry point of the captures; one per worker.
+
+    Parameters:
+    token: secret a capture request must present
+    max_seconds: longest capture allowed, which also bounds how long the request is held
+    """
+
+    def __init__(self, token, max_seconds=30.0):
+        self._token = token.encode()
+        self.max_seconds = max_seconds
+        self.session = None
+        self._lock = threading.Lock()
+
+    def authorized(self, token):
+        return token is not None and hmac.compare_digest(token.encode(), self._token)
+
+    def observe(self, handler):
+        """Run handler(), profiled when a capture is running."""
+        session = self.session
+        if session is None:
+            return handler()
+        return session.observe(handler)
+
+    def capture(self, mode="sample", calls=100, seconds=10.0, interval_ms=5.0, memory=False):
+        """Profile the next `calls` calls, for at most `seconds`; return the results as zip bytes."""
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if calls < 1 or not 0 < seconds <= self.max_seconds or interval_ms <= 0:
+            raise ValueError(f"calls must be positive and seconds in (0, {self.max_seconds}]")
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A capture is already running in this worker")
+        try:
+            with open(LOCK_FILE, "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise ProfilerBusy("A capture is already running in another worker")
+                session = _Session(mode, calls, interval_ms, memory)
+                session.start()
+                self.session = session
+                try:
+                    session.done.wait(seconds)
+                finally:
+                    self.session = None
+                    session.stop()
+                return session.archive()
+        finally:
+            self._lock.release()
+
+
+def from_environment():
+    """Build a Profiler when PROFILING_TOKEN is set, or None so that profiling is fully off."""
+    token = os.environ.get("PROFILING_TOKEN")
+    if not token:
+        return None
+    return Profiler(token, float(os.environ.get("PROFILING_MAX_SECONDS", 30)))
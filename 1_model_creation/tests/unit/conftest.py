@@ -0,0 +1,56 @@
+import importlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest import flatten_forest
+
+# Prefixes of the environment variables read by inference.py and its modules at import
+SERVER_ENVIRONMENT = ("ADMISSION_", "FEATURE_BOUNDS_", "INFERENCE_", "LOG_PAYLOAD_", "MULTI_MODEL_",
+                      "PREDICTION_CACHE_", "PROFILING_")
+
+
+@pytest.fixture
+def load_server(tmp_path, monkeypatch):
+    """
+    Import a fresh inference.py serving a small flattened forest from tmp_path.
+
+    Call it with the server's environment variables as keyword arguments; every other variable
+    of the server is unset. feature_bounds=(min, max) writes feature_bounds.json, and
+    service_seconds makes every model call take at least that long.
+    """
+    rng = np.random.default_rng(0)
+    X = rng.random((200, 10))
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(X, X[:, 0] > 0.5)
+    flatten_forest(model).save(str(tmp_path / "random_forest_model_flat"))
+    monkeypatch.chdir(tmp_path)
+
+    def load(feature_bounds=None, service_seconds=0.0, **environment):
+        for name in list(os.environ):
+            if name.startswith(SERVER_ENVIRONMENT):
+                monkeypatch.delenv(name)
+        for name, value in environment.items():
+            monkeypatch.setenv(name, str(value))
+        if feature_bounds is not None:
+            low, high = feature_bounds
+            (tmp_path / "feature_bounds.json").write_text(json.dumps({"min": [low] * 10, "max": [high] * 10}))
+        sys.modules.pop("inference", None)
+        inference = importlib.import_module("inference")
+
+        if service_seconds:
+            predict = inference.perform_inference
+
+            def slow_inference(data):
+                time.sleep(service_seconds)
+                return predict(data)
+
+            monkeypatch.setattr(inference, "perform_inference", slow_inference)
+        return inference
+
+    yield load
+    sys.modules.pop("inference", None)
@@ -0,0 +1,127 @@
+import threading
+import time
+
+ROWS = [[0.5] * 10]
+
+
+class HeldModel:
+    """Stand-in for perform_inference that holds every call until released, counting the calls running."""
+
+    def __init__(self, predict):
+        self.predict = predict
+        self.release = threading.Event()
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, data):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            self.release.wait(5)
+            return self.predict(data)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def post_in_background(app, count):
+    """Send count requests, each from its own thread; return the threads and the status codes list."""
+    statuses = []
+
+    def client():
+        statuses.append(app.test_client().post("/invocations", json=ROWS).status_code)
+
+    threads = [threading.Thread(target=client) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, statuses
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def test_requests_beyond_the_queue_are_shed_at_once(load_server, monkeypatch):
+    inference = load_server(ADMISSION_MAX_IN_FLIGHT=1, ADMISSION_MAX_QUEUE=2, ADMISSION_QUEUE_TIMEOUT_MS=10000)
+    model = HeldModel(inference.perform_inference)
+    monkeypatch.setattr(inference, "perform_inference", model)
+
+    threads, statuses = post_in_background(inference.app, 3)
+    wait_until(lambda: model.running == 1 and inference.admission._queued == 2)
+    client = inference.app.test_client()
+    shed = [client.post("/invocations", json=ROWS) for _ in range(4)]
+    model.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in shed] == [429] * 4
+    assert all(response.headers["Retry-After"] == "1" for response in shed)
+    assert sorted(statuses) == [200] * 3
+    assert model.peak == 1
+
+
+def test_queued_requests_are_rejected_after_the_queue_timeout(load_server, monkeypatch):
+    inference = load_server(ADMISSION_MAX_IN_FLIGHT=1, ADMISSION_MAX_QUEUE=1, ADMISSION_QUEUE_TIMEOUT_MS=20)
+    model = HeldModel(inference.perform_inference)
+    monkeypatch.setattr(inference, "perform_inference", model)
+
+    threads, statuses = post_in_background(inference.app, 1)
+    wait_until(lambda: model.running == 1)
+    response = inference.app.test_client().post("/invocations", json=ROWS)
+    model.release.set()
+    threads[0].join()
+
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    assert statuses == [200]
+
+
+def test_every_request_reaches_the_model_without_admission_control(load_server, monkeypatch):
+    inference = load_server()
+    model = HeldModel(inference.perform_inference)
+    monkeypatch.setattr(inference, "perform_inference", model)
+
+    threads, statuses = post_in_background(inference.app, 6)
+    # Nothing is shed or bounded: all requests run (and compete for the model) at once
+    wait_until(lambda: model.running == 6)
+    model.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 6
+    assert model.peak == 6
+
+
+def test_ping_reports_overload(load_server):
+    inference = load_server(ADMISSION_MAX_IN_FLIGHT=1, ADMISSION_MAX_QUEUE=0, ADMISSION_RETRY_AFTER_SECONDS=1)
+    client = inference.app.test_client()
+    assert client.get("/ping").status_code == 200
+
+    inference.admission.acquire()
+    try:
+        response = client.post("/invocations", json=ROWS)
+        assert response.status_code == 429
+        assert client.get("/ping").status_code == 503
+    finally:
+        inference.admission.release()
+    inference.admission._last_rejection -= 1
+    assert client.get("/ping").status_code == 200
+
+
+def test_expired_deadline_is_dropped_before_predict(load_server):
+    inference = load_server(ADMISSION_MAX_IN_FLIGHT=1)
+    calls = []
+    inference.perform_inference = lambda data: calls.append(data)
+    client = inference.app.test_client()
+
+    response = client.post("/invocations", json=ROWS, headers={"X-Request-Deadline": str(time.time() - 1)})
+    assert response.status_code == 504
+    assert calls == []
+
+    response = client.post("/invocations", json=ROWS, headers={"X-Request-Timeout-Ms": "0"})
+    assert response.status_code == 504
+    assert calls == []
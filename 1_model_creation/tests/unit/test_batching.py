@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+
+
+class RecordingPredict:
+    """predict_fn that returns row sums and records the size of every call."""
+
+    def __init__(self, release=None, fail_on=None):
+        self.calls = []
+        self.release = release
+        self.fail_on = fail_on
+
+    def __call__(self, rows):
+        if self.release is not None:
+            self.release.wait(5)
+        self.calls.append(len(rows))
+        if self.fail_on is not None and (rows == self.fail_on).all(axis=1).any():
+            raise ValueError("bad row")
+        return rows.sum(axis=1)
+
+
+def submit_concurrently(batcher, row_sets):
+    """Submit every row set from its own thread; return {index: result or exception}."""
+    results = {}
+
+    def submit(i, rows):
+        try:
+            results[i] = batcher.submit(rows)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=submit, args=(i, rows)) for i, rows in enumerate(row_sets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def rows(value, count=1):
+    return np.full((count, 3), float(value))
+
+
+def test_results_go_back_to_their_callers():
+    predict = RecordingPredict()
+    batcher = MicroBatcher(predict, max_batch_size=64, max_wait_ms=50, report_every=0)
+    row_sets = [rows(i, count=i % 3 + 1) for i in range(10)]
+
+    results = submit_concurrently(batcher, row_sets)
+
+    for i, row_set in enumerate(row_sets):
+        np.testing.assert_array_equal(results[i], row_set.sum(axis=1))
+    assert sum(predict.calls) == sum(len(r) for r in row_sets)
+    assert len(predict.calls) < len(row_sets)
+
+
+def test_batch_is_flushed_when_full():
+    # The first call is held until every request is queued, so later batches form from a full queue
+    release = threading.Event()
+    predict = RecordingPredict(release)
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=10_000, report_every=0)
+    threading.Timer(0.2, release.set).start()
+
+    results = submit_concurrently(batcher, [rows(i, count=2) for i in range(8)])
+
+    # Every batch is sent as soon as it is full, long before max_wait_ms
+    assert len(results) == 8
+    assert predict.calls == [4, 4, 4, 4]
+
+
+def test_batch_is_flushed_after_the_wait():
+    predict = RecordingPredict()
+    batcher = MicroBatcher(predict, max_batch_size=64, max_wait_ms=1, report_every=0)
+
+    np.testing.assert_array_equal(batcher.submit(rows(2)), [6.0])
+    np.testing.assert_array_equal(batcher.submit(rows(3)), [9.0])
+    assert predict.calls == [1, 1]
+
+
+def test_oversized_request_is_scored_alone():
+    predict = RecordingPredict()
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=1, report_every=0)
+
+    assert len(batcher.submit(rows(1, count=10))) == 10
+    assert predict.calls == [10]
+
+
+def test_errors_reach_every_caller_of_the_failed_batch():
+    release = threading.Event()
+    predict = RecordingPredict(release, fail_on=rows(7)[0])
+    batcher = MicroBatcher(predict, max_batch_size=64, max_wait_ms=200, report_every=0)
+    threading.Timer(0.1, release.set).start()
+
+    results = submit_concurrently(batcher, [rows(1), rows(7), rows(2)])
+
+    failed = [i for i, result in results.items() if isinstance(result, Exception)]
+    assert 1 in failed
+    assert all(isinstance(results[i], ValueError) for i in failed)
+    # Callers whose batch succeeded still get their own predictions
+    for i in set(results) - set(failed):
+        np.testing.assert_array_equal(results[i], rows([1, 7, 2][i]).sum(axis=1))
+
+    # The batcher keeps serving after a failed batch
+    np.testing.assert_array_equal(batcher.submit(rows(4)), [12.0])
+
+
+def test_histogram_counts_batches():
+    batcher = MicroBatcher(RecordingPredict(), max_batch_size=64, max_wait_ms=1, report_every=0)
+    batcher.submit(rows(1, count=3))
+    assert batcher.histogram() == pytest.approx({4: 1})
@@ -0,0 +1,37 @@
+import io
+
+import numpy as np
+import pytest
+
+from codec import InputError, decode_npy
+
+
+def npy_bytes(array, version):
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, array, version=version)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("version", [(1, 0), (2, 0), (3, 0)])
+def test_npy_versions_are_decoded(version):
+    array = np.arange(20, dtype=np.float32).reshape(2, 10)
+    np.testing.assert_array_equal(decode_npy(npy_bytes(array, version)), array)
+
+
+def test_fortran_order_is_kept():
+    array = np.asfortranarray(np.arange(20, dtype=np.float64).reshape(2, 10))
+    np.testing.assert_array_equal(decode_npy(npy_bytes(array, (3, 0))), array)
+
+
+def test_unsupported_npy_version_is_rejected():
+    body = bytearray(npy_bytes(np.zeros((1, 10), dtype=np.float32), (1, 0)))
+    body[6] = 4
+    with pytest.raises(InputError, match="version 4.0"):
+        decode_npy(bytes(body))
+
+
+def test_corrupt_version_3_header_is_rejected():
+    body = bytearray(npy_bytes(np.zeros((1, 10), dtype=np.float32), (3, 0)))
+    body[12:16] = b"{'x'"
+    with pytest.raises(InputError):
+        decode_npy(bytes(body))
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from forest import FlatForest, flatten_forest
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    X, y = make_classification(n_samples=600, n_features=10, n_informative=8, n_redundant=2, n_classes=3,
+                               random_state=0)
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    X_test, _ = make_classification(n_samples=300, n_features=10, n_informative=8, n_redundant=2, n_classes=3,
+                                    random_state=1)
+    return model, X_test
+
+
+def assert_parity(forest, model, X):
+    if not len(X):
+        # sklearn refuses empty input; the server can still receive a batch with no rows
+        assert forest.predict_proba(X).shape == (0, len(model.classes_))
+        assert forest.predict(X).shape == (0,)
+        return
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+@pytest.mark.parametrize("rows", [0, 1, 300])
+def test_flat_forest_matches_sklearn(fitted, rows):
+    model, X_test = fitted
+    assert_parity(flatten_forest(model), model, X_test[:rows])
+
+
+def test_float32_rows_match_sklearn(fitted):
+    model, X_test = fitted
+    X32 = X_test.astype(np.float32)
+    np.testing.assert_array_equal(flatten_forest(model).predict(X32), model.predict(X32))
+
+
+def test_memory_mapped_forest_matches_sklearn(fitted, tmp_path):
+    model, X_test = fitted
+    flatten_forest(model).save(str(tmp_path / "flat"))
+
+    forest = FlatForest.load(str(tmp_path / "flat"))
+
+    assert isinstance(forest.threshold, np.memmap)
+    assert forest.n_features_in_ == 10
+    for rows in (0, 1, 300):
+        assert_parity(forest, model, X_test[:rows])
+
+
+def test_multi_output_forests_are_rejected():
+    X = np.random.default_rng(0).random((50, 3))
+    model = RandomForestClassifier(n_estimators=2, random_state=0).fit(X, np.c_[X[:, 0] > 0.5, X[:, 1] > 0.5])
+    with pytest.raises(ValueError):
+        flatten_forest(model)
@@ -0,0 +1,95 @@
+import threading
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import model_cache
+from forest import flatten_forest
+from model_cache import ModelCache, ModelNotFoundError
+
+N_FEATURES = 4
+
+
+@pytest.fixture(scope="module")
+def forest():
+    X = np.random.default_rng(0).random((100, N_FEATURES))
+    return flatten_forest(RandomForestClassifier(n_estimators=3, max_depth=3, random_state=0).fit(X, X[:, 0] > 0.5))
+
+
+@pytest.fixture
+def model_dir(tmp_path, forest):
+    """A multi-model directory holding models a, b and c, all the same size."""
+    for model_id in ("a", "b", "c"):
+        forest.save(str(tmp_path / "models" / model_id / model_cache.FLAT_MODEL_DIR))
+    (tmp_path / "outside" / model_cache.FLAT_MODEL_DIR).mkdir(parents=True)
+    return tmp_path / "models"
+
+
+@pytest.mark.parametrize("model_id", ["../outside", "a/../b", ".", "..", "", "-a", "missing"])
+def test_invalid_or_unknown_model_ids_are_not_found(model_dir, model_id):
+    cache = ModelCache(str(model_dir), 2**30, N_FEATURES)
+    with pytest.raises(ModelNotFoundError):
+        cache.get(model_id)
+    assert cache.loaded() == []
+
+
+def test_concurrent_requests_for_a_cold_model_share_one_load(model_dir, monkeypatch):
+    release = threading.Event()
+    loads = []
+
+    def slow_load(directory):
+        loads.append(directory)
+        release.wait(5)
+        return model_cache.FlatForest.load(f"{directory}/{model_cache.FLAT_MODEL_DIR}")
+
+    monkeypatch.setattr(model_cache, "load_model", slow_load)
+    cache = ModelCache(str(model_dir), 2**30, N_FEATURES)
+    waits = model_cache.CACHE_EVENTS._values.get("wait", 0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("a"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Hold the load until the seven other requests are waiting on it
+    for _ in range(500):
+        if model_cache.CACHE_EVENTS._values.get("wait", 0) - waits == 7:
+            break
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert model_cache.CACHE_EVENTS._values.get("wait", 0) - waits == 7
+    assert len(results) == 8
+    assert len({id(model) for model, _ in results}) == 1
+    assert len({version for _, version in results}) == 1
+
+
+def test_a_failed_load_is_raised_and_retried_on_the_next_request(model_dir, monkeypatch):
+    def corrupt(directory):
+        raise OSError("corrupt")
+
+    cache = ModelCache(str(model_dir), 2**30, N_FEATURES)
+    monkeypatch.setattr(model_cache, "load_model", corrupt)
+    with pytest.raises(OSError):
+        cache.get("a")
+    monkeypatch.undo()
+    model, version = cache.get("a")
+    assert version.startswith("a:")
+
+
+def test_least_recently_used_models_are_evicted_beyond_the_size_budget(model_dir):
+    size = model_cache.model_size(str(model_dir / "a"))
+    cache = ModelCache(str(model_dir), int(size * 2.5), N_FEATURES)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+    assert cache.loaded() == ["a", "c"]
+
+    # A model over the whole budget is still served, alone
+    small = ModelCache(str(model_dir), size // 2, N_FEATURES)
+    small.get("a")
+    small.get("b")
+    assert small.loaded() == ["b"]
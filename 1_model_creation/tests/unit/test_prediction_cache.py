@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+import prediction_cache
+from admission import DeadlineExceeded
+from model_cache import model_version
+from prediction_cache import PredictionCache
+
+ROWS = np.float32([[1, 2], [3, 4], [5, 6]])
+
+
+class RecordingPredict:
+    """predict_fn that returns row sums and records the rows of every call."""
+
+    def __init__(self, release=None, error=None):
+        self.calls = []
+        self.release = release
+        self.error = error
+
+    def __call__(self, rows):
+        self.calls.append(rows.tolist())
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return rows.sum(axis=1)
+
+
+def rows_counter(result):
+    return prediction_cache.CACHE_ROWS._values.get(result, 0)
+
+
+@pytest.fixture
+def waiters(monkeypatch):
+    """Number of requests currently waiting on rows computed by another request."""
+    count = [0]
+
+    class CountingEvent(threading.Event):
+        def wait(self, timeout=None):
+            count[0] += 1
+            return super().wait(timeout)
+
+    class Pending(prediction_cache._Pending):
+        def __init__(self):
+            super().__init__()
+            self.done = CountingEvent()
+
+    monkeypatch.setattr(prediction_cache, "_Pending", Pending)
+    return lambda: count[0]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def test_only_the_missing_rows_of_a_batch_reach_the_model():
+    cache = PredictionCache(100)
+    predict = RecordingPredict()
+    cache.predict(ROWS[:2], predict, "v1")
+
+    batch = ROWS[[0, 2, 1, 2]]
+    np.testing.assert_array_equal(cache.predict(batch, predict, "v1"), batch.sum(axis=1))
+    # Row 2 appears twice in the batch but is computed once
+    assert predict.calls == [ROWS[:2].tolist(), [ROWS[2].tolist()]]
+
+
+def test_concurrent_misses_for_the_same_rows_are_computed_once(waiters):
+    cache = PredictionCache(100)
+    release = threading.Event()
+    predict = RecordingPredict(release)
+    shared = rows_counter("shared")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.predict(ROWS, predict, "v1"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # One request computes the rows while the three others wait for them
+    wait_until(lambda: len(predict.calls) == 1 and waiters() == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert predict.calls == [ROWS.tolist()]
+    assert rows_counter("shared") - shared == 3 * len(ROWS)
+    for result in results:
+        np.testing.assert_array_equal(result, ROWS.sum(axis=1))
+    assert cache._pending == {}
+
+
+def test_a_failed_computation_reaches_the_waiting_request_and_is_not_cached(waiters):
+    cache = PredictionCache(100)
+    release = threading.Event()
+    failing = RecordingPredict(release, error=RuntimeError("model failed"))
+    errors = []
+
+    def request(predict):
+        try:
+            cache.predict(ROWS, predict, "v1")
+        except RuntimeError as e:
+            errors.append(e)
+
+    owner = threading.Thread(target=request, args=(failing,))
+    owner.start()
+    wait_until(lambda: len(failing.calls) == 1)
+    waiter = threading.Thread(target=request, args=(RecordingPredict(),))
+    waiter.start()
+    wait_until(lambda: waiters() == 1)
+    release.set()
+    owner.join()
+    waiter.join()
+
+    assert len(errors) == 2 and len(failing.calls) == 1
+    predict = RecordingPredict()
+    cache.predict(ROWS, predict, "v1")
+    assert predict.calls == [ROWS.tolist()]
+
+
+def test_a_short_model_result_is_an_error_and_nothing_is_cached():
+    cache = PredictionCache(100)
+    with pytest.raises(ValueError):
+        cache.predict(ROWS, lambda rows: rows.sum(axis=1)[:-1], "v1")
+    assert cache._pending == {} and len(cache._entries) == 0
+
+
+def test_pending_rows_are_released_whatever_the_owner_raises():
+    class Interrupted(BaseException):
+        pass
+
+    def interrupted(rows):
+        raise Interrupted()
+
+    cache = PredictionCache(100)
+    with pytest.raises(Interrupted):
+        cache.predict(ROWS, interrupted, "v1")
+    assert cache._pending == {}
+    predict = RecordingPredict()
+    cache.predict(ROWS, predict, "v1")
+    assert predict.calls == [ROWS.tolist()]
+
+
+def test_waiting_for_another_request_is_bounded_by_the_deadline():
+    cache = PredictionCache(100, max_wait_seconds=0.05)
+    release = threading.Event()
+    owner = threading.Thread(target=cache.predict, args=(ROWS, RecordingPredict(release), "v1"))
+    owner.start()
+    wait_until(lambda: cache._pending)
+    try:
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            cache.predict(ROWS, RecordingPredict(), "v1", deadline=time.time() + 0.02)
+        with pytest.raises(TimeoutError):
+            cache.predict(ROWS, RecordingPredict(), "v1")
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        owner.join()
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(prediction_cache, "time", types.SimpleNamespace(monotonic=lambda: clock[0]))
+    cache = PredictionCache(100, ttl_seconds=10)
+    predict = RecordingPredict()
+
+    cache.predict(ROWS, predict, "v1")
+    clock[0] += 9
+    cache.predict(ROWS, predict, "v1")
+    assert len(predict.calls) == 1
+    clock[0] += 2
+    cache.predict(ROWS, predict, "v1")
+    assert len(predict.calls) == 2
+
+
+def test_least_recently_used_rows_are_evicted_at_capacity():
+    cache = PredictionCache(2)
+    predict = RecordingPredict()
+    cache.predict(ROWS[[0]], predict, "v1")
+    cache.predict(ROWS[[1]], predict, "v1")
+    cache.predict(ROWS[[0]], predict, "v1")
+    cache.predict(ROWS[[2]], predict, "v1")
+    assert len(cache._entries) == 2
+
+    predict.calls.clear()
+    cache.predict(ROWS, predict, "v1")
+    assert predict.calls == [[ROWS[1].tolist()]]
+
+
+def test_a_new_model_version_is_not_served_old_predictions(tmp_path):
+    cache = PredictionCache(100)
+    predict = RecordingPredict()
+    cache.predict(ROWS, predict, "v1")
+    cache.predict(ROWS, predict, "v2")
+    assert len(predict.calls) == 2
+
+    # The version of a model changes with the name, size or mtime of its artifacts
+    flat = tmp_path / "random_forest_model_flat"
+    flat.mkdir()
+    (flat / "value.npy").write_bytes(b"1234")
+    versions = {model_version(str(tmp_path))}
+    os.utime(flat / "value.npy", ns=(0, 1))
+    versions.add(model_version(str(tmp_path)))
+    (flat / "value.npy").write_bytes(b"12345")
+    versions.add(model_version(str(tmp_path)))
+    (flat / "value.npy").rename(flat / "other.npy")
+    versions.add(model_version(str(tmp_path)))
+    assert len(versions) == 4
+
+
+def metric(text, line):
+    """Value of the sample starting with line in a /metrics page (0 when absent)."""
+    for sample in text.splitlines():
+        if sample.startswith(line + " "):
+            return float(sample.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_hits_and_misses_are_reported_on_metrics(load_server):
+    inference = load_server(PREDICTION_CACHE_SIZE=100)
+    client = inference.app.test_client()
+    hit = 'inference_prediction_cache_rows_total{result="hit"}'
+    miss = 'inference_prediction_cache_rows_total{result="miss"}'
+    before = client.get("/metrics").get_data(as_text=True)
+
+    rows = [[0.1] * 10, [0.9] * 10]
+    assert client.post("/invocations", json=rows).status_code == 200
+    assert client.post("/invocations", json=rows + [[0.5] * 10]).status_code == 200
+    after = client.get("/metrics").get_data(as_text=True)
+
+    assert metric(after, hit) - metric(before, hit) == 2
+    assert metric(after, miss) - metric(before, miss) == 3
+    assert 0 < metric(after, "inference_prediction_cache_hit_ratio") < 1
+    assert metric(after, "inference_prediction_cache_entries") == 3
+
+
+def test_the_cache_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("PREDICTION_CACHE_SIZE", raising=False)
+    assert prediction_cache.from_environment() is None
@@ -0,0 +1,110 @@
+import io
+import json
+import marshal
+import threading
+import time
+import zipfile
+
+TOKEN = "s3cret"
+ROWS = [[0.5] * 10]
+# Long enough for the sampler to see the model calls
+SERVICE_SECONDS = 0.02
+
+
+def capture_while_serving(inference, query, calls, headers=None, path="/debug/profile"):
+    """Start a capture in the background, send `calls` requests, and return the capture response."""
+    result = {}
+
+    def capture():
+        client = inference.app.test_client()
+        if path == "/debug/profile":
+            result["response"] = client.post(f"{path}?{query}", headers={"X-Profile-Token": TOKEN})
+        else:
+            result["response"] = client.post(path, json=ROWS, headers=headers)
+
+    thread = threading.Thread(target=capture)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while inference.profiler.session is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    client = inference.app.test_client()
+    for _ in range(calls):
+        assert client.post("/invocations", json=ROWS).status_code == 200
+    thread.join()
+    return result["response"]
+
+
+def read_archive(response):
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert "attachment" in response.headers["Content-Disposition"]
+    return zipfile.ZipFile(io.BytesIO(response.data))
+
+
+def test_profiling_is_off_without_a_token(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS)
+    assert inference.profiler is None
+    assert inference.app.test_client().post("/debug/profile").status_code == 404
+
+
+def test_capture_requires_the_token(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS, PROFILING_TOKEN=TOKEN)
+    client = inference.app.test_client()
+    assert client.post("/debug/profile").status_code == 401
+    assert client.post("/debug/profile", headers={"X-Profile-Token": "wrong"}).status_code == 401
+
+
+def test_sampling_capture_of_the_next_calls(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS, PROFILING_TOKEN=TOKEN)
+    archive = read_archive(capture_while_serving(inference, "mode=sample&calls=5&seconds=10&interval_ms=1", 5))
+
+    summary = json.loads(archive.read("summary.json"))
+    assert summary["mode"] == "sample" and summary["calls_profiled"] == 5
+    assert summary["seconds"] < 10
+    assert "slow_inference" in archive.read("profile.folded").decode()
+
+
+def test_cprofile_capture_with_memory_snapshots(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS, PROFILING_TOKEN=TOKEN)
+    archive = read_archive(capture_while_serving(inference, "mode=cprofile&calls=3&memory=true", 3))
+
+    stats = marshal.loads(archive.read("profile.prof"))
+    assert any(name == "score_request" for _, _, name in stats)
+    assert "score_request" in archive.read("profile.txt").decode()
+    assert "tracemalloc.txt" in archive.namelist()
+
+
+def test_cprofile_capture_without_traffic(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS, PROFILING_TOKEN=TOKEN)
+    response = inference.app.test_client().post("/debug/profile?mode=cprofile&seconds=0.1",
+                                                headers={"X-Profile-Token": TOKEN})
+    archive = read_archive(response)
+    assert archive.namelist() == ["summary.json"]
+    assert json.loads(archive.read("summary.json"))["calls_profiled"] == 0
+
+
+def test_capture_through_custom_attributes(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS, PROFILING_TOKEN=TOKEN)
+    headers = {"X-Amzn-SageMaker-Custom-Attributes": f"debug-profile; token={TOKEN}; mode=cprofile; calls=2"}
+    archive = read_archive(capture_while_serving(inference, None, 2, headers=headers, path="/invocations"))
+    assert json.loads(archive.read("summary.json"))["calls_profiled"] == 2
+
+
+def test_captures_do_not_run_in_parallel(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS, PROFILING_TOKEN=TOKEN)
+    client = inference.app.test_client()
+    first = threading.Thread(
+        target=lambda: client.post("/debug/profile?seconds=0.5", headers={"X-Profile-Token": TOKEN}))
+    first.start()
+    while inference.profiler.session is None:
+        time.sleep(0.001)
+    second = inference.app.test_client().post("/debug/profile?seconds=0.5", headers={"X-Profile-Token": TOKEN})
+    first.join()
+    assert second.status_code == 409
+
+
+def test_invalid_parameters_are_rejected(load_server):
+    inference = load_server(service_seconds=SERVICE_SECONDS, PROFILING_TOKEN=TOKEN, PROFILING_MAX_SECONDS=5)
+    client = inference.app.test_client()
+    for query in ("mode=strace", "calls=0", "seconds=60", "calls=many"):
+        assert client.post(f"/debug/profile?{query}", headers={"X-Profile-Token": TOKEN}).status_code == 400
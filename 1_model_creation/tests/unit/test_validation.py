@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pytest
+
+from codec import (
+    NON_FINITE, NOT_NUMERIC, OK, OUT_OF_BOUNDS, WRONG_LENGTH, InputError, StdlibJsonCodec, load_feature_bounds,
+    samples_to_array, validate_features,
+)
+
+GOOD_ROW = [0.5] * 10
+
+
+def validate_samples(rows, bounds=None):
+    array, status = samples_to_array(rows)
+    return validate_features(array, bounds, status)
+
+
+def test_rectangular_input_has_no_row_errors():
+    array, status = validate_samples([GOOD_ROW, GOOD_ROW])
+    assert array.dtype == np.float32 and array.shape == (2, 10)
+    assert status.tolist() == [OK, OK]
+
+
+def test_bad_rows_get_their_own_status():
+    rows = [GOOD_ROW, [1.0] * 9, ["a"] * 10, [None] * 10, [float("nan")] + GOOD_ROW[1:], 3, GOOD_ROW]
+    array, status = validate_samples(rows)
+    # null reads as NaN
+    assert status.tolist() == [OK, WRONG_LENGTH, NOT_NUMERIC, NON_FINITE, NON_FINITE, WRONG_LENGTH, OK]
+    np.testing.assert_array_equal(array[[0, 6]], np.float32([GOOD_ROW, GOOD_ROW]))
+
+
+def test_bounds_and_infinities_are_checked_per_row():
+    bounds = (np.zeros(10, np.float32), np.ones(10, np.float32))
+    array = np.float32([GOOD_ROW, [2.0] + GOOD_ROW[1:], [np.inf] + GOOD_ROW[1:], [-0.1] + GOOD_ROW[1:]])
+    _, status = validate_features(array, bounds)
+    assert status.tolist() == [OK, OUT_OF_BOUNDS, NON_FINITE, OUT_OF_BOUNDS]
+
+
+def test_integer_arrays_are_converted_and_wrong_widths_rejected():
+    array, status = validate_features(np.ones((3, 10), dtype=np.int64))
+    assert array.dtype == np.float32 and status.tolist() == [OK] * 3
+    with pytest.raises(InputError):
+        validate_features(np.ones((3, 9), dtype=np.float32))
+    with pytest.raises(InputError):
+        validate_features(np.array([["a"] * 10]))
+
+
+def test_feature_bounds_margin(tmp_path):
+    path = tmp_path / "feature_bounds.json"
+    path.write_text(json.dumps({"min": [0.0] * 10, "max": [2.0] * 10}))
+    low, high = load_feature_bounds(str(path), margin=0.5)
+    assert low.tolist() == [-1.0] * 10 and high.tolist() == [3.0] * 10
+    assert load_feature_bounds(str(tmp_path / "missing.json")) is None
+
+
+def test_partial_results_put_nulls_in_place_of_invalid_rows():
+    status = np.array([OK, NON_FINITE, OK], dtype=np.uint8)
+    body = json.loads(StdlibJsonCodec().dumps_predictions(np.array([1, 2]), status))
+    assert body == {"predictions": [1, None, 2], "status": ["ok", "non_finite", "ok"]}
+
+
+@pytest.fixture
+def inference(load_server):
+    return load_server(feature_bounds=(0.0, 1.0))
+
+
+def test_invocations_scores_only_valid_rows(inference):
+    scored = []
+    predict = inference.perform_inference
+    inference.perform_inference = lambda data: scored.append(len(data)) or predict(data)
+    client = inference.app.test_client()
+
+    response = client.post("/invocations", json=[GOOD_ROW, [1.0] * 3, [5.0] * 10, GOOD_ROW])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == ["ok", "wrong_length", "out_of_bounds", "ok"]
+    assert body["predictions"][1] is None and body["predictions"][2] is None
+    assert body["predictions"][0] is not None and body["predictions"][3] is not None
+    assert scored == [2]
+
+
+def test_invocations_keeps_the_plain_response_for_valid_batches(inference):
+    response = inference.app.test_client().post("/invocations", json=[GOOD_ROW, GOOD_ROW])
+    assert response.status_code == 200
+    assert list(response.get_json()) == ["predictions"]
+
+
+def test_invocations_rejects_batches_without_valid_rows(inference):
+    # 1e39 overflows float32, which JSON cannot express directly
+    response = inference.app.test_client().post("/invocations", json=[[1.0] * 3, [1e39] * 10])
+    assert response.status_code == 400
+    assert response.get_json()["status"] == ["wrong_length", "non_finite"]
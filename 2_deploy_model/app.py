@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 import aws_cdk as cdk
 from deploy_model.deploy_model_stack import DeployModelStack
+from deploy_model.sizing import load_sizing_profile
 
 app = cdk.App()
 env = cdk.Environment(region="ap-southeast-3")
-DeployModelStack(app, "DeployModelStack", env=env)
+# Endpoint sizing: cdk synth -c sizing_profile=path/to/profile.json (default sizing_profile.json)
+sizing_profile = load_sizing_profile(app.node.try_get_context("sizing_profile") or "sizing_profile.json")
+DeployModelStack(app, "DeployModelStack", sizing_profile=sizing_profile, env=env)
 app.synth()
\ No newline at end of file
@@ -9,9 +9,12 @@ cdk deploy --require-approval never
 # Get bucket name
 BUCKET_NAME=$(aws cloudformation describe-stacks --stack-name DeployModelStack --query "Stacks[0].Outputs[?OutputKey=='BucketName'].OutputValue" --output text)
 
-# Upload files to S3
-#echo "Uploading code.zip and model.tar.gz to S3..."
-#aws s3 cp ../1_model_creation/model_creation.zip s3://$BUCKET_NAME/model_creation.zip
+# Upload the CodeBuild source bundle to S3; skipped when the content hash of
+# 1_model_creation matches the one stored with the current code.zip
+echo "Syncing code.zip to S3..."
+python ../tools/artifact_sync.py ../1_model_creation s3://$BUCKET_NAME/code.zip --zip \
+    --exclude '*.png' --exclude 'eda_cache.json' --exclude 'model_selection.json' \
+    --cache .artifact_sync_cache.json
 
 # Get CodeBuild project name
 CODEBUILD_PROJECT=$(aws cloudformation describe-stacks --stack-name DeployModelStack --query "Stacks[0].Outputs[?OutputKey=='CodeBuildProjectName'].OutputValue" --output text)
@@ -6,15 +6,25 @@ from aws_cdk import (
     aws_iam as iam,
     aws_ec2 as ec2,
     aws_sagemaker as sagemaker,
+    aws_applicationautoscaling as appscaling,
 )
 import aws_cdk as cdk
 from constructs import Construct
 
+from deploy_model.sizing import load_sizing_profile, validate_sizing_profile
+
 class DeployModelStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    def __init__(self, scope: Construct, construct_id: str, sizing_profile: dict = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        # Variants and autoscaling of the endpoint (see deploy_model/sizing.py); without a
+        # profile, sizing_profile.json is used when present, else one ml.m5.large instance
+        if sizing_profile is None:
+            sizing_profile = load_sizing_profile("sizing_profile.json")
+        else:
+            sizing_profile = validate_sizing_profile(sizing_profile)
+
         # Load tags from configuration
         with open("resource_configuration.json", "r") as config_file:
             import json
@@ -34,6 +44,10 @@ class DeployModelStack(Stack):
             removal_policy=cdk.RemovalPolicy.DESTROY,
             auto_delete_images=True
         )
+        # The builder-stage image is the layer cache of the next build (see buildspec.yml); its
+        # own rule keeps it from being expired by the rule for the serving images
+        repository.add_lifecycle_rule(rule_priority=1, tag_prefix_list=["builder"], max_image_count=1,
+                                      description="Keep the latest build cache image")
         repository.add_lifecycle_rule(max_image_count=1, description="Keep only the latest image")
 
         # Create IAM role for CodeBuild
@@ -63,7 +77,9 @@ class DeployModelStack(Stack):
             ),
             environment_variables=environment_variables,
             role=codebuild_role,
-            build_spec=codebuild.BuildSpec.from_source_filename("buildspec.yml")
+            build_spec=codebuild.BuildSpec.from_source_filename("buildspec.yml"),
+            # Docker layers are also kept on the build host between builds that land on it
+            cache=codebuild.Cache.local(codebuild.LocalCacheMode.DOCKER_LAYER)
         )
 
         # Create VPC with two public subnets in different AZs
@@ -119,14 +135,17 @@ class DeployModelStack(Stack):
         )
 
         # Create SageMaker endpoint configuration
+        # One production variant per profile entry; traffic is split by the variant weights
         endpoint_config = sagemaker.CfnEndpointConfig(self, "MyEndpointConfig",
             production_variants=[
                 sagemaker.CfnEndpointConfig.ProductionVariantProperty(
                     model_name=model.attr_model_name,
-                    variant_name="AllTraffic",
-                    instance_type="ml.m5.large",
-                    initial_instance_count=1
+                    variant_name=variant["name"],
+                    instance_type=variant["instance_type"],
+                    initial_instance_count=variant["initial_instance_count"],
+                    initial_variant_weight=variant["weight"]
                 )
+                for variant in sizing_profile["variants"]
             ]
         )
 
@@ -136,6 +155,26 @@ class DeployModelStack(Stack):
             endpoint_config_name=endpoint_config.attr_endpoint_config_name
         )
 
+        # Target-tracking autoscaling of each variant's instance count on invocations per
+        # instance per minute; variants without a target keep a fixed count
+        for variant in sizing_profile["variants"]:
+            if variant["target_invocations_per_instance"] is None:
+                continue
+            scalable_target = appscaling.ScalableTarget(self, f"{variant['name']}ScalableTarget",
+                service_namespace=appscaling.ServiceNamespace.SAGEMAKER,
+                scalable_dimension="sagemaker:variant:DesiredInstanceCount",
+                resource_id=f"endpoint/{endpoint.attr_endpoint_name}/variant/{variant['name']}",
+                min_capacity=variant["min_capacity"],
+                max_capacity=variant["max_capacity"]
+            )
+            scalable_target.node.add_dependency(endpoint)
+            scalable_target.scale_to_track_metric(f"{variant['name']}InvocationsTracking",
+                target_value=variant["target_invocations_per_instance"],
+                predefined_metric=appscaling.PredefinedMetric.SAGEMAKER_VARIANT_INVOCATIONS_PER_INSTANCE,
+                scale_in_cooldown=cdk.Duration.seconds(sizing_profile["scale_in_cooldown_seconds"]),
+                scale_out_cooldown=cdk.Duration.seconds(sizing_profile["scale_out_cooldown_seconds"])
+            )
+
         # Outputs
         cdk.CfnOutput(self, "BucketName", value=bucket.bucket_name)
         cdk.CfnOutput(self, "ECRRepositoryURI", value=repository.repository_uri)
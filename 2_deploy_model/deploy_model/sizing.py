@@ -0,0 +1,107 @@
+# Sizing profile of the SageMaker endpoint
+#
+# A profile lists the production variants (instance type, instance counts, traffic weight) and
+# the target-tracking autoscaling settings of each. It is usually generated from load test
+# results with tools/sizing_profile.py and stored as sizing_profile.json; several variants of
+# different instance types split the traffic by weight, so they can be compared under real load.
+#
+# Example:
+# {
+#   "variants": [
+#     {
+#       "name": "AllTraffic",
+#       "instance_type": "ml.m5.large",
+#       "initial_instance_count": 1,
+#       "min_capacity": 1,
+#       "max_capacity": 4,
+#       "target_invocations_per_instance": 600,
+#       "weight": 1.0
+#     }
+#   ],
+#   "scale_in_cooldown_seconds": 300,
+#   "scale_out_cooldown_seconds": 60
+# }
+#
+# target_invocations_per_instance is in invocations per instance per minute, the unit of the
+# SageMakerVariantInvocationsPerInstance metric; without it a variant gets no scaling policy.
+
+import json
+import os
+import re
+
+DEFAULT_PROFILE = {
+    "variants": [
+        {
+            "name": "AllTraffic",
+            "instance_type": "ml.m5.large",
+            "initial_instance_count": 1,
+            "min_capacity": 1,
+            "max_capacity": 1,
+            "weight": 1.0,
+        }
+    ],
+    "scale_in_cooldown_seconds": 300,
+    "scale_out_cooldown_seconds": 60,
+}
+
+_VARIANT_NAME = re.compile(r"^[a-zA-Z0-9](-*[a-zA-Z0-9]){0,62}$")
+
+
+def load_sizing_profile(path="sizing_profile.json"):
+    """The validated profile stored at path, or the default single-instance profile if it does not exist."""
+    if not os.path.exists(path):
+        return validate_sizing_profile(DEFAULT_PROFILE)
+    with open(path, "r") as f:
+        return validate_sizing_profile(json.load(f))
+
+
+def validate_sizing_profile(profile):
+    """Fill in defaults and check a profile; raise ValueError when it cannot be deployed."""
+    variants = profile.get("variants")
+    if not variants:
+        raise ValueError("A sizing profile needs at least one variant")
+
+    checked = []
+    names = set()
+    for variant in variants:
+        name = variant.get("name", "AllTraffic")
+        if not _VARIANT_NAME.match(name):
+            raise ValueError(f"Invalid variant name {name!r}")
+        if name in names:
+            raise ValueError(f"Duplicate variant name {name!r}")
+        names.add(name)
+        if not str(variant.get("instance_type", "")).startswith("ml."):
+            raise ValueError(f"Variant {name}: instance_type must be a SageMaker type such as ml.m5.large")
+
+        initial = int(variant.get("initial_instance_count", variant.get("min_capacity", 1)))
+        min_capacity = int(variant.get("min_capacity", initial))
+        max_capacity = int(variant.get("max_capacity", max(initial, min_capacity)))
+        if not 1 <= min_capacity <= initial <= max_capacity:
+            raise ValueError(
+                f"Variant {name}: expected 1 <= min_capacity <= initial_instance_count <= max_capacity, "
+                f"got {min_capacity}, {initial}, {max_capacity}"
+            )
+        target = variant.get("target_invocations_per_instance")
+        if target is not None and float(target) <= 0:
+            raise ValueError(f"Variant {name}: target_invocations_per_instance must be positive")
+        weight = float(variant.get("weight", 1.0))
+        if weight < 0:
+            raise ValueError(f"Variant {name}: weight must not be negative")
+
+        checked.append({
+            "name": name,
+            "instance_type": variant["instance_type"],
+            "initial_instance_count": initial,
+            "min_capacity": min_capacity,
+            "max_capacity": max_capacity,
+            "target_invocations_per_instance": float(target) if target is not None else None,
+            "weight": weight,
+        })
+
+    if sum(variant["weight"] for variant in checked) <= 0:
+        raise ValueError("At least one variant needs a positive weight")
+    return {
+        "variants": checked,
+        "scale_in_cooldown_seconds": int(profile.get("scale_in_cooldown_seconds", 300)),
+        "scale_out_cooldown_seconds": int(profile.get("scale_out_cooldown_seconds", 60)),
+    }
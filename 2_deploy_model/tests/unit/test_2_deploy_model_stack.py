@@ -1,15 +1,123 @@
+import json
+import os
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
+
+from deploy_model.deploy_model_stack import DeployModelStack
+from deploy_model.sizing import validate_sizing_profile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TWO_VARIANTS = {
+    "variants": [
+        {"name": "m5-large", "instance_type": "ml.m5.large", "initial_instance_count": 2, "min_capacity": 2,
+         "max_capacity": 6, "target_invocations_per_instance": 900, "weight": 0.8},
+        {"name": "c5-large", "instance_type": "ml.c5.large", "min_capacity": 1, "max_capacity": 3,
+         "target_invocations_per_instance": 1200, "weight": 0.2},
+    ],
+    "scale_in_cooldown_seconds": 600,
+    "scale_out_cooldown_seconds": 30,
+}
+
+
+@pytest.fixture(autouse=True)
+def project_dir(monkeypatch):
+    # The stack reads resource_configuration.json and sizing_profile.json from the working directory
+    monkeypatch.chdir(PROJECT_DIR)
 
-from 2_deploy_model.2_deploy_model_stack import 2DeployModelStack
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in 2_deploy_model/2_deploy_model_stack.py
-def test_sqs_queue_created():
+def synth(sizing_profile=None):
     app = core.App()
-    stack = 2DeployModelStack(app, "2-deploy-model")
-    template = assertions.Template.from_stack(stack)
+    stack = DeployModelStack(app, "DeployModelStack", sizing_profile=sizing_profile)
+    return assertions.Template.from_stack(stack)
+
+
+def test_default_profile_keeps_one_fixed_instance():
+    template = synth()
+
+    template.has_resource_properties("AWS::SageMaker::EndpointConfig", {
+        "ProductionVariants": [assertions.Match.object_like({
+            "VariantName": "AllTraffic",
+            "InstanceType": "ml.m5.large",
+            "InitialInstanceCount": 1,
+            "InitialVariantWeight": 1,
+        })]
+    })
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 0)
+
+
+def test_weighted_variants_with_target_tracking():
+    template = synth(TWO_VARIANTS)
+
+    template.has_resource_properties("AWS::SageMaker::EndpointConfig", {
+        "ProductionVariants": [
+            assertions.Match.object_like({"VariantName": "m5-large", "InstanceType": "ml.m5.large",
+                                          "InitialInstanceCount": 2, "InitialVariantWeight": 0.8}),
+            assertions.Match.object_like({"VariantName": "c5-large", "InstanceType": "ml.c5.large",
+                                          "InitialInstanceCount": 1, "InitialVariantWeight": 0.2}),
+        ]
+    })
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 2)
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "ServiceNamespace": "sagemaker",
+        "ScalableDimension": "sagemaker:variant:DesiredInstanceCount",
+        "MinCapacity": 2,
+        "MaxCapacity": 6,
+        "ResourceId": {"Fn::Join": ["", [
+            "endpoint/", {"Fn::GetAtt": [assertions.Match.string_like_regexp("MyEndpoint"), "EndpointName"]},
+            "/variant/m5-large",
+        ]]},
+    })
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", 2)
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "PolicyType": "TargetTrackingScaling",
+        "TargetTrackingScalingPolicyConfiguration": {
+            "PredefinedMetricSpecification": {"PredefinedMetricType": "SageMakerVariantInvocationsPerInstance"},
+            "TargetValue": 1200,
+            "ScaleInCooldown": 600,
+            "ScaleOutCooldown": 30,
+        },
+    })
+
+
+def test_scalable_targets_wait_for_the_endpoint():
+    template = synth(TWO_VARIANTS)
+
+    targets = template.find_resources("AWS::ApplicationAutoScaling::ScalableTarget")
+    endpoint_id = next(iter(template.find_resources("AWS::SageMaker::Endpoint")))
+    assert all(endpoint_id in target.get("DependsOn", []) for target in targets.values())
+
+
+def test_variants_without_target_are_not_scaled():
+    profile = {"variants": [dict(TWO_VARIANTS["variants"][0], target_invocations_per_instance=None)]}
+    template = synth(profile)
+
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 0)
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", 0)
+
+
+@pytest.mark.parametrize("variant, message", [
+    ({"name": "a.b", "instance_type": "ml.m5.large"}, "Invalid variant name"),
+    ({"name": "a", "instance_type": "m5.large"}, "instance_type"),
+    ({"name": "a", "instance_type": "ml.m5.large", "min_capacity": 3, "max_capacity": 2}, "min_capacity"),
+    ({"name": "a", "instance_type": "ml.m5.large", "target_invocations_per_instance": 0}, "positive"),
+])
+def test_invalid_profiles_are_rejected(variant, message):
+    with pytest.raises(ValueError, match=message):
+        validate_sizing_profile({"variants": [variant]})
+
+
+def test_build_cache_image_survives_the_lifecycle_policy():
+    template = synth()
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+    repositories = template.find_resources("AWS::ECR::Repository")
+    policy = next(iter(repositories.values()))["Properties"]["LifecyclePolicy"]["LifecyclePolicyText"]
+    rules = json.loads(policy)["rules"]
+    assert rules[0]["selection"] == {"tagStatus": "tagged", "tagPrefixList": ["builder"],
+                                     "countType": "imageCountMoreThan", "countNumber": 1}
+    assert rules[-1]["selection"]["tagStatus"] == "any"
+    template.has_resource_properties("AWS::CodeBuild::Project", {
+        "Cache": {"Type": "LOCAL", "Modes": ["LOCAL_DOCKER_LAYER_CACHE"]},
+    })
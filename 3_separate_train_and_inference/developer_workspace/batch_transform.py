@@ -0,0 +1,159 @@
+# sagemaker_dev/batch_transform.py
+#
+# Local stand-in for a SageMaker Batch Transform job. Input files are split into
+# mini-batches, scored in a process pool through the model_fn/input_fn/predict_fn/output_fn
+# handlers of entrypoint/inference.py, and written to <input name>.out in the same order.
+#
+# Example:
+#   python batch_transform.py --model-dir model/ --input data/ --output out/ \
+#       --content-type text/csv --split-type Line --assemble-with Line --workers 8
+
+import argparse
+import collections
+import io
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'entrypoint'))
+import inference  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Set in each worker by _init_worker so the model is loaded once per process
+_model = None
+
+def _init_worker(model_dir, model_file):
+    global _model
+    # The handlers log every call at INFO; that would drown the progress output
+    logging.getLogger('inference').setLevel(logging.WARNING)
+    _model = joblib.load(model_file) if model_file else inference.model_fn(model_dir)
+
+def _transform(payload, content_type, accept):
+    """Run one mini-batch through the entrypoint handlers, like one /invocations request."""
+    data = inference.input_fn(payload, content_type)
+    prediction = inference.predict_fn(data, _model)
+    result, _ = inference.output_fn(prediction, accept)
+    if not isinstance(result, (str, bytes)):
+        # Streamed output from the handlers is joined so it can be returned to the parent
+        result = ''.join(result)
+    return result.encode() if isinstance(result, str) else result
+
+def _line_batches(path, max_payload_bytes, single_record):
+    """SplitType=Line: group lines into mini-batches no larger than the payload limit."""
+    batch, size = [], 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if batch and (single_record or size + len(line) > max_payload_bytes):
+                yield b''.join(batch)
+                batch, size = [], 0
+            if len(line) > max_payload_bytes:
+                raise ValueError(f"A record in {path} is larger than the maximum payload")
+            batch.append(line)
+            size += len(line)
+    if batch:
+        yield b''.join(batch)
+
+def _npy_batches(path, max_payload_bytes, single_record):
+    """Split an .npy file by rows; each mini-batch is re-encoded as an .npy payload."""
+    array = np.load(path, mmap_mode='r')
+    row_bytes = max(array[0:1].nbytes, 1)
+    rows_per_batch = 1 if single_record else max(max_payload_bytes // row_bytes, 1)
+    for start in range(0, len(array), rows_per_batch):
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(array[start:start + rows_per_batch]))
+        yield buffer.getvalue()
+
+def _whole_file(path, max_payload_bytes, single_record):
+    """SplitType=None: the whole file is one request."""
+    with open(path, 'rb') as f:
+        payload = f.read()
+    if len(payload) > max_payload_bytes:
+        raise ValueError(f"{path} is larger than the maximum payload; use --split-type Line")
+    yield payload
+
+def mini_batches(path, split_type, content_type, max_payload_bytes, single_record):
+    """Yield the request payloads for one input file."""
+    if split_type == 'None':
+        return _whole_file(path, max_payload_bytes, single_record)
+    if content_type == 'application/x-npy':
+        return _npy_batches(path, max_payload_bytes, single_record)
+    return _line_batches(path, max_payload_bytes, single_record)
+
+def list_inputs(input_path):
+    if os.path.isdir(input_path):
+        return sorted(
+            os.path.join(input_path, name) for name in os.listdir(input_path)
+            if os.path.isfile(os.path.join(input_path, name))
+        )
+    return [input_path]
+
+def transform_file(executor, path, output_path, args):
+    """Score one input file and write its outputs in input order."""
+    separator = b'\n' if args.assemble_with == 'Line' else b''
+    batches = mini_batches(
+        path, args.split_type, args.content_type,
+        int(args.max_payload_mb * 1024 * 1024), args.batch_strategy == 'SingleRecord'
+    )
+    # Keep a bounded window of mini-batches in flight so huge files never sit in memory
+    window = collections.deque()
+    count = 0
+    with open(output_path, 'wb') as out:
+        def write_next():
+            result = window.popleft().result()
+            out.write(result)
+            if separator and not result.endswith(separator):
+                out.write(separator)
+
+        for payload in batches:
+            window.append(executor.submit(_transform, payload, args.content_type, args.accept))
+            count += 1
+            if len(window) >= args.workers * 2:
+                write_next()
+        while window:
+            write_next()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a SageMaker-style batch transform locally")
+    parser.add_argument('--model-dir', help="Directory containing model.joblib (loaded with model_fn)")
+    parser.add_argument('--model-file', help="Any joblib/pickle model file, e.g. random_forest_model.pkl")
+    parser.add_argument('--input', required=True, help="Input file or directory of input files")
+    parser.add_argument('--output', required=True, help="Output directory for <input name>.out files")
+    parser.add_argument('--content-type', default='text/csv',
+                        choices=['text/csv', 'application/jsonlines', 'application/json', 'application/x-npy'])
+    parser.add_argument('--accept', default='text/csv',
+                        choices=['text/csv', 'application/jsonlines', 'application/json'])
+    parser.add_argument('--split-type', default='Line', choices=['None', 'Line'])
+    parser.add_argument('--batch-strategy', default='MultiRecord', choices=['MultiRecord', 'SingleRecord'])
+    parser.add_argument('--max-payload-mb', type=float, default=6, help="Maximum size of one mini-batch")
+    parser.add_argument('--assemble-with', default='Line', choices=['None', 'Line'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if not args.model_dir and not args.model_file:
+        parser.error("one of --model-dir or --model-file is required")
+    if args.split_type == 'Line' and args.content_type == 'application/json':
+        parser.error("application/json bodies cannot be split by line; use --split-type None")
+
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(args.model_dir, args.model_file)
+    ) as executor:
+        for path in list_inputs(args.input):
+            output_path = os.path.join(args.output, os.path.basename(path) + '.out')
+            count = transform_file(executor, path, output_path, args)
+            logger.info(f"{path}: {count} mini-batch(es) -> {output_path}")
+    logger.info(f"Batch transform finished in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# sagemaker_dev/benchmark_formats.py
+#
+# Compare CSV with the Parquet dataset written by code.py as training input. For every row
+# count the same synthetic data is written in both formats, then read back the way
+# entrypoint/train.py reads it, each read in a fresh subprocess so that peak RSS is not
+# polluted by earlier runs. Reports bytes on disk (= bytes uploaded), parse time and peak RSS.
+#
+# Example:
+#   python benchmark_formats.py --rows 1000000,10000000,100000000 --workdir /tmp/formats
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ENTRYPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'entrypoint')
+COLUMNS = ['feature1', 'feature2', 'feature3', 'target']
+
+# Rows generated and written at a time, so that 100M rows never have to fit in memory
+GENERATE_ROWS = 1_000_000
+# Same layout as code.py
+ROWS_PER_FILE = 1_000_000
+ROWS_PER_GROUP = 100_000
+
+def generate_batches(n_rows, seed=42):
+    """Yield the synthetic dataset of code.py as Arrow record batches of GENERATE_ROWS rows."""
+    import pyarrow as pa
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, GENERATE_ROWS):
+        n = min(GENERATE_ROWS, n_rows - start)
+        X = rng.uniform(0, 10, (n, 3))
+        y = X @ np.array([2.0, 3.0, 4.0]) + rng.normal(0, 1, n)
+        yield pa.RecordBatch.from_arrays([pa.array(X[:, i]) for i in range(3)] + [pa.array(y)], names=COLUMNS)
+
+def write_csv(n_rows, directory):
+    import pyarrow.csv as pacsv
+    os.makedirs(directory, exist_ok=True)
+    batches = generate_batches(n_rows)
+    first = next(batches)
+    with pacsv.CSVWriter(os.path.join(directory, 'train.csv'), first.schema) as writer:
+        writer.write_batch(first)
+        for batch in batches:
+            writer.write_batch(batch)
+
+def write_parquet(n_rows, directory):
+    import pyarrow.dataset as ds
+    batches = generate_batches(n_rows)
+    first = next(batches)
+    ds.write_dataset(
+        _chain(first, batches), directory, format='parquet', schema=first.schema,
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        basename_template='part-{i}.parquet', existing_data_behavior='delete_matching',
+        max_rows_per_file=ROWS_PER_FILE,
+        min_rows_per_group=ROWS_PER_GROUP, max_rows_per_group=ROWS_PER_GROUP,
+    )
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+def directory_bytes(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+def read_once(directory, reader):
+    """Child process: read the dataset like train.py and print the measurements as JSON."""
+    sys.path.insert(0, ENTRYPOINT_DIR)
+    import train
+    started = time.perf_counter()
+    if reader == 'in-memory':
+        if train.parquet_files(directory):
+            df, _ = train.read_parquet(directory)
+        else:
+            df = train.pd.read_csv(os.path.join(directory, 'train.csv'))
+        rows = len(df)
+    else:
+        # Out-of-core statistics in this process, so that RSS covers all of the reading
+        tasks, columns = train.plan_tasks(directory, chunk_rows=100000)
+        rows = sum(train._stats_task(task)['rows'] for task in tasks)
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(json.dumps({'rows': rows, 'seconds': round(elapsed, 3), 'peak_rss_mb': round(peak_mb, 1)}))
+
+def measure(directory, reader):
+    output = subprocess.check_output([sys.executable, __file__, '--read', directory, '--reader', reader], text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs Parquet training input")
+    parser.add_argument('--rows', default='1000000,10000000,100000000', help="Comma-separated row counts")
+    parser.add_argument('--readers', default='in-memory,out-of-core', help="train.py code paths to time")
+    parser.add_argument('--workdir', default='/tmp/benchmark_formats')
+    parser.add_argument('--keep', action='store_true', help="Keep the generated datasets")
+    parser.add_argument('--output', default='benchmark_formats.json')
+    parser.add_argument('--read', help=argparse.SUPPRESS)
+    parser.add_argument('--reader', default='in-memory', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.read:
+        read_once(args.read, args.reader)
+        return
+
+    results = []
+    for n_rows in map(int, args.rows.split(',')):
+        for fmt, write in (('csv', write_csv), ('parquet', write_parquet)):
+            directory = os.path.join(args.workdir, f'{fmt}-{n_rows}')
+            shutil.rmtree(directory, ignore_errors=True)
+            started = time.perf_counter()
+            write(n_rows, directory)
+            write_seconds = time.perf_counter() - started
+            size = directory_bytes(directory)
+            for reader in args.readers.split(','):
+                result = measure(directory, reader)
+                result.update(format=fmt, reader=reader, bytes=size, write_seconds=round(write_seconds, 3))
+                results.append(result)
+                print(f"{fmt:>7} rows={n_rows:<10} reader={reader:<11} bytes={size / 2**20:9.1f}MB "
+                      f"parse={result['seconds']:8.2f}s peak_rss={result['peak_rss_mb']:8.1f}MB")
+            if not args.keep:
+                shutil.rmtree(directory)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,34 @@
 # sagemaker_dev/code.py
+import os
+import sys
 import boto3
 import sagemaker
+from sagemaker.inputs import TrainingInput
 from sagemaker.sklearn import SKLearn
 import numpy as np
 import pandas as pd
 
+# Shared tooling at the repository root (hash-based incremental S3 upload)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+from artifact_sync import sync
+
+# Input mode of the train channel: File downloads the whole channel before train.py starts,
+# FastFile streams files lazily from S3, and Pipe streams them through a FIFO. With the
+# streaming modes, startup no longer grows with the dataset size.
+input_mode = os.environ.get('TRAINING_INPUT_MODE', 'File')
+
+# Training data is written as a Parquet dataset (zstd-compressed part files whose row groups
+# match train.py's chunk size) unless TRAINING_DATA_FORMAT=csv. Pipe mode concatenates the
+# objects into one stream, which only works for CSV.
+data_format = os.environ.get('TRAINING_DATA_FORMAT', 'parquet')
+if input_mode == 'Pipe':
+    data_format = 'csv'
+ROWS_PER_FILE = 1_000_000
+ROWS_PER_GROUP = 100_000
+
 # 1) Generate synthetic data
 np.random.seed(42)
-n_samples = 100
+n_samples = int(os.environ.get('TRAINING_ROWS', 100))
 feature1 = np.random.uniform(0, 10, n_samples)
 feature2 = np.random.uniform(0, 10, n_samples)
 feature3 = np.random.uniform(0, 10, n_samples)
@@ -19,20 +40,43 @@ df = pd.DataFrame({
     'feature3': feature3,
     'target':   target
 })
-df.to_csv('train.csv', index=False)
+if data_format == 'parquet':
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False), 'train', format='parquet',
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        basename_template='part-{i}.parquet', existing_data_behavior='delete_matching',
+        max_rows_per_file=ROWS_PER_FILE,
+        min_rows_per_group=ROWS_PER_GROUP, max_rows_per_group=ROWS_PER_GROUP,
+    )
+    local_files = sorted(os.path.join('train', name) for name in os.listdir('train'))
+    s3_prefix, content_type = 'data/train-parquet', 'application/x-parquet'
+else:
+    df.to_csv('train.csv', index=False)
+    local_files = ['train.csv']
+    s3_prefix, content_type = 'data', 'text/csv'
 
-# 2) Upload to S3
+# 2) Upload to S3; files whose content hash already matches the object in S3 are skipped.
+# The whole prefix is the Parquet channel, so part files left by a larger earlier run are
+# deleted; otherwise training would read them too.
 bucket = 'sagemaker-ap-southeast-3-623127157773'
-s3_path = 'data/train.csv'
-boto3.client('s3', region_name='ap-southeast-3') \
-      .upload_file('train.csv', bucket, s3_path)
-s3_uri = f's3://{bucket}/{s3_path}'
-print(f"Uploaded train.csv to {s3_uri}")
+if data_format == 'parquet':
+    s3_uri = f's3://{bucket}/{s3_prefix}/'
+    results = sync('train', s3_uri, region='ap-southeast-3', prune=True)
+else:
+    s3_uri = f's3://{bucket}/{s3_prefix}/train.csv'
+    results = sync('train.csv', s3_uri, region='ap-southeast-3')
+uploaded = sum(result['uploaded'] for result in results)
+deleted = sum(bool(result.get('deleted')) for result in results)
+print(f"Uploaded {uploaded} of {len(local_files)} {data_format} file(s) to {s3_uri}, deleted {deleted} stale object(s)")
 
 # 3) Configure and run the SKLearn estimator using train.py
 boto_sess = boto3.Session(region_name='ap-southeast-3')
 sm_sess   = sagemaker.Session(boto_session=boto_sess)
 
+hyperparameters = {} if input_mode == 'File' else {'mode': 'out-of-core'}
+
 output_path = f's3://{bucket}/output'
 sklearn_estimator = SKLearn(
     entry_point='train.py',       # <-- training script
@@ -42,8 +86,10 @@ sklearn_estimator = SKLearn(
     framework_version='0.23-1',
     py_version='py3',
     output_path=output_path,
+    input_mode=input_mode,
+    hyperparameters=hyperparameters,
     sagemaker_session=sm_sess
 )
 
-sklearn_estimator.fit({'train': s3_uri})
+sklearn_estimator.fit({'train': TrainingInput(s3_uri, content_type=content_type, input_mode=input_mode)})
 print("Training complete:", sklearn_estimator.latest_training_job.name)
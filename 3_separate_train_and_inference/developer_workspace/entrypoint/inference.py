@@ -1,43 +1,172 @@
 # sagemaker_dev/entrypoint/inference.py
 
+import time
+# Taken before the remaining imports so the cold-start cost can be reported
+_import_started = time.perf_counter()
+
+import io
+import itertools
 import os
 import json
+import threading
 import joblib
 import numpy as np
-import pandas as pd
 import logging
 
+# pandas is only needed for text/csv bodies, so it is imported there instead of here
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+logger.info(f"Imports took {(time.perf_counter() - _import_started) * 1000:.1f} ms")
+_first_prediction_pending = True
+_first_prediction_lock = threading.Lock()
+
+# Rows per chunk when streaming text/csv and application/jsonlines bodies.
+# Each chunk is parsed, predicted and serialized before the next one is read, so memory
+# stays flat for large batch transform payloads. Set to 0 to process bodies in one piece.
+CHUNK_ROWS = int(os.environ.get('INFERENCE_CHUNK_ROWS', 10000))
 
 def model_fn(model_dir):
-    """Load the trained model from model_dir/model.joblib."""
+    """Load the trained model from model_dir/model.joblib, memory-mapping its arrays."""
     path = os.path.join(model_dir, 'model.joblib')
     logger.info(f"Loading model from {path}")
-    model = joblib.load(path)
+    started = time.perf_counter()
+    # train.py saves the model uncompressed, so numpy arrays are mapped instead of copied
+    model = joblib.load(path, mmap_mode='r')
+    logger.info(f"Model loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
     return model
 
+def _as_buffer(request_body):
+    """Wrap a str/bytes body in a file-like object; buffers are returned unchanged."""
+    if isinstance(request_body, str):
+        return io.StringIO(request_body)
+    if isinstance(request_body, (bytes, bytearray)):
+        return io.BytesIO(request_body)
+    return request_body
+
+def _csv_chunks(request_body):
+    import pandas as pd
+    for df in pd.read_csv(_as_buffer(request_body), header=None, chunksize=CHUNK_ROWS):
+        # Converting while parsing makes non-numeric values fail here rather than in predict
+        yield df.to_numpy(dtype=np.float64)
+
+def _jsonlines_chunks(request_body):
+    rows = []
+    for line in _as_buffer(request_body):
+        if line.strip():
+            rows.append(json.loads(line))
+        if len(rows) == CHUNK_ROWS:
+            yield np.array(rows, dtype=np.float64)
+            rows = []
+    if rows:
+        yield np.array(rows, dtype=np.float64)
+
+def _eager(chunks):
+    """
+    Parse the first chunk now and return a generator over all chunks.
+
+    Chunks are otherwise parsed only once the response is being streamed, after the success
+    status has been sent, so a malformed or empty body would end as a truncated 200. Errors in
+    the first chunk (and an empty body) raise here instead, before streaming starts.
+    """
+    try:
+        first = next(chunks)
+    except StopIteration:
+        raise ValueError("Empty request body")
+    return itertools.chain([first], chunks)
+
 def input_fn(request_body, content_type='application/json'):
-    """Deserialize input into a NumPy array."""
+    """
+    Deserialize input into a NumPy array.
+
+    With INFERENCE_CHUNK_ROWS > 0, text/csv and application/jsonlines bodies are returned
+    as a generator of arrays of at most CHUNK_ROWS rows instead of a single array.
+    """
     logger.info(f"Deserializing input; Content-Type={content_type}")
     if content_type == 'application/json':
         data = np.array(json.loads(request_body))
     elif content_type == 'text/csv':
-        df = pd.read_csv(request_body, header=None)
+        if CHUNK_ROWS:
+            return _eager(_csv_chunks(request_body))
+        import pandas as pd
+        df = pd.read_csv(_as_buffer(request_body), header=None)
         data = df.values
+    elif content_type == 'application/jsonlines':
+        if CHUNK_ROWS:
+            return _eager(_jsonlines_chunks(request_body))
+        data = np.array([json.loads(line) for line in _as_buffer(request_body) if line.strip()])
+    elif content_type == 'application/x-npy':
+        data = np.load(_as_buffer(request_body), allow_pickle=False)
     else:
         raise ValueError(f"Unsupported content type: {content_type}")
     return data
 
+def _log_first_prediction():
+    """Log the time from import to the first computed prediction, once per process."""
+    global _first_prediction_pending
+    if not _first_prediction_pending:
+        return
+    with _first_prediction_lock:
+        if not _first_prediction_pending:
+            return
+        _first_prediction_pending = False
+    logger.info(f"Time to first prediction: {time.perf_counter() - _import_started:.2f} s after import")
+
+def _predict_chunks(chunks, model):
+    for chunk in chunks:
+        prediction = model.predict(chunk)
+        _log_first_prediction()
+        yield prediction
+
 def predict_fn(input_data, model):
-    """Make predictions."""
+    """Make predictions, chunk by chunk when input_fn streamed the input."""
+    if not isinstance(input_data, np.ndarray):
+        logger.info("Running model.predict per chunk")
+        return _predict_chunks(input_data, model)
     logger.info("Running model.predict")
-    return model.predict(input_data)
+    prediction = model.predict(input_data)
+    _log_first_prediction()
+    return prediction
+
+def _to_csv(prediction):
+    rows = prediction.reshape(len(prediction), -1).tolist()
+    return ''.join(','.join(map(str, row)) + '\n' for row in rows)
+
+def _to_jsonlines(prediction):
+    return ''.join(json.dumps(row) + '\n' for row in prediction.tolist())
+
+def _stream_json_array(chunks):
+    # Emit one JSON array across all chunks: "[" + items joined by "," + "]"
+    yield '['
+    first = True
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        items = json.dumps(chunk.tolist())[1:-1]
+        yield items if first else ',' + items
+        first = False
+    yield ']'
 
 def output_fn(prediction, accept='application/json'):
-    """Serialize prediction output."""
+    """
+    Serialize prediction output.
+
+    Streamed predictions are serialized lazily; the returned generator is sent to the client
+    chunk by chunk by the serving container.
+    """
     logger.info(f"Serializing output; Accept={accept}")
+    streaming = not isinstance(prediction, np.ndarray)
     if accept == 'application/json':
+        if streaming:
+            return _stream_json_array(prediction), accept
         return json.dumps(prediction.tolist()), accept
+    elif accept == 'text/csv':
+        if streaming:
+            return (_to_csv(chunk) for chunk in prediction), accept
+        return _to_csv(prediction), accept
+    elif accept == 'application/jsonlines':
+        if streaming:
+            return (_to_jsonlines(chunk) for chunk in prediction), accept
+        return _to_jsonlines(prediction), accept
     else:
-        raise ValueError(f"Unsupported accept type: {accept}")
\ No newline at end of file
+        raise ValueError(f"Unsupported accept type: {accept}")
@@ -1,7 +1,11 @@
 # sagemaker_dev/entrypoint/train.py
 
+import argparse
+import json
 import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.linear_model import LinearRegression
 import joblib
 import logging
@@ -9,10 +13,18 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def train(train_dir, model_dir):
-    csv_path = os.path.join(train_dir, 'train.csv')
-    logger.info(f"Loading data from {csv_path}")
-    df = pd.read_csv(csv_path)
+# Bytes of CSV handed to one out-of-core task; large files are split into ranges of this size
+CSV_RANGE_BYTES = 64 * 1024 * 1024
+
+def train(train_dir, model_dir, target=None, features=None):
+    if parquet_files(train_dir):
+        logger.info(f"Loading Parquet dataset from {train_dir}")
+        df, columns = read_parquet(train_dir, target, features)
+    else:
+        csv_path = os.path.join(train_dir, 'train.csv')
+        logger.info(f"Loading data from {csv_path}")
+        columns = select_columns(_csv_header(csv_path), target, features)
+        df = pd.read_csv(csv_path, usecols=columns)[columns]
     X = df.iloc[:, :-1]
     y = df.iloc[:, -1]
 
@@ -20,13 +32,246 @@ def train(train_dir, model_dir):
     model = LinearRegression()
     model.fit(X, y)
 
+    save_model(model, model_dir)
+
+def save_model(model, model_dir):
     os.makedirs(model_dir, exist_ok=True)
     model_path = os.path.join(model_dir, 'model.joblib')
-    joblib.dump(model, model_path)
+    # Uncompressed so model_fn can load it with mmap_mode='r'
+    joblib.dump(model, model_path, compress=0)
     logger.info(f"Model saved to {model_path}")
 
+# --- Columnar input ---
+# Parquet datasets (part files with row groups sized for streaming) are read through pyarrow:
+# only the selected columns are decoded, and rows with a null target are filtered by the
+# scanner, which skips whole row groups using their statistics. CSV remains the fallback.
+
+def select_columns(names, target=None, features=None):
+    """Columns to read, features first and the target (the last column by default) last."""
+    target = target or names[-1]
+    if features is None:
+        features = [name for name in names if name != target]
+    missing = [name for name in list(features) + [target] if name not in names]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in {names}")
+    return list(features) + [target]
+
+def channel_files(train_dir):
+    """Every file under train_dir, including subdirectories such as hive partitions (key=value/)."""
+    paths = []
+    for root, dirs, names in os.walk(train_dir):
+        dirs[:] = [name for name in dirs if not name.startswith(('.', '_'))]
+        paths.extend(os.path.join(root, name) for name in names if not name.startswith(('.', '_')))
+    return sorted(paths)
+
+def parquet_files(train_dir):
+    return [path for path in channel_files(train_dir) if path.endswith('.parquet')]
+
+def read_parquet(train_dir, target=None, features=None):
+    """Load the selected columns of every Parquet file in train_dir, dropping null targets."""
+    import pyarrow.dataset as ds
+    # Keys of hive-style directories (e.g. year=2024/) become columns
+    dataset = ds.dataset(parquet_files(train_dir), format='parquet', partitioning='hive',
+                         partition_base_dir=train_dir)
+    columns = select_columns(dataset.schema.names, target, features)
+    table = dataset.to_table(columns=columns, filter=ds.field(columns[-1]).is_valid())
+    return table.to_pandas(), columns
+
+def _target_all_null(metadata, row_group, column_index):
+    """True when the row group statistics show that the target column holds only nulls."""
+    column = metadata.row_group(row_group).column(column_index)
+    return (column.statistics is not None and column.statistics.has_null_count
+            and column.statistics.null_count == column.num_values)
+
+# --- Out-of-core training ---
+# Every file in the channel is read as a stream of chunks. Each chunk only contributes to the
+# sufficient statistics of least squares: the row count, the column means and the centred
+# cross-products of [X, y], which have a fixed size of (features + 1)^2 no matter how many rows
+# are seen. Chunks and tasks (CSV byte ranges and Parquet row groups, accumulated in a process
+# pool) are combined with Chan et al.'s pairwise update, so no raw sums of squares are formed:
+# large feature offsets do not cost precision. The solve still works on X'X of the centred
+# features, whose condition number is the square of X's; with nearly collinear features
+# (condition number of X above ~1e7) the coefficients lose precision against the in-memory fit.
+
+def _merge(stats, other):
+    """Combine into stats the statistics of another, disjoint set of rows."""
+    n_a, n_b = stats['rows'], other['rows']
+    if n_b == 0:
+        return
+    n = n_a + n_b
+    delta = other['mean'] - stats['mean']
+    stats['m2'] += other['m2'] + np.outer(delta, delta) * (n_a * n_b / n)
+    stats['mean'] += delta * (n_b / n)
+    stats['rows'] = n
+
+def _accumulate(stats, values):
+    """Add the statistics of one chunk whose last column is the target."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return
+    mean = values.mean(axis=0)
+    centred = values - mean
+    _merge(stats, {'rows': len(values), 'mean': mean, 'm2': centred.T @ centred})
+
+def _empty_stats(n_columns):
+    return {'rows': 0, 'mean': np.zeros(n_columns), 'm2': np.zeros((n_columns, n_columns))}
+
+def _csv_header(path):
+    with open(path, 'rb') as f:
+        return f.readline().decode().strip().split(',')
+
+def _accumulate_csv_lines(stats, lines, chunk_rows, header=None, usecols=None):
+    """Parse CSV lines in chunks of chunk_rows, skipping blank lines and repeats of the header."""
+    chunk = []
+    for line in lines:
+        if not line.strip() or line.strip() == header:
+            continue
+        chunk.append(line)
+        if len(chunk) == chunk_rows:
+            _accumulate(stats, np.loadtxt(chunk, delimiter=',', ndmin=2, usecols=usecols))
+            chunk = []
+    if chunk:
+        _accumulate(stats, np.loadtxt(chunk, delimiter=',', ndmin=2, usecols=usecols))
+
+def _lines_until(f, end):
+    while f.tell() < end:
+        line = f.readline()
+        if not line:
+            return
+        yield line
+
+def _csv_range_stats(path, start, end, chunk_rows, usecols):
+    """Statistics of the selected columns of the CSV lines that start inside [start, end)."""
+    stats = _empty_stats(len(usecols))
+    with open(path, 'rb') as f:
+        if start == 0:
+            f.readline()  # header
+        else:
+            # The line straddling start belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        _accumulate_csv_lines(stats, _lines_until(f, end), chunk_rows, usecols=usecols)
+    return stats
+
+def _parquet_row_group_stats(path, row_group, chunk_rows, columns):
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(path)
+    stats = _empty_stats(len(columns))
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, row_groups=[row_group], columns=columns):
+        values = np.column_stack([column.to_numpy(zero_copy_only=False) for column in batch.columns])
+        # Nulls arrive as NaN; rows without a target are dropped
+        _accumulate(stats, values[~np.isnan(values[:, -1])])
+    return stats
+
+def _stats_task(task):
+    kind, args = task
+    if kind == 'csv':
+        return _csv_range_stats(*args)
+    return _parquet_row_group_stats(*args)
+
+def plan_tasks(train_dir, chunk_rows, target=None, features=None):
+    """Split every CSV/Parquet file of the channel into independently readable tasks."""
+    tasks, columns = [], None
+    for path in channel_files(train_dir):
+        if path.endswith('.csv'):
+            header = _csv_header(path)
+            file_columns = select_columns(header, target, features)
+            usecols = [header.index(column) for column in file_columns]
+            size = os.path.getsize(path)
+            for start in range(0, max(size, 1), CSV_RANGE_BYTES):
+                tasks.append(('csv', (path, start, min(start + CSV_RANGE_BYTES, size), chunk_rows, usecols)))
+        elif path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(path)
+            names = parquet_file.schema_arrow.names
+            file_columns = select_columns(names, target, features)
+            target_index = parquet_file.schema_arrow.get_field_index(file_columns[-1])
+            for row_group in range(parquet_file.num_row_groups):
+                if _target_all_null(parquet_file.metadata, row_group, target_index):
+                    continue
+                tasks.append(('parquet', (path, row_group, chunk_rows, file_columns)))
+        else:
+            continue
+        if columns is None:
+            columns = file_columns
+        elif file_columns != columns:
+            raise ValueError(f"{path} has columns {file_columns}, expected {columns}")
+    if not tasks:
+        raise ValueError(f"No .csv or .parquet files found in {train_dir}")
+    return tasks, columns
+
+def solve(stats, columns):
+    """Build a LinearRegression equivalent to fitting on all rows from the combined statistics."""
+    m2, mean = stats['m2'], stats['mean']
+    coef = np.linalg.lstsq(m2[:-1, :-1], m2[:-1, -1], rcond=None)[0]
+    model = LinearRegression()
+    model.coef_ = coef
+    model.intercept_ = float(mean[-1] - mean[:-1] @ coef)
+    model.n_features_in_ = len(columns) - 1
+    model.feature_names_in_ = np.asarray(columns[:-1], dtype=object)
+    return model
+
+def train_out_of_core(train_dir, model_dir, chunk_rows=100000, workers=None, target=None, features=None):
+    tasks, columns = plan_tasks(train_dir, chunk_rows, target, features)
+    logger.info(f"Accumulating statistics over {len(tasks)} task(s) with {workers or os.cpu_count()} worker(s)")
+    stats = _empty_stats(len(columns))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for task_stats in executor.map(_stats_task, tasks):
+            _merge(stats, task_stats)
+
+    logger.info(f"Solving LinearRegression from {stats['rows']} rows")
+    model = solve(stats, columns)
+    save_model(model, model_dir)
+
+# --- Pipe mode ---
+# In Pipe mode SageMaker streams the channel from S3 into a FIFO named <channel dir>_<epoch>
+# instead of downloading it first, so training starts immediately whatever the dataset size.
+# All objects under the S3 prefix arrive concatenated, so each file's repeated CSV header is
+# dropped. A FIFO can only be read once, front to back, so this path runs in one process.
+
+def channel_input_mode(channel):
+    """Return File, FastFile or Pipe for a channel, as configured on the training job."""
+    config = os.environ.get('SM_INPUT_DATA_CONFIG')
+    if config is None:
+        config_path = '/opt/ml/input/config/inputdataconfig.json'
+        if not os.path.exists(config_path):
+            return 'File'
+        with open(config_path) as f:
+            config = f.read()
+    return json.loads(config).get(channel, {}).get('TrainingInputMode', 'File')
+
+def train_from_pipe(pipe_path, model_dir, chunk_rows=100000, target=None, features=None):
+    logger.info(f"Streaming CSV data from pipe {pipe_path}")
+    with open(pipe_path, 'rb') as pipe:
+        header = pipe.readline().strip()
+        names = header.decode().split(',')
+        columns = select_columns(names, target, features)
+        usecols = [names.index(column) for column in columns]
+        stats = _empty_stats(len(columns))
+        _accumulate_csv_lines(stats, pipe, chunk_rows, header=header, usecols=usecols)
+
+    logger.info(f"Solving LinearRegression from {stats['rows']} rows")
+    model = solve(stats, columns)
+    save_model(model, model_dir)
+
 if __name__ == "__main__":
+    # SageMaker passes hyperparameters as --name value arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['in-memory', 'out-of-core'], default='in-memory')
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--epoch', type=int, default=0, help="Pipe to read in Pipe mode")
+    parser.add_argument('--target', default=None, help="Target column (defaults to the last one)")
+    parser.add_argument('--features', default=None, help="Comma-separated feature columns (defaults to all others)")
+    args, _ = parser.parse_known_args()
+    features = args.features.split(',') if args.features else None
+
     # SageMaker mounts channel 'train' at /opt/ml/input/data/train
     train_dir = os.environ.get('SM_CHANNEL_TRAIN', '/opt/ml/input/data/train')
     model_dir = os.environ.get('SM_MODEL_DIR',     '/opt/ml/model')
-    train(train_dir, model_dir)
+    if channel_input_mode('train') == 'Pipe':
+        train_from_pipe(f"{train_dir}_{args.epoch}", model_dir, args.chunk_rows, args.target, features)
+    elif args.mode == 'out-of-core':
+        train_out_of_core(train_dir, model_dir, args.chunk_rows, args.workers, args.target, features)
+    else:
+        train(train_dir, model_dir, args.target, features)
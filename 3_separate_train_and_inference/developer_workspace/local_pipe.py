@@ -0,0 +1,78 @@
+# sagemaker_dev/local_pipe.py
+#
+# Local stand-in for SageMaker Pipe input mode. Creates the FIFO <channel dir>_<epoch>,
+# streams the source files into it back to back (as SageMaker does with the objects under
+# an S3 prefix), and runs a training command with the SM_* variables pointing at it.
+#
+# Example:
+#   python local_pipe.py --source train.csv --workdir /tmp/sm -- python entrypoint/train.py
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+
+# Bytes copied into the FIFO per write
+_COPY_BYTES = 1024 * 1024
+
+def feed_pipe(pipe_path, source_files):
+    """Write the source files into the FIFO one after another, then close it (end of data)."""
+    # Opening a FIFO for writing blocks until the training script opens it for reading
+    with open(pipe_path, 'wb') as pipe:
+        for path in source_files:
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(_COPY_BYTES)
+                    if not block:
+                        break
+                    pipe.write(block)
+
+def emulate_pipe(source_files, channel_dir, epoch=0):
+    """Create the FIFO for one epoch and start feeding it in a background thread."""
+    pipe_path = f"{channel_dir}_{epoch}"
+    if os.path.exists(pipe_path):
+        os.remove(pipe_path)
+    os.makedirs(os.path.dirname(pipe_path) or '.', exist_ok=True)
+    os.mkfifo(pipe_path)
+    writer = threading.Thread(target=feed_pipe, args=(pipe_path, source_files), daemon=True)
+    writer.start()
+    return pipe_path, writer
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a training command against an emulated Pipe-mode channel")
+    parser.add_argument('--source', nargs='+', required=True, help="Files streamed into the pipe, in order")
+    parser.add_argument('--workdir', default='/tmp/sagemaker-local', help="Stands in for /opt/ml")
+    parser.add_argument('--channel', default='train')
+    parser.add_argument('command', nargs=argparse.REMAINDER, help="Training command, after --")
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        parser.error("a training command is required after --")
+
+    channel_dir = os.path.join(args.workdir, 'input', 'data', args.channel)
+    pipe_path, writer = emulate_pipe(args.source, channel_dir)
+
+    env = dict(os.environ)
+    env[f'SM_CHANNEL_{args.channel.upper()}'] = channel_dir
+    env['SM_MODEL_DIR'] = os.path.join(args.workdir, 'model')
+    env['SM_INPUT_DATA_CONFIG'] = json.dumps({args.channel: {'TrainingInputMode': 'Pipe'}})
+    try:
+        returncode = subprocess.call(command, env=env)
+    finally:
+        if writer.is_alive():
+            # The command exited without draining the pipe; unblock the writer
+            try:
+                with open(pipe_path, 'rb', buffering=0) as f:
+                    while f.read(_COPY_BYTES):
+                        pass
+            except OSError:
+                pass
+        writer.join(timeout=5)
+        os.remove(pipe_path)
+    sys.exit(returncode)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+ENTRYPOINT = os.path.join(os.path.dirname(__file__), "..", "..", "developer_workspace", "entrypoint", "inference.py")
+
+
+@pytest.fixture
+def entrypoint(monkeypatch):
+    """The SKLearn entrypoint module, loaded under its own name, streaming in chunks of 2 rows."""
+    monkeypatch.setenv("INFERENCE_CHUNK_ROWS", "2")
+    spec = importlib.util.spec_from_file_location("entrypoint_inference", ENTRYPOINT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def model():
+    X = np.random.default_rng(0).random((100, 3))
+    return RandomForestClassifier(n_estimators=3, random_state=0).fit(X, X[:, 0] > 0.5)
+
+
+def serve(entrypoint, model, body, content_type, accept="application/json"):
+    data = entrypoint.input_fn(body, content_type)
+    output, _ = entrypoint.output_fn(entrypoint.predict_fn(data, model), accept)
+    return output if isinstance(output, str) else "".join(output)
+
+
+def test_streamed_csv_matches_a_single_predict(entrypoint, model):
+    rows = np.random.default_rng(1).random((5, 3))
+    body = "".join(",".join(map(str, row)) + "\n" for row in rows)
+    assert json.loads(serve(entrypoint, model, body, "text/csv")) == model.predict(rows).tolist()
+
+
+@pytest.mark.parametrize("content_type", ["text/csv", "application/jsonlines"])
+def test_empty_body_fails_before_streaming(entrypoint, content_type):
+    with pytest.raises(ValueError):
+        entrypoint.input_fn("", content_type)
+
+
+def test_malformed_csv_fails_before_streaming(entrypoint):
+    with pytest.raises(ValueError):
+        entrypoint.input_fn("1,2,3\n4,5,6,7,8\n", "text/csv")
+
+
+def test_non_numeric_csv_fails_before_streaming(entrypoint):
+    with pytest.raises(ValueError):
+        entrypoint.input_fn("1,2,x\n4,5,6\n", "text/csv")
+
+
+def test_ragged_jsonlines_fail_before_streaming(entrypoint):
+    with pytest.raises(ValueError):
+        entrypoint.input_fn("[1, 2, 3]\n[4, 5]\n", "application/jsonlines")
+
+
+def test_first_prediction_is_logged_once_after_predicting(entrypoint, model, caplog):
+    caplog.set_level("INFO")
+    rows = np.random.default_rng(1).random((4, 3))
+    predictions = entrypoint.predict_fn(iter([rows[:2], rows[2:]]), model)
+    assert "Time to first prediction" not in caplog.text
+
+    next(predictions)
+    assert caplog.text.count("Time to first prediction") == 1
+
+    list(predictions)
+    entrypoint.predict_fn(rows, model)
+    assert caplog.text.count("Time to first prediction") == 1
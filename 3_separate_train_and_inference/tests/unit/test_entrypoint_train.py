@@ -0,0 +1,91 @@
+import importlib.util
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+ENTRYPOINT = os.path.join(os.path.dirname(__file__), "..", "..", "developer_workspace", "entrypoint", "train.py")
+
+
+@pytest.fixture(scope="module")
+def entrypoint():
+    """The training entrypoint module, loaded under its own name (registered so pool workers find it)."""
+    spec = importlib.util.spec_from_file_location("entrypoint_train", ENTRYPOINT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["entrypoint_train"] = module
+    spec.loader.exec_module(module)
+    yield module
+    del sys.modules["entrypoint_train"]
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((60, 3)), columns=["a", "b", "noise"])
+    df["y"] = 2 * df["a"] - 3 * df["b"] + 1
+    return df
+
+
+def test_pipe_mode_uses_target_and_features(entrypoint, frame, tmp_path):
+    pipe = tmp_path / "train_0"
+    # Two files concatenated, as Pipe mode delivers them, with the target first
+    shuffled = frame[["y", "a", "noise", "b"]]
+    pipe.write_text(shuffled.iloc[:30].to_csv(index=False) + shuffled.iloc[30:].to_csv(index=False))
+
+    entrypoint.train_from_pipe(str(pipe), str(tmp_path / "model"), chunk_rows=7, target="y", features=["a", "b"])
+
+    model = joblib.load(tmp_path / "model" / "model.joblib")
+    assert list(model.feature_names_in_) == ["a", "b"]
+    np.testing.assert_allclose(model.coef_, [2, -3], atol=1e-9)
+    assert model.intercept_ == pytest.approx(1)
+
+
+def test_hive_partitioned_parquet_is_found(entrypoint, frame, tmp_path):
+    for part, rows in enumerate((frame.iloc[:30], frame.iloc[30:])):
+        directory = tmp_path / "train" / f"part={part}"
+        directory.mkdir(parents=True)
+        rows.to_parquet(directory / "data.parquet", index=False)
+
+    train_dir = str(tmp_path / "train")
+    assert len(entrypoint.parquet_files(train_dir)) == 2
+    df, columns = entrypoint.read_parquet(train_dir, target="y", features=["a", "b", "part"])
+    assert columns == ["a", "b", "part", "y"]
+    assert len(df) == 60 and sorted(df["part"].unique()) == [0, 1]
+
+    tasks, columns = entrypoint.plan_tasks(train_dir, chunk_rows=10, target="y", features=["a", "b"])
+    assert len(tasks) == 2 and columns == ["a", "b", "y"]
+
+
+@pytest.mark.parametrize("data_format", ["csv", "parquet"])
+def test_out_of_core_matches_the_in_memory_fit(entrypoint, tmp_path, monkeypatch, data_format):
+    rng = np.random.default_rng(1)
+    n_rows = 2000
+    # Features far from zero: raw sums of squares would lose digits, centred statistics do not
+    df = pd.DataFrame(rng.normal(1e4, 1.0, (n_rows, 3)), columns=["a", "b", "c"])
+    df["y"] = df @ np.array([2.0, -3.0, 0.5]) + 7 + rng.normal(0, 0.1, n_rows)
+    train_dir = tmp_path / "train"
+    train_dir.mkdir()
+    if data_format == "csv":
+        df.to_csv(train_dir / "train.csv", index=False)
+        # Ranges of 4 KB end mid-line, so rows straddle range boundaries
+        monkeypatch.setattr(entrypoint, "CSV_RANGE_BYTES", 4096)
+    else:
+        df.to_parquet(train_dir / "part-0.parquet", index=False, row_group_size=300)
+
+    entrypoint.train(str(train_dir), str(tmp_path / "in_memory"))
+    entrypoint.train_out_of_core(str(train_dir), str(tmp_path / "out_of_core"), chunk_rows=64, workers=2)
+
+    tasks, columns = entrypoint.plan_tasks(str(train_dir), chunk_rows=64)
+    assert len(tasks) > 5
+    stats = entrypoint._empty_stats(len(columns))
+    for task in tasks:
+        entrypoint._merge(stats, entrypoint._stats_task(task))
+    assert stats["rows"] == n_rows
+
+    expected = joblib.load(tmp_path / "in_memory" / "model.joblib")
+    model = joblib.load(tmp_path / "out_of_core" / "model.joblib")
+    np.testing.assert_allclose(model.coef_, expected.coef_, rtol=1e-6)
+    np.testing.assert_allclose(model.intercept_, expected.intercept_, rtol=1e-6)
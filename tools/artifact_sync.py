@@ -0,0 +1,264 @@
+# Incremental artifact upload to S3
+#
+# Every uploaded object carries the SHA-256 of its content in its metadata (x-amz-meta-sha256).
+# Before uploading, the local hash is compared with the one stored at the destination with a
+# HEAD request, and unchanged artifacts are skipped. Datasets and model files are hashed as
+# they are; a source bundle (a directory uploaded as one zip, like the CodeBuild code.zip) is
+# identified by a hash over its file list and file hashes, so an unchanged directory is not
+# even zipped. Local hashes are cached by (size, mtime) so that large files are only re-read
+# when they change. Large objects go through multipart upload with tuned part size and
+# concurrency. With --prune, a directory sync also deletes the objects under the prefix that no
+# longer have a local file, so a rewritten dataset leaves no stale part files behind.
+#
+# Examples:
+#   python tools/artifact_sync.py train.csv s3://my-bucket/data/train.csv
+#   python tools/artifact_sync.py train/ s3://my-bucket/data/train-parquet/ --prune
+#   python tools/artifact_sync.py 1_model_creation s3://my-bucket/code.zip --zip --exclude '*.png'
+#   python tools/artifact_sync.py model/ s3://bucket/model/ --endpoint-url http://localhost:5000
+
+import argparse
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+METADATA_KEY = "sha256"
+
+# Multipart settings: parts of 64 MB uploaded 10 at a time; objects below the threshold go up
+# in a single PUT
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 64 * 1024 * 1024
+MAX_CONCURRENCY = 10
+
+# Excluded from directory syncs and bundles by default
+DEFAULT_EXCLUDES = ("__pycache__", "*.pyc", ".git", ".DS_Store", ".ipynb_checkpoints")
+
+_HASH_BLOCK = 8 * 1024 * 1024
+
+
+class HashCache:
+    """SHA-256 of local files, remembered per (path, size, mtime) in a JSON file."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f)
+
+    def sha256(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry and entry["signature"] == signature:
+            return entry["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(_HASH_BLOCK)
+                if not block:
+                    break
+                digest.update(block)
+        with self._lock:
+            self._entries[path] = {"signature": signature, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def save(self):
+        if self.path:
+            with self._lock:
+                with open(self.path, "w") as f:
+                    json.dump(self._entries, f)
+
+
+def transfer_config(threshold=MULTIPART_THRESHOLD, chunksize=MULTIPART_CHUNKSIZE, concurrency=MAX_CONCURRENCY):
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(multipart_threshold=threshold, multipart_chunksize=chunksize,
+                          max_concurrency=concurrency, use_threads=True)
+
+
+def parse_s3_uri(uri):
+    if not uri.startswith("s3://"):
+        raise ValueError(f"Expected an s3:// URI, got {uri}")
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    return bucket, key
+
+
+def _excluded(relative_path, excludes):
+    parts = relative_path.split(os.sep)
+    return any(fnmatch.fnmatch(part, pattern) for part in parts for pattern in excludes)
+
+
+def list_files(directory, excludes=DEFAULT_EXCLUDES):
+    """Relative paths of the files under directory, sorted, without the excluded ones."""
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not _excluded(d, excludes))
+        for name in names:
+            relative = os.path.relpath(os.path.join(root, name), directory)
+            if not _excluded(relative, excludes):
+                files.append(relative)
+    return sorted(files)
+
+
+def remote_sha256(s3, bucket, key):
+    """The hash stored with the object, or None if it does not exist or has none."""
+    from botocore.exceptions import ClientError
+    try:
+        response = s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return response.get("Metadata", {}).get(METADATA_KEY)
+
+
+def sync_file(s3, path, bucket, key, hashes, config=None):
+    """
+    Upload one file unless the destination already holds the same content.
+
+    Returns:
+    dict with the key, size, hash and whether it was uploaded
+    """
+    digest = hashes.sha256(path)
+    size = os.path.getsize(path)
+    uploaded = remote_sha256(s3, bucket, key) != digest
+    if uploaded:
+        s3.upload_file(path, bucket, key, ExtraArgs={"Metadata": {METADATA_KEY: digest}}, Config=config)
+    return {"key": key, "bytes": size, "sha256": digest, "uploaded": uploaded}
+
+
+def delete_stale(s3, bucket, prefix, keep):
+    """Delete the objects under prefix whose key is not in keep; return the deleted keys."""
+    stale = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        stale.extend(item["Key"] for item in page.get("Contents", []) if item["Key"] not in keep)
+    for start in range(0, len(stale), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in stale[start:start + 1000]]})
+    return stale
+
+
+def sync_directory(s3, directory, bucket, prefix, hashes, config=None, excludes=DEFAULT_EXCLUDES, workers=8,
+                   prune=False):
+    """Sync every file under directory to bucket/prefix, several files at a time; with prune, delete the rest."""
+    prefix = prefix.rstrip("/") + "/" if prefix else ""
+    if prune and not prefix:
+        raise ValueError("Refusing to prune without a key prefix: every object in the bucket would be deleted")
+    files = list_files(directory, excludes)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda relative: sync_file(s3, os.path.join(directory, relative), bucket,
+                                       prefix + relative.replace(os.sep, "/"), hashes, config),
+            files,
+        ))
+    if prune:
+        keep = {result["key"] for result in results}
+        results += [{"key": key, "bytes": 0, "sha256": None, "uploaded": False, "deleted": True}
+                    for key in delete_stale(s3, bucket, prefix, keep)]
+    return results
+
+
+def bundle_sha256(directory, hashes, excludes=DEFAULT_EXCLUDES):
+    """Hash of a directory's content: relative paths, modes and file hashes, in order."""
+    digest = hashlib.sha256()
+    for relative in list_files(directory, excludes):
+        path = os.path.join(directory, relative)
+        mode = os.stat(path).st_mode & 0o777
+        digest.update(f"{relative.replace(os.sep, '/')}\0{mode:o}\0{hashes.sha256(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def build_zip(directory, excludes=DEFAULT_EXCLUDES):
+    """Zip the directory into memory with fixed timestamps, so equal content gives equal bytes."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for relative in list_files(directory, excludes):
+            path = os.path.join(directory, relative)
+            info = zipfile.ZipInfo(relative.replace(os.sep, "/"), date_time=(1980, 1, 1, 0, 0, 0))
+            info.external_attr = (os.stat(path).st_mode & 0o777) << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, "rb") as f:
+                archive.writestr(info, f.read())
+    return buffer.getvalue()
+
+
+def sync_bundle(s3, directory, bucket, key, hashes, config=None, excludes=DEFAULT_EXCLUDES):
+    """Upload directory as a single zip object unless its content hash is unchanged."""
+    digest = bundle_sha256(directory, hashes, excludes)
+    if remote_sha256(s3, bucket, key) == digest:
+        return {"key": key, "bytes": None, "sha256": digest, "uploaded": False}
+    body = build_zip(directory, excludes)
+    s3.upload_fileobj(io.BytesIO(body), bucket, key, ExtraArgs={"Metadata": {METADATA_KEY: digest}}, Config=config)
+    return {"key": key, "bytes": len(body), "sha256": digest, "uploaded": True}
+
+
+def make_client(endpoint_url=None, region=None):
+    """S3 client; endpoint_url (or AWS_ENDPOINT_URL_S3) points it at a local S3 stand-in."""
+    import boto3
+    return boto3.client("s3", region_name=region, endpoint_url=endpoint_url or os.environ.get("AWS_ENDPOINT_URL_S3"))
+
+
+def sync(source, destination, as_zip=False, excludes=DEFAULT_EXCLUDES, endpoint_url=None, region=None,
+         cache_path=".artifact_sync_cache.json", config=None, workers=8, prune=False):
+    """Sync a file, a directory or a zipped directory to an s3:// destination; return per-object results."""
+    s3 = make_client(endpoint_url, region)
+    bucket, key = parse_s3_uri(destination)
+    hashes = HashCache(cache_path)
+    config = config or transfer_config()
+    try:
+        if os.path.isfile(source):
+            if not key or key.endswith("/"):
+                key += os.path.basename(source)
+            return [sync_file(s3, source, bucket, key, hashes, config)]
+        if as_zip:
+            return [sync_bundle(s3, source, bucket, key, hashes, config, excludes)]
+        return sync_directory(s3, source, bucket, key, hashes, config, excludes, workers, prune)
+    finally:
+        hashes.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload artifacts to S3, skipping content that is already there")
+    parser.add_argument("source", help="File or directory")
+    parser.add_argument("destination", help="s3://bucket/key for a file or zip, s3://bucket/prefix/ for a directory")
+    parser.add_argument("--zip", action="store_true", help="Upload the directory as one deterministic zip")
+    parser.add_argument("--exclude", action="append", default=[], help="Glob of names to skip (repeatable)")
+    parser.add_argument("--endpoint-url", help="S3 endpoint, e.g. a local moto or MinIO server")
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--cache", default=".artifact_sync_cache.json", help="Local hash cache file")
+    parser.add_argument("--multipart-threshold-mb", type=int, default=MULTIPART_THRESHOLD // 2**20)
+    parser.add_argument("--multipart-chunk-mb", type=int, default=MULTIPART_CHUNKSIZE // 2**20)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Parts in flight per object")
+    parser.add_argument("--workers", type=int, default=8, help="Files synced at a time for directories")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete objects under the destination prefix that have no local file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} does not exist")
+    started = time.perf_counter()
+    results = sync(
+        args.source, args.destination, as_zip=args.zip, excludes=DEFAULT_EXCLUDES + tuple(args.exclude),
+        endpoint_url=args.endpoint_url, region=args.region, cache_path=args.cache, workers=args.workers,
+        prune=args.prune, config=transfer_config(args.multipart_threshold_mb * 2**20, args.multipart_chunk_mb * 2**20, args.concurrency),
+    )
+    uploaded = [r for r in results if r["uploaded"]]
+    deleted = [r for r in results if r.get("deleted")]
+    for result in results:
+        status = "deleted" if result.get("deleted") else "uploaded" if result["uploaded"] else "unchanged"
+        print(f"{status:>9}  {result['key']}")
+    print(f"{len(uploaded)} uploaded ({sum(r['bytes'] for r in uploaded) / 2**20:.1f} MB), "
+          f"{len(results) - len(uploaded) - len(deleted)} unchanged, {len(deleted)} deleted "
+          f"in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
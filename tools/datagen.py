@@ -0,0 +1,193 @@
+# Scalable synthetic data generator
+#
+# Produces the two datasets of this repository at any size:
+#   classification - the make_classification setup of 1_model_creation/main.py (10 features,
+#                    8 informative, 2 redundant, 3 classes, 2 clusters per class)
+#   regression     - the linear problem of code.py (three uniform(0, 10) features,
+#                    target = 2*f1 + 3*f2 + 4*f3 + N(0, 1))
+#
+# Rows are generated in fixed-size chunks, each from its own RNG stream spawned from the seed,
+# and every chunk is written by the worker that generated it to its own shard. A worker never
+# holds more than one chunk, and the output depends only on the seed and the chunk size,
+# not on the number of workers.
+#
+# Examples:
+#   python tools/datagen.py --kind classification --rows 100000000 --output-dir /data/clf
+#   python tools/datagen.py --kind regression --rows 10000000 --format csv --output-dir /data/reg
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Parquet layout used for training data elsewhere in the repository (see code.py)
+ROWS_PER_GROUP = 100_000
+
+
+def classification_spec(rng, n_features=10, n_informative=8, n_redundant=2, n_classes=3,
+                        n_clusters_per_class=2, class_sep=1.0, flip_y=0.01):
+    """
+    Draw the parameters of a make_classification-style problem once, so every chunk samples
+    rows from the same distribution: cluster centroids on hypercube vertices, one random
+    linear transform per cluster, the redundant-feature mixing matrix and a column order.
+    """
+    n_clusters = n_classes * n_clusters_per_class
+    if n_informative + n_redundant > n_features:
+        raise ValueError("n_informative + n_redundant must not exceed n_features")
+    if n_clusters > 2 ** n_informative:
+        raise ValueError("n_classes * n_clusters_per_class must be at most 2 ** n_informative")
+    vertices = rng.choice(2 ** n_informative, size=n_clusters, replace=False)
+    bits = (vertices[:, None] >> np.arange(n_informative)) & 1
+    return {
+        "n_features": n_features,
+        "n_informative": n_informative,
+        "n_redundant": n_redundant,
+        "n_classes": n_classes,
+        "flip_y": flip_y,
+        "centroids": (bits * 2.0 - 1.0) * class_sep,
+        "transforms": 2 * rng.random((n_clusters, n_informative, n_informative)) - 1,
+        "redundant": 2 * rng.random((n_informative, n_redundant)) - 1,
+        "permutation": rng.permutation(n_features),
+    }
+
+
+def classification_chunk(spec, start, n_rows, rng):
+    """Rows start .. start + n_rows of a classification dataset as (X, y)."""
+    n_informative = spec["n_informative"]
+    n_clusters = len(spec["centroids"])
+    # Clusters are assigned round-robin on the global row index, so classes stay balanced
+    # across chunks exactly as in make_classification
+    cluster = (start + np.arange(n_rows)) % n_clusters
+    X = np.empty((n_rows, spec["n_features"]))
+    informative = rng.standard_normal((n_rows, n_informative))
+    for k in range(n_clusters):
+        members = cluster == k
+        informative[members] = informative[members] @ spec["transforms"][k] + spec["centroids"][k]
+    X[:, :n_informative] = informative
+    X[:, n_informative:n_informative + spec["n_redundant"]] = informative @ spec["redundant"]
+    X[:, n_informative + spec["n_redundant"]:] = rng.standard_normal(
+        (n_rows, spec["n_features"] - n_informative - spec["n_redundant"])
+    )
+    y = cluster % spec["n_classes"]
+    flip = rng.random(n_rows) < spec["flip_y"]
+    y[flip] = rng.integers(spec["n_classes"], size=flip.sum())
+
+    order = rng.permutation(n_rows)
+    return X[order][:, spec["permutation"]], y[order]
+
+
+def regression_chunk(n_rows, rng):
+    """Rows of the code.py regression problem as (X, y)."""
+    X = rng.uniform(0, 10, (n_rows, 3))
+    y = X @ np.array([2.0, 3.0, 4.0]) + rng.normal(0, 1, n_rows)
+    return X, y
+
+
+def column_names(kind, n_features):
+    if kind == "regression":
+        return ["feature1", "feature2", "feature3", "target"]
+    return [f"feature_{i}" for i in range(1, n_features + 1)] + ["target"]
+
+
+def _write_shard(path, fmt, columns, X, y):
+    import pyarrow as pa
+    arrays = [pa.array(X[:, i]) for i in range(X.shape[1])] + [pa.array(y)]
+    table = pa.Table.from_arrays(arrays, names=columns)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression="zstd", row_group_size=ROWS_PER_GROUP)
+    else:
+        import pyarrow.csv as pacsv
+        pacsv.write_csv(table, path)
+
+
+def generate_chunk(task):
+    """Generate and write one shard; runs in a worker process."""
+    kind, index, start, n_rows, seed_sequence, spec, output_dir, fmt = task
+    rng = np.random.default_rng(seed_sequence)
+    if kind == "regression":
+        X, y = regression_chunk(n_rows, rng)
+    else:
+        X, y = classification_chunk(spec, start, n_rows, rng)
+    path = os.path.join(output_dir, f"part-{index:05d}.{fmt}")
+    _write_shard(path, fmt, column_names(kind, X.shape[1]), X, y)
+    return path, n_rows
+
+
+def generate(kind, n_rows, output_dir, chunk_rows=1_000_000, fmt="parquet", seed=42, workers=None, **spec_options):
+    """
+    Write n_rows of the chosen dataset to output_dir as part-NNNNN shards of chunk_rows rows.
+
+    Returns:
+    the manifest dict that is also written to output_dir/_manifest.json
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # Shards of an earlier, larger run would otherwise be read as part of this dataset
+    for name in os.listdir(output_dir):
+        if name.startswith("part-"):
+            os.remove(os.path.join(output_dir, name))
+    n_chunks = -(-n_rows // chunk_rows)
+    # Stream 0 draws the problem definition; stream i + 1 generates chunk i
+    streams = np.random.SeedSequence(seed).spawn(n_chunks + 1)
+    spec = classification_spec(np.random.default_rng(streams[0]), **spec_options) if kind == "classification" else None
+
+    tasks = [
+        (kind, i, i * chunk_rows, min(chunk_rows, n_rows - i * chunk_rows), streams[i + 1], spec, output_dir, fmt)
+        for i in range(n_chunks)
+    ]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shards = [path for path, _ in executor.map(generate_chunk, tasks)]
+
+    manifest = {
+        "kind": kind,
+        "rows": n_rows,
+        "chunk_rows": chunk_rows,
+        "format": fmt,
+        "seed": seed,
+        "options": spec_options,
+        "shards": [os.path.basename(path) for path in shards],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(os.path.join(output_dir, "_manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sharded synthetic training data")
+    parser.add_argument("--kind", choices=["classification", "regression"], default="classification")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000,
+                        help="Rows per shard; keep it fixed to reproduce a dataset")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (defaults to CPU count)")
+    parser.add_argument("--features", type=int, default=10, help="Classification only")
+    parser.add_argument("--informative", type=int, default=8, help="Classification only")
+    parser.add_argument("--redundant", type=int, default=2, help="Classification only")
+    parser.add_argument("--classes", type=int, default=3, help="Classification only")
+    parser.add_argument("--clusters-per-class", type=int, default=2, help="Classification only")
+    args = parser.parse_args()
+
+    spec_options = {}
+    if args.kind == "classification":
+        spec_options = {
+            "n_features": args.features,
+            "n_informative": args.informative,
+            "n_redundant": args.redundant,
+            "n_classes": args.classes,
+            "n_clusters_per_class": args.clusters_per_class,
+        }
+    manifest = generate(args.kind, args.rows, args.output_dir, args.chunk_rows, args.format,
+                        args.seed, args.workers, **spec_options)
+    print(f"Wrote {manifest['rows']} rows in {len(manifest['shards'])} shard(s) to {args.output_dir} "
+          f"in {manifest['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# Load test and latency benchmark for the two serving containers
+#
+# Starts either 1_model_creation/inference.py (target "flask", under its gunicorn config) or
+# the SKLearn entrypoint handlers (target "sklearn", through local_sklearn_server.py), drives
+# /invocations with a sweep of concurrency levels, batch sizes and payload formats, and
+# reports throughput, p50/p95/p99 latency, server CPU and memory (master RSS plus worker USS,
+# since preloaded workers share their pages with the master). Results are written as JSON so
+# runs from different commits can be compared.
+#
+# Examples:
+#   python tools/load_test.py --target flask --concurrency 1,4,16 --batch-sizes 1,100 --formats json,npy
+#   python tools/load_test.py --target sklearn --model-dir /tmp/model --formats json,csv
+#   python tools/load_test.py --url http://localhost:8080 --features 10 --duration 30
+
+import argparse
+import datetime
+import http.client
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; without it CPU and memory are not reported
+    psutil = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Number of input features expected by each serving container
+TARGET_FEATURES = {"flask": 10, "sklearn": 3}
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "npy": "application/x-npy",
+}
+
+
+def make_payload(fmt, batch_size, n_features, rng):
+    """Build one request body of batch_size random rows in the given format."""
+    rows = [[round(rng.uniform(-3, 3), 6) for _ in range(n_features)] for _ in range(batch_size)]
+    if fmt == "json":
+        return json.dumps(rows).encode()
+    if fmt == "csv":
+        return "".join(",".join(map(str, row)) + "\n" for row in rows).encode()
+    if fmt == "npy":
+        import numpy as np
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(rows, dtype=np.float32))
+        return buffer.getvalue()
+    raise ValueError(f"Unknown payload format: {fmt}")
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class ResourceSampler:
+    """Sample CPU and memory of a server process and its children in a background thread.
+
+    The gunicorn workers are forked from a preloaded master and share most of their pages
+    with it, so their RSS cannot be summed. Memory is reported as the master's RSS plus each
+    child's USS (the pages only that child holds), and as the total PSS where the platform
+    provides it.
+    """
+
+    def __init__(self, pid, interval=0.5):
+        self.interval = interval
+        self.cpu = []
+        self.memory = []
+        self._stop = threading.Event()
+        self._process = psutil.Process(pid) if psutil is not None and pid else None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _processes(self):
+        try:
+            return [self._process] + self._process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def _memory(self, processes):
+        """(master RSS, [USS of each child], total PSS or None) in bytes."""
+        master_rss, workers_uss, pss = 0, [], 0
+        for process in processes:
+            try:
+                try:
+                    info = process.memory_full_info()
+                except psutil.AccessDenied:
+                    # USS and PSS need the process' page maps; fall back to its RSS
+                    info = process.memory_info()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            if process.pid == self._process.pid:
+                master_rss = info.rss
+            else:
+                workers_uss.append(getattr(info, "uss", info.rss))
+            pss = pss + info.pss if pss is not None and hasattr(info, "pss") else None
+        return master_rss, workers_uss, pss
+
+    def _run(self):
+        # cpu_percent needs a first call per process to establish a baseline
+        known = {}
+        while not self._stop.wait(self.interval):
+            cpu = 0.0
+            processes = self._processes()
+            for process in processes:
+                try:
+                    if process.pid not in known:
+                        known[process.pid] = process
+                        process.cpu_percent(None)
+                        continue
+                    cpu += known[process.pid].cpu_percent(None)
+                except psutil.NoSuchProcess:
+                    continue
+            self.cpu.append(cpu)
+            self.memory.append(self._memory(processes))
+
+    def __enter__(self):
+        if self._process is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def summary(self):
+        """CPU and memory peaks; memory_mb_max is the master's RSS plus the workers' USS."""
+        keys = ("cpu_percent_mean", "cpu_percent_max", "memory_mb_max", "master_rss_mb_max",
+                "worker_uss_mb_max", "workers", "pss_mb_max")
+        if not self.cpu:
+            return dict.fromkeys(keys)
+        mb = lambda value: round(value / 2**20, 1)
+        pss = [sample[2] for sample in self.memory]
+        return {
+            "cpu_percent_mean": round(sum(self.cpu) / len(self.cpu), 1),
+            "cpu_percent_max": round(max(self.cpu), 1),
+            "memory_mb_max": mb(max(rss + sum(uss) for rss, uss, _ in self.memory)),
+            "master_rss_mb_max": mb(max(rss for rss, _, _ in self.memory)),
+            # Largest private footprint of a single worker: the cost of adding one more
+            "worker_uss_mb_max": mb(max((max(uss, default=0) for _, uss, _ in self.memory))),
+            "workers": max(len(uss) for _, uss, _ in self.memory),
+            "pss_mb_max": mb(max(pss)) if None not in pss else None,
+        }
+
+
+def run_load(url, payloads, content_type, concurrency, duration, warmup):
+    """Send requests from `concurrency` threads for warmup + duration seconds; time the last part."""
+    parsed = urllib.parse.urlsplit(url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        # One keep-alive connection per client thread, like a pooled SDK client
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+        local, failed = [], 0
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            body = payloads[rng.randrange(len(payloads))]
+            try:
+                conn.request("POST", "/invocations", body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+                ok = False
+            if now >= measure_from:
+                if ok:
+                    local.append(time.perf_counter() - now)
+                else:
+                    failed += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 3) if latencies else None
+            for name, q in (("p50", 50), ("p95", 95), ("p99", 99))
+        },
+    }
+
+
+def wait_until_healthy(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/ping", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout}s")
+
+
+def start_server(args):
+    """Launch the selected serving container locally under gunicorn and return the process."""
+    env = dict(os.environ)
+    bind = f"127.0.0.1:{args.port}"
+    if args.target == "flask":
+        cwd = os.path.join(REPO_ROOT, "1_model_creation")
+        env["MODEL_SERVER_BIND"] = bind
+        if args.workers:
+            env["MODEL_SERVER_WORKERS"] = str(args.workers)
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "inference:app"]
+    else:
+        if not args.model_dir:
+            raise SystemExit("--model-dir is required for --target sklearn")
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        env["SM_MODEL_DIR"] = os.path.abspath(args.model_dir)
+        command = [sys.executable, "-m", "gunicorn", "-b", bind, "-w", str(args.workers or os.cpu_count()),
+                   "--preload", "local_sklearn_server:app"]
+    return subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a local serving container")
+    parser.add_argument("--target", choices=["flask", "sklearn"], default="flask")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--model-dir", help="Directory with model.joblib for --target sklearn")
+    parser.add_argument("--features", type=int, help="Features per row (defaults to the target's)")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--workers", type=int, help="Server worker processes (defaults to CPU count)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated client thread counts")
+    parser.add_argument("--batch-sizes", default="1,10,100", help="Comma-separated rows per request")
+    parser.add_argument("--formats", default="json", help="Comma-separated payload formats: json, csv, npy")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds per configuration")
+    parser.add_argument("--payload-variants", type=int, default=32, help="Distinct bodies per configuration")
+    parser.add_argument("--output", default="load_test_results.json")
+    args = parser.parse_args()
+
+    n_features = args.features or TARGET_FEATURES[args.target]
+    formats = args.formats.split(",")
+    for fmt in formats:
+        if fmt not in CONTENT_TYPES:
+            parser.error(f"Unknown format {fmt}; choose from {', '.join(CONTENT_TYPES)}")
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        launched = time.perf_counter()
+        server = start_server(args)
+    try:
+        wait_until_healthy(url, timeout=120)
+        startup_seconds = round(time.perf_counter() - launched, 3) if server else None
+
+        rng = random.Random(0)
+        results = []
+        for fmt in formats:
+            for batch_size in map(int, args.batch_sizes.split(",")):
+                payloads = [make_payload(fmt, batch_size, n_features, rng) for _ in range(args.payload_variants)]
+                for concurrency in map(int, args.concurrency.split(",")):
+                    with ResourceSampler(server.pid if server else None) as sampler:
+                        result = run_load(url, payloads, CONTENT_TYPES[fmt], concurrency, args.duration, args.warmup)
+                    result.update(format=fmt, batch_size=batch_size, concurrency=concurrency)
+                    result["rows_per_second"] = round(result["throughput_rps"] * batch_size, 1)
+                    result.update(sampler.summary())
+                    results.append(result)
+                    print(
+                        f"{fmt:>4} batch={batch_size:<5} concurrency={concurrency:<3} "
+                        f"rps={result['throughput_rps']:<8} p50={result['latency_ms']['p50']}ms "
+                        f"p99={result['latency_ms']['p99']}ms errors={result['errors']} "
+                        f"cpu={result['cpu_percent_mean']}% memory={result['memory_mb_max']}MB "
+                        f"(master rss={result['master_rss_mb_max']}MB, worker uss={result['worker_uss_mb_max']}MB)"
+                    )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "git_commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "target": args.target if args.url is None else args.url,
+        "cpu_count": os.cpu_count(),
+        "startup_seconds": startup_seconds,
+        "config": {k: v for k, v in vars(args).items() if k not in ("output",)},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
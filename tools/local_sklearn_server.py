@@ -0,0 +1,41 @@
+# Local stand-in for the SageMaker SKLearn serving container
+# Serves the model_fn/input_fn/predict_fn/output_fn handlers of
+# 3_separate_train_and_inference/developer_workspace/entrypoint/inference.py on /ping and
+# /invocations, so they can be load tested without deploying an endpoint.
+#
+# Usage: SM_MODEL_DIR=path/to/model gunicorn -b 127.0.0.1:8080 local_sklearn_server:app
+
+import os
+import sys
+
+from flask import Flask, Response, request
+
+ENTRYPOINT_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '3_separate_train_and_inference', 'developer_workspace', 'entrypoint'
+)
+sys.path.insert(0, ENTRYPOINT_DIR)
+import inference  # noqa: E402
+
+app = Flask(__name__)
+model = inference.model_fn(os.environ.get('SM_MODEL_DIR', '/opt/ml/model'))
+
+@app.route("/ping", methods=["GET"])
+def ping():
+    return Response(status=200)
+
+@app.route("/invocations", methods=["POST"])
+def invocations():
+    content_type = request.mimetype or 'application/json'
+    accept = request.accept_mimetypes.best if request.accept_mimetypes else 'application/json'
+    if accept in (None, '*/*'):
+        accept = 'application/json'
+    try:
+        data = inference.input_fn(request.get_data(), content_type)
+        prediction = inference.predict_fn(data, model)
+        result, mimetype = inference.output_fn(prediction, accept)
+    except ValueError as e:
+        return Response(str(e), status=415)
+    return Response(result, mimetype=mimetype)
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8080)
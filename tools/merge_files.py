@@ -0,0 +1,287 @@
+# Merge the files selected by paths.json into one text file
+#
+# Shared implementation behind 2_deploy_model/merge_files.py and
+# 3_separate_train_and_inference/merge_files.py. paths.json lists glob patterns ("paths",
+# relative to the working directory, "**" matches any depth) and name suffixes ("filters").
+#
+# Each directory is listed once with os.scandir, whatever the number of patterns touching it,
+# and ignored directories (.venv, .git, node_modules, ...) are pruned before descending. Files
+# matched by several patterns are merged once, in pattern order and then sorted by path.
+# Small files are read ahead by a thread pool while the output is written; large ones are
+# streamed in bounded chunks, so memory stays flat whatever the file sizes. With --incremental,
+# sections of files whose size and mtime are unchanged since the previous merge are copied from
+# the previous output instead of re-reading the sources, and nothing is rewritten at all when
+# no file changed.
+
+import argparse
+import fnmatch
+import itertools
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PATHS = ['*']
+DEFAULT_FILTERS = ['*.yml', '*.yaml', '*.py', '*.json', '*.txt', '*.sh']
+# Directory names never descended into; paths.json can extend this with an "ignore" list
+DEFAULT_IGNORED_DIRS = ['.venv', 'venv', '.git', '__pycache__', 'node_modules', 'cdk.out', '.pytest_cache']
+
+# Files up to this size are read ahead concurrently; larger ones are streamed in chunks of it
+CHUNK_BYTES = 1024 * 1024
+# Files read ahead at most, bounding the memory used by the read-ahead to about this many chunks
+READ_AHEAD_FILES = 32
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def read_paths_and_filters(json_file):
+    """Return (paths, filters, ignored directory names) from json_file, or the defaults."""
+    if not os.path.exists(json_file):
+        print(f"{json_file} not found, using default paths and filters.")
+        return DEFAULT_PATHS, DEFAULT_FILTERS, DEFAULT_IGNORED_DIRS
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+    return data['paths'], data['filters'], DEFAULT_IGNORED_DIRS + data.get('ignore', [])
+
+
+class TreeScanner:
+    """Expands glob patterns against a directory tree, listing each directory only once."""
+
+    def __init__(self, ignored_dirs=DEFAULT_IGNORED_DIRS):
+        self.ignored_dirs = set(ignored_dirs)
+        self._listings = {}
+
+    def listdir(self, directory):
+        """[(name, is_dir)] of a directory, cached; ignored directories are left out."""
+        listing = self._listings.get(directory)
+        if listing is None:
+            listing = []
+            try:
+                with os.scandir(directory or '.') as entries:
+                    for entry in entries:
+                        is_dir = entry.is_dir()
+                        if is_dir and entry.name in self.ignored_dirs:
+                            continue
+                        listing.append((entry.name, is_dir))
+            except OSError:
+                pass
+            listing.sort()
+            self._listings[directory] = listing
+        return listing
+
+    def _walk(self, directory):
+        """Every non-hidden path under directory (directories included), pruning ignored ones."""
+        for name, is_dir in self.listdir(directory):
+            if name.startswith('.'):
+                continue
+            path = os.path.join(directory, name)
+            yield path, is_dir
+            if is_dir:
+                yield from self._walk(path)
+
+    def expand(self, pattern):
+        """Paths matching the glob pattern, like glob.glob(pattern, recursive=True)."""
+        parts = pattern.replace('\\', '/').split('/')
+        # Leading literal segments (including '..' and absolute roots) need no listing
+        base = []
+        while parts and not glob_magic(parts[0]) and len(parts) > 1:
+            base.append(parts.pop(0))
+        directory = '/'.join(base) if base != [''] else '/'
+        return self._match(directory, parts)
+
+    def _match(self, directory, parts):
+        segment, rest = parts[0], parts[1:]
+        if segment == '**':
+            # Zero or more directories
+            candidates = [directory] + [path for path, is_dir in self._walk(directory) if is_dir]
+            if not rest:
+                # Like glob, a trailing '**' also yields the directory itself ('dir/')
+                own = [os.path.join(directory, '')] if directory else []
+                return own + [path for path, _ in self._walk(directory)]
+            results = []
+            for candidate in candidates:
+                results.extend(self._match(candidate, rest))
+            return results
+        if not glob_magic(segment):
+            path = os.path.join(directory, segment)
+            if not rest:
+                return [path] if os.path.lexists(path) and not self._ignored(segment) else []
+            return self._match(path, rest) if os.path.isdir(path) and not self._ignored(segment) else []
+        regex = re.compile(fnmatch.translate(segment))
+        results = []
+        for name, is_dir in self.listdir(directory):
+            # Like glob, wildcards do not match hidden names unless the pattern starts with '.'
+            if name.startswith('.') and not segment.startswith('.'):
+                continue
+            if not regex.match(name):
+                continue
+            path = os.path.join(directory, name)
+            if not rest:
+                results.append(path)
+            elif is_dir:
+                results.extend(self._match(path, rest))
+        return results
+
+    def _ignored(self, name):
+        return name in self.ignored_dirs
+
+
+def glob_magic(segment):
+    return any(c in segment for c in '*?[')
+
+
+def get_files_from_patterns(paths, filters, ignored_dirs=DEFAULT_IGNORED_DIRS):
+    """Files matched by the patterns and filters, deduplicated, in pattern order then path order."""
+    scanner = TreeScanner(ignored_dirs)
+    suffixes = tuple(f.lstrip('*') for f in filters)
+    ignored = set(ignored_dirs)
+    seen = set()
+    matched = []
+    for pattern in paths:
+        for path in sorted(scanner.expand(pattern)):
+            if not path.endswith(suffixes):
+                continue
+            if ignored.intersection(os.path.normpath(path).split(os.sep)):
+                continue
+            key = os.path.realpath(path)
+            if key in seen or not os.path.isfile(path):
+                continue
+            seen.add(key)
+            matched.append(path)
+    return matched
+
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return None
+
+
+def _read_small(path):
+    """Whole content of a small file, or None when it must be streamed; errors are returned."""
+    try:
+        if os.path.getsize(path) > CHUNK_BYTES:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError as e:
+        return e
+
+
+def _stream(path, outfile):
+    try:
+        with open(path, 'rb') as infile:
+            shutil.copyfileobj(infile, outfile, CHUNK_BYTES)
+    except OSError as e:
+        outfile.write(f"Error reading file: {e}\n".encode())
+
+
+def _copy_range(source, outfile, offset, length):
+    source.seek(offset)
+    while length:
+        block = source.read(min(CHUNK_BYTES, length))
+        if not block:
+            break
+        outfile.write(block)
+        length -= len(block)
+
+
+def _load_manifest(output_file):
+    try:
+        with open(output_file + MANIFEST_SUFFIX) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if _stat(output_file) != manifest.get('output'):
+        return None  # the output was modified or removed since
+    return manifest
+
+
+def merge_files(files, output_file, incremental=False, workers=8, verbose=False):
+    """
+    Write every file into output_file under a '--- path ---' header.
+
+    Returns:
+    (number of files read from their source, number copied from the previous output)
+    """
+    stats = [_stat(path) for path in files]
+    previous = _load_manifest(output_file) if incremental else None
+    sections = {}
+    if previous is not None:
+        if [[path, stat] for path, stat in zip(files, stats)] == [s[:2] for s in previous['files']]:
+            return 0, len(files)
+        sections = {path: (stat, offset, length) for path, stat, offset, length in previous['files']}
+
+    def reusable(path, stat):
+        section = sections.get(path)
+        return section is not None and stat is not None and section[0] == stat
+
+    # Sources are only read for files that cannot be taken from the previous output
+    to_read = [path for path, stat in zip(files, stats) if not reusable(path, stat)]
+    read_ahead = {}
+    manifest_files = []
+    temporary = output_file + '.tmp'
+    read, copied = 0, 0
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(temporary, 'wb') as outfile:
+        old_output = open(output_file, 'rb') if sections else None
+        try:
+            if not files:
+                outfile.write(b"No files matched the specified paths and filters.\n")
+            pending = iter(to_read)
+            for path in itertools.islice(pending, READ_AHEAD_FILES):
+                read_ahead[path] = executor.submit(_read_small, path)
+            for path, stat in zip(files, stats):
+                if verbose:
+                    print(f"Merging {path}")
+                outfile.write(f"\n\n--- {path} ---\n\n".encode())
+                offset = outfile.tell()
+                if reusable(path, stat):
+                    _, old_offset, length = sections[path]
+                    _copy_range(old_output, outfile, old_offset, length)
+                    copied += 1
+                else:
+                    content = read_ahead.pop(path).result()
+                    for next_path in itertools.islice(pending, 1):
+                        read_ahead[next_path] = executor.submit(_read_small, next_path)
+                    if content is None:
+                        _stream(path, outfile)
+                    elif isinstance(content, Exception):
+                        outfile.write(f"Error reading file: {content}\n".encode())
+                    else:
+                        outfile.write(content)
+                    read += 1
+                manifest_files.append([path, stat, offset, outfile.tell() - offset])
+        finally:
+            if old_output is not None:
+                old_output.close()
+    os.replace(temporary, output_file)
+
+    with open(output_file + MANIFEST_SUFFIX, 'w') as f:
+        json.dump({'output': _stat(output_file), 'files': manifest_files}, f)
+    return read, copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the files selected by paths.json into one file")
+    parser.add_argument('--config', default='paths.json')
+    parser.add_argument('--output', default='output.txt')
+    parser.add_argument('--incremental', action='store_true',
+                        help="Reuse sections of files unchanged (size and mtime) since the last merge")
+    parser.add_argument('--workers', type=int, default=8, help="Threads reading files ahead of the writer")
+    parser.add_argument('--verbose', action='store_true', help="Print every merged file")
+    args = parser.parse_args()
+
+    paths, filters, ignored_dirs = read_paths_and_filters(args.config)
+    # The output and its manifest may themselves match the filters (output.txt, *.json)
+    own_files = {os.path.realpath(args.output + suffix) for suffix in ('', MANIFEST_SUFFIX, '.tmp')}
+    files = [path for path in get_files_from_patterns(paths, filters, ignored_dirs)
+             if os.path.realpath(path) not in own_files]
+    read, copied = merge_files(files, args.output, args.incremental, args.workers, args.verbose)
+    print(f"Merged {len(files)} files into {args.output} ({read} read, {copied} unchanged)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Endpoint sizing profile from load test results
+#
+# Turns the JSON reports of tools/load_test.py into the sizing_profile.json read by
+# 2_deploy_model (see deploy_model/sizing.py). Each report must come from a host of the instance
+# type it is given for (an instance of that type, or a container limited to its vCPUs and
+# memory). For every instance type, the highest throughput measured without errors and within
+# the p99 latency objective is taken as one instance's capacity. The autoscaling target is that
+# capacity, in invocations per minute, scaled down by the headroom factor so that instances are
+# added before latency degrades. With --peak-rps, max_capacity is the instance count that serves
+# the peak at the target. Several instance types become weighted variants of one endpoint, so
+# they can be compared under the same real traffic.
+#
+# Examples:
+#   python tools/sizing_profile.py ml.m5.large=results_m5.json --p99-ms 50 --peak-rps 300
+#   python tools/sizing_profile.py ml.m5.large=m5.json ml.c5.large=c5.json --weights 0.8,0.2 \
+#       --output 2_deploy_model/sizing_profile.json
+
+import argparse
+import json
+import math
+import re
+
+
+def sustainable_throughput(report, p99_ms, batch_size=None):
+    """Best requests/s in a load test report with no errors and p99 within p99_ms, or None."""
+    candidates = [
+        result["throughput_rps"] for result in report["results"]
+        if result["errors"] == 0
+        and result["latency_ms"]["p99"] is not None and result["latency_ms"]["p99"] <= p99_ms
+        and (batch_size is None or result["batch_size"] == batch_size)
+    ]
+    return max(candidates) if candidates else None
+
+
+def variant_name(instance_type):
+    """Variant name for an instance type: ml.c5.large -> c5-large."""
+    return re.sub(r"[^a-zA-Z0-9]+", "-", instance_type.removeprefix("ml."))
+
+
+def build_profile(reports, p99_ms, headroom=0.7, peak_rps=None, min_capacity=1, max_capacity=4,
+                  batch_size=None, weights=None, scale_in_cooldown=300, scale_out_cooldown=60):
+    """
+    Sizing profile for the given {instance type: load test report}.
+
+    Returns:
+    dict in the sizing_profile.json format, with the measured capacity of each variant
+    recorded under "benchmark"
+    """
+    weights = weights or [1.0] * len(reports)
+    if len(weights) != len(reports):
+        raise ValueError("Expected one weight per instance type")
+    variants = []
+    for (instance_type, report), weight in zip(reports.items(), weights):
+        rps = sustainable_throughput(report, p99_ms, batch_size)
+        if rps is None:
+            raise ValueError(f"No result for {instance_type} meets p99 <= {p99_ms} ms without errors")
+        target_rps = rps * headroom
+        maximum = max(min_capacity, math.ceil(peak_rps * weight / sum(weights) / target_rps)) if peak_rps \
+            else max_capacity
+        variants.append({
+            "name": variant_name(instance_type),
+            "instance_type": instance_type,
+            "initial_instance_count": min_capacity,
+            "min_capacity": min_capacity,
+            "max_capacity": maximum,
+            "target_invocations_per_instance": round(target_rps * 60),
+            "weight": weight,
+            "benchmark": {
+                "throughput_rps": rps,
+                "p99_ms": p99_ms,
+                "git_commit": report.get("git_commit"),
+                "timestamp": report.get("timestamp"),
+            },
+        })
+    return {
+        "variants": variants,
+        "scale_in_cooldown_seconds": scale_in_cooldown,
+        "scale_out_cooldown_seconds": scale_out_cooldown,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build sizing_profile.json from load_test.py results")
+    parser.add_argument("results", nargs="+", metavar="INSTANCE_TYPE=RESULTS_JSON",
+                        help="Load test report measured on each instance type, e.g. ml.m5.large=results.json")
+    parser.add_argument("--p99-ms", type=float, required=True, help="p99 latency objective per request")
+    parser.add_argument("--headroom", type=float, default=0.7,
+                        help="Share of the measured capacity to target before scaling out")
+    parser.add_argument("--peak-rps", type=float, help="Expected peak requests/s, sets max_capacity")
+    parser.add_argument("--min-capacity", type=int, default=1)
+    parser.add_argument("--max-capacity", type=int, default=4, help="Used when --peak-rps is not given")
+    parser.add_argument("--batch-size", type=int, help="Only use results of this batch size")
+    parser.add_argument("--weights", help="Comma-separated traffic weights, one per instance type")
+    parser.add_argument("--scale-in-cooldown", type=int, default=300)
+    parser.add_argument("--scale-out-cooldown", type=int, default=60)
+    parser.add_argument("--output", default="sizing_profile.json")
+    args = parser.parse_args()
+
+    reports = {}
+    for item in args.results:
+        instance_type, _, path = item.partition("=")
+        if not path:
+            parser.error(f"Expected INSTANCE_TYPE=RESULTS_JSON, got {item}")
+        with open(path) as f:
+            reports[instance_type] = json.load(f)
+    weights = [float(w) for w in args.weights.split(",")] if args.weights else None
+
+    try:
+        profile = build_profile(
+            reports, args.p99_ms, args.headroom, args.peak_rps, args.min_capacity, args.max_capacity,
+            args.batch_size, weights, args.scale_in_cooldown, args.scale_out_cooldown,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2)
+    for variant in profile["variants"]:
+        print(f"{variant['instance_type']}: {variant['benchmark']['throughput_rps']} rps measured, "
+              f"target {variant['target_invocations_per_instance']} invocations/min per instance, "
+              f"{variant['min_capacity']}-{variant['max_capacity']} instances, weight {variant['weight']}")
+    print(f"Profile written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import artifact_sync
+from artifact_sync import HashCache
+
+BUCKET = "artifacts"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """S3 client backed by moto, with one empty bucket."""
+    for name, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("AWS_ENDPOINT_URL_S3", raising=False)
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def source(tmp_path):
+    directory = tmp_path / "source"
+    (directory / "sub").mkdir(parents=True)
+    (directory / "a.txt").write_text("a")
+    (directory / "sub" / "b.txt").write_text("b")
+    (directory / "__pycache__").mkdir()
+    (directory / "__pycache__" / "c.pyc").write_bytes(b"c")
+    return directory
+
+
+def keys(s3, prefix=""):
+    return sorted(item["Key"] for item in s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix).get("Contents", []))
+
+
+def test_file_is_skipped_when_the_remote_hash_matches(s3, source):
+    hashes = HashCache()
+    path = str(source / "a.txt")
+    first = artifact_sync.sync_file(s3, path, BUCKET, "data/a.txt", hashes)
+    second = artifact_sync.sync_file(s3, path, BUCKET, "data/a.txt", hashes)
+
+    assert first["uploaded"] and not second["uploaded"]
+    metadata = s3.head_object(Bucket=BUCKET, Key="data/a.txt")["Metadata"]
+    assert metadata[artifact_sync.METADATA_KEY] == first["sha256"]
+
+
+def test_only_the_changed_file_of_a_directory_is_uploaded(s3, source):
+    hashes = HashCache()
+    results = artifact_sync.sync_directory(s3, str(source), BUCKET, "code", hashes)
+    assert [r["key"] for r in results if r["uploaded"]] == ["code/a.txt", "code/sub/b.txt"]
+
+    (source / "sub" / "b.txt").write_text("changed")
+    results = artifact_sync.sync_directory(s3, str(source), BUCKET, "code", hashes)
+    assert [r["key"] for r in results if r["uploaded"]] == ["code/sub/b.txt"]
+    assert s3.get_object(Bucket=BUCKET, Key="code/sub/b.txt")["Body"].read() == b"changed"
+
+
+def test_prune_deletes_only_stale_keys_under_the_prefix(s3, source):
+    hashes = HashCache()
+    artifact_sync.sync_directory(s3, str(source), BUCKET, "data/train", hashes)
+    s3.put_object(Bucket=BUCKET, Key="data/train-old/part-0.parquet", Body=b"x")
+    (source / "sub" / "b.txt").unlink()
+
+    results = artifact_sync.sync_directory(s3, str(source), BUCKET, "data/train", hashes, prune=True)
+
+    assert [r["key"] for r in results if r.get("deleted")] == ["data/train/sub/b.txt"]
+    assert keys(s3) == ["data/train-old/part-0.parquet", "data/train/a.txt"]
+    with pytest.raises(ValueError):
+        artifact_sync.sync_directory(s3, str(source), BUCKET, "", hashes, prune=True)
+
+
+def test_bundle_is_deterministic_and_skipped_when_unchanged(s3, source):
+    hashes = HashCache()
+    first_zip = artifact_sync.build_zip(str(source))
+    os.utime(source / "a.txt", (0, 0))
+    assert artifact_sync.build_zip(str(source)) == first_zip
+
+    first = artifact_sync.sync_bundle(s3, str(source), BUCKET, "code.zip", hashes)
+    second = artifact_sync.sync_bundle(s3, str(source), BUCKET, "code.zip", hashes)
+    assert first["uploaded"] and not second["uploaded"]
+    assert s3.get_object(Bucket=BUCKET, Key="code.zip")["Body"].read() == first_zip
+
+    (source / "a.txt").write_text("changed")
+    third = artifact_sync.sync_bundle(s3, str(source), BUCKET, "code.zip", hashes)
+    assert third["uploaded"] and third["sha256"] != first["sha256"]
+
+
+def test_objects_above_the_threshold_use_multipart_upload(s3, tmp_path):
+    hashes = HashCache()
+    config = artifact_sync.transfer_config(threshold=5 * 2**20, chunksize=5 * 2**20, concurrency=2)
+    small, large = tmp_path / "small.bin", tmp_path / "large.bin"
+    small.write_bytes(b"s" * 2**20)
+    large.write_bytes(os.urandom(11 * 2**20))
+
+    for path in (small, large):
+        assert artifact_sync.sync_file(s3, str(path), BUCKET, path.name, hashes, config)["uploaded"]
+
+    # A multipart ETag ends in -<number of parts>
+    assert "-" not in s3.head_object(Bucket=BUCKET, Key="small.bin")["ETag"]
+    head = s3.head_object(Bucket=BUCKET, Key="large.bin")
+    assert head["ETag"].strip('"').endswith("-3")
+    assert head["Metadata"][artifact_sync.METADATA_KEY] == hashes.sha256(str(large))
+    assert not artifact_sync.sync_file(s3, str(large), BUCKET, "large.bin", hashes, config)["uploaded"]
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+import datagen
+
+
+def generated_bytes(output_dir, **options):
+    """Concatenated shard bytes of a datagen run, in shard order."""
+    manifest = datagen.generate(n_rows=2500, output_dir=str(output_dir), chunk_rows=1000, fmt="csv", **options)
+    assert len(manifest["shards"]) == 3
+    data = b""
+    for shard in manifest["shards"]:
+        with open(os.path.join(output_dir, shard), "rb") as f:
+            data += f.read()
+    return data
+
+
+@pytest.mark.parametrize("kind", ["classification", "regression"])
+def test_output_does_not_depend_on_the_worker_count(tmp_path, kind):
+    one = generated_bytes(tmp_path / "one", kind=kind, seed=7, workers=1)
+    three = generated_bytes(tmp_path / "three", kind=kind, seed=7, workers=3)
+    assert one == three
+    assert one.count(b"\n") == 2500 + 3  # rows plus one header per shard
+
+
+@pytest.mark.parametrize("kind", ["classification", "regression"])
+def test_a_different_seed_changes_the_output(tmp_path, kind):
+    assert generated_bytes(tmp_path / "a", kind=kind, seed=7, workers=2) != \
+        generated_bytes(tmp_path / "b", kind=kind, seed=8, workers=2)
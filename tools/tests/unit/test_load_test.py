@@ -0,0 +1,44 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+import load_test
+
+psutil = pytest.importorskip("psutil")
+
+# A master holding 64 MB that forks workers sharing those pages, like a preloaded gunicorn
+FORKING_SERVER = """
+import os, sys, time
+buffer = bytearray(64 * 2**20)
+for _ in range(3):
+    if os.fork() == 0:
+        time.sleep(5)
+        os._exit(0)
+print("ready", flush=True)
+time.sleep(5)
+"""
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs fork and per-process page maps")
+def test_pages_shared_with_forked_workers_are_counted_once():
+    server = subprocess.Popen([sys.executable, "-c", FORKING_SERVER], stdout=subprocess.PIPE,
+                              start_new_session=True)
+    try:
+        assert server.stdout.readline() == b"ready\n"
+        with load_test.ResourceSampler(server.pid, interval=0.1) as sampler:
+            time.sleep(0.5)
+    finally:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+
+    summary = sampler.summary()
+    assert summary["workers"] == 3
+    assert summary["master_rss_mb_max"] > 64
+    # Summing RSS would count the shared buffer four times
+    assert summary["memory_mb_max"] < 2 * summary["master_rss_mb_max"]
+    assert summary["worker_uss_mb_max"] < 32
+    assert summary["pss_mb_max"] < 2 * summary["master_rss_mb_max"]
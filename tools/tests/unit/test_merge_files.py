@@ -0,0 +1,86 @@
+import glob
+import os
+
+import pytest
+
+import merge_files
+from merge_files import TreeScanner, get_files_from_patterns
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """A small source tree with hidden files and directories, used as the working directory."""
+    for path in ("f1.py", "f2.txt", ".dot.py", "a/x.py", "a/y1.txt", "a/.secret.py", "a/b/z.py", "a/b/c/w.py",
+                 ".hidden/q.py", "a/.h/r.py"):
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("pattern", [
+    "*", "**", "**/*.py", "a/**", "a/**/*.py", "a/**/", "*/**", "**/", "?1.py", "f[12].*", "f[!1].txt",
+    "a/*", ".*", "a/.*", ".hidden/**", "**/.*", "a/b/**/w.py", "a", "a/x.py", "missing/*",
+])
+def test_expand_matches_glob(tree, pattern):
+    assert sorted(TreeScanner().expand(pattern)) == sorted(glob.glob(pattern, recursive=True))
+
+
+def test_overlapping_patterns_are_merged_once(tree):
+    files = get_files_from_patterns(["a/*.py", "**/*.py", "a/x.py"], ["*.py"])
+    assert files == [os.path.join("a", "x.py"), os.path.join("a", "b", "c", "w.py"),
+                     os.path.join("a", "b", "z.py"), "f1.py"]
+
+
+def test_ignored_directories_are_pruned(tree, monkeypatch):
+    (tree / "node_modules" / "pkg").mkdir(parents=True)
+    (tree / "node_modules" / "pkg" / "index.py").write_text("")
+    (tree / "a" / "build").mkdir()
+    (tree / "a" / "build" / "gen.py").write_text("")
+    listed = []
+    scanner = TreeScanner(merge_files.DEFAULT_IGNORED_DIRS + ["build"])
+    listdir = scanner.listdir
+    monkeypatch.setattr(scanner, "listdir", lambda directory: listed.append(directory) or listdir(directory))
+
+    paths = scanner.expand("**/*.py")
+    assert not any("node_modules" in path or "build" in path for path in paths)
+    assert not any("node_modules" in directory or "build" in directory for directory in listed)
+    assert "index.py" not in "".join(get_files_from_patterns(["node_modules/**"], ["*.py"]))
+
+
+def test_unchanged_files_are_copied_from_the_previous_output(tree, monkeypatch):
+    files = get_files_from_patterns(["**/*.py"], ["*.py"])
+    assert merge_files.merge_files(files, "out.txt", incremental=True) == (len(files), 0)
+    first = (tree / "out.txt").read_bytes()
+
+    # No change: nothing is read or rewritten
+    assert merge_files.merge_files(files, "out.txt", incremental=True) == (0, len(files))
+    assert (tree / "out.txt").read_bytes() == first
+
+    # Sections are copied from the previous output, not read from the sources
+    monkeypatch.setattr(merge_files, "_read_small", lambda path: pytest.fail(f"{path} was read"))
+    assert merge_files.merge_files(files[1:], "out.txt", incremental=True) == (0, len(files) - 1)
+    assert b"--- " + files[0].encode() not in (tree / "out.txt").read_bytes()
+
+
+@pytest.mark.parametrize("change", ["size", "mtime", "delete"])
+def test_changed_or_deleted_files_are_regenerated(tree, change):
+    files = get_files_from_patterns(["**/*.py"], ["*.py"])
+    merge_files.merge_files(files, "out.txt", incremental=True)
+    target = tree / "a" / "x.py"
+    if change == "size":
+        target.write_text("a much longer content")
+    elif change == "mtime":
+        stat = target.stat()
+        os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        target.write_text("a/y.py")  # same size, new content
+        os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    else:
+        target.unlink()
+        files = get_files_from_patterns(["**/*.py"], ["*.py"])
+
+    read, copied = merge_files.merge_files(files, "out.txt", incremental=True)
+    output = (tree / "out.txt").read_text()
+    expected = "".join(f"\n\n--- {path} ---\n\n{open(path).read()}" for path in files)
+    assert output == expected
+    assert (read, copied) == ((0, len(files)) if change == "delete" else (1, len(files) - 1))